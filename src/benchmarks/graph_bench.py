@@ -0,0 +1,234 @@
+"""Build / load / retrieval benchmark across graph sizes.
+
+Runs fully offline (MockLLM, no answer cache). Each size is measured in a fresh
+child process so load time and resident memory are not polluted by earlier runs.
+
+    python -m src.benchmarks.graph_bench --sizes 1000,10000,100000 --out bench.json
+    python -m src.benchmarks.graph_bench --compare base.json bench.json --threshold 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from src.kg_construction.generate_large_data import generate_corpus
+from src.kg_construction.graph_builder import GraphBuilder
+from src.kg_construction.ontology import EntityType
+from src.rag_engine.retriever import GraphRetriever
+from src.rag_engine.rag_pipeline import RAGPipeline, MockLLM
+
+# Question templates per entity type; the None entry is a question with no entity in it
+QUESTION_MIX = [
+    (EntityType.DISEASE.value, "{}能买什么保险？", 0.4),
+    (EntityType.DRUG.value, "{}可以治疗什么病？", 0.2),
+    (EntityType.INSURANCE_PRODUCT.value, "{}覆盖什么疾病？", 0.15),
+    (EntityType.NURSING_HOME.value, "{}在哪里？", 0.1),
+    (EntityType.LOCATION.value, "{}有哪些养老机构？", 0.1),
+    (None, "今天适合出去散步吗？", 0.05),
+]
+
+# Metric -> True if higher is better
+METRICS = {
+    "build.records_per_s": True,
+    "build.seconds": False,
+    "load_s": False,
+    "rss_mb": False,
+}
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    def pick(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "n": len(samples)}
+
+
+def question_mix(G, count, seed):
+    rng = random.Random(seed)
+    by_type = {}
+    for node, data in G.nodes(data=True):
+        by_type.setdefault(data.get("type"), []).append(node)
+    templates = [(t, q) for t, q, _ in QUESTION_MIX if t is None or by_type.get(t)]
+    weights = [w for t, _, w in QUESTION_MIX if t is None or by_type.get(t)]
+    questions = []
+    for _ in range(count):
+        etype, template = rng.choices(templates, weights)[0]
+        questions.append(template if etype is None else template.format(rng.choice(by_type[etype])))
+    return questions
+
+
+def timed(fn, questions):
+    samples = []
+    for q in questions:
+        start = time.perf_counter()
+        fn(q)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def bench_size(size, seed, queries, workers):
+    """Generates a corpus of `size` diseases (plus proportional other entities) and measures it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        raw, processed = os.path.join(tmp, "raw"), os.path.join(tmp, "processed")
+        os.makedirs(processed)
+        generate_corpus(raw, seed=seed, diseases=size, drugs=size, products=max(1, size // 3),
+                        homes=max(1, size // 6), coverage_dist="powerlaw")
+
+        builder = GraphBuilder(raw, processed)
+        start = time.perf_counter()
+        builder.build_graph(workers=workers)
+        build_s = time.perf_counter() - start
+        records = size + max(1, size // 3) + max(1, size // 6)
+        nodes, edges = builder.G.number_of_nodes(), builder.G.number_of_edges()
+        questions = question_mix(builder.G, queries, seed)
+        del builder
+
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        retriever = GraphRetriever(os.path.join(processed, "kg.pkl"))
+        load_s = time.perf_counter() - start
+        rss_after = rss_mb()
+
+        # The pipeline loads its own copy; latencies are measured on that one
+        del retriever
+        pipeline = RAGPipeline(processed, cache=False)
+        pipeline.llm = MockLLM()
+        retriever = pipeline.retriever
+
+        latency = {
+            "search_entities": timed(retriever.search_entities, questions),
+            "get_context_h1": timed(lambda q: retriever.get_context(q, hops=1), questions),
+            "get_context_h2": timed(lambda q: retriever.get_context(q, hops=2), questions),
+            "answer_question": timed(pipeline.answer_question, questions),
+        }
+
+    return {
+        "size": size,
+        "nodes": nodes,
+        "edges": edges,
+        "build": {"seconds": build_s, "records": records, "records_per_s": records / build_s,
+                  "workers": workers},
+        "load_s": load_s,
+        "rss_mb": rss_after,
+        "graph_rss_mb": rss_after - rss_before,
+        "latency_ms": latency,
+    }
+
+
+def _child(args, conn):
+    conn.send(bench_size(*args))
+    conn.close()
+
+
+def run(sizes, seed=7, queries=500, workers=1):
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for size in sizes:
+        parent, child = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_child, args=((size, seed, queries, workers), child))
+        proc.start()
+        result = parent.recv()
+        proc.join()
+        results.append(result)
+        lat = result["latency_ms"]
+        print(f"size={size:>8}  nodes={result['nodes']:>9}  build={result['build']['records_per_s']:.0f} rec/s  "
+              f"load={result['load_s']:.2f}s  rss={result['rss_mb']:.0f}MB  "
+              f"ctx_h1 p95={lat['get_context_h1']['p95']:.2f}ms  ctx_h2 p95={lat['get_context_h2']['p95']:.2f}ms",
+              flush=True)
+    return {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "seed": seed, "queries": queries, "workers": workers},
+        "results": results,
+    }
+
+
+def _flatten(result):
+    flat = {}
+    for metric in METRICS:
+        value = result
+        for part in metric.split("."):
+            value = value[part]
+        flat[metric] = value
+    for name, stats in result["latency_ms"].items():
+        for p in ("p50", "p95", "p99"):
+            flat[f"latency_ms.{name}.{p}"] = stats[p]
+    return flat
+
+
+def compare(base, new, threshold=0.2, min_latency_ms=0.5):
+    """Returns regressions: metrics worse than the baseline by more than `threshold` (relative).
+
+    Latency changes smaller than min_latency_ms in absolute terms are treated as noise.
+    """
+    regressions = []
+    base_by_size = {r["size"]: _flatten(r) for r in base["results"]}
+    for result in new["results"]:
+        old = base_by_size.get(result["size"])
+        if old is None:
+            continue
+        for metric, value in _flatten(result).items():
+            higher_is_better = METRICS.get(metric, False)
+            ref = old.get(metric)
+            if not ref:
+                continue
+            if metric.startswith("latency_ms.") and abs(value - ref) < min_latency_ms:
+                continue
+            change = (value - ref) / ref
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append({"size": result["size"], "metric": metric, "base": ref,
+                                    "new": value, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph build, load and retrieval across sizes.")
+    parser.add_argument("--sizes", default="1000,10000,50000",
+                        help="comma-separated disease counts; other entity counts scale with it")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="build processes")
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown tolerated before a metric is flagged")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION size={r['size']} {r['metric']}: {r['base']:.4g} -> {r['new']:.4g} "
+                  f"({r['change']:+.0%})")
+        if not regressions:
+            print("No regressions.")
+        sys.exit(1 if regressions else 0)
+
+    report = run([int(s) for s in args.sizes.split(",")], args.seed, args.queries, args.workers)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Load test for the query service: throughput and latency vs. worker count.
+
+Starts src.service.query_server once per worker count (MockLLM, answer cache
+off), drives it with keep-alive HTTP clients and reports requests/s and
+latency percentiles. Questions are drawn from the graph with the benchmark
+question mix, so concurrent duplicates (and thus coalescing) are rare.
+
+    python -m src.benchmarks.load_test --workers 1,2,4 --concurrency 64 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from src.benchmarks.graph_bench import percentiles, question_mix
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+
+
+async def _request(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _drive(host, port, paths, connections):
+    """Sends paths over `connections` keep-alive connections; returns (latencies, status counts)."""
+    queue = list(reversed(paths))
+    latencies, statuses = [], {}
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while queue:
+                path = queue.pop()
+                start = time.perf_counter()
+                status = await _request(reader, writer, host, path)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, statuses
+
+
+def _client_process(args):
+    return asyncio.run(_drive(*args))
+
+
+def wait_ready(host, port, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return asyncio.run(_drive(host, port, ["/health"], 1))
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"query service did not come up on {host}:{port}")
+
+
+def run_once(workers, paths, args):
+    cmd = [sys.executable, "-m", "src.service.query_server", "--workers", str(workers),
+           "--host", args.host, "--port", str(args.port), "--graph-file", args.graph_file,
+           "--data", args.data, "--no-cache", "--queue-size", str(args.queue_size)]
+    server = subprocess.Popen(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(args.host, args.port)
+        # Client load is split over processes so the load generator is not the bottleneck
+        per_client = max(1, args.concurrency // args.clients)
+        chunks = [(args.host, args.port, paths[i::args.clients], per_client) for i in range(args.clients)]
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.map(_client_process, chunks)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies, statuses = [], {}
+    for lat, st in results:
+        latencies += lat
+        for code, n in st.items():
+            statuses[code] = statuses.get(code, 0) + n
+    return {"workers": workers, "requests": len(latencies), "seconds": elapsed,
+            "requests_per_s": len(latencies) / elapsed, "latency_ms": percentiles(latencies),
+            "status": {str(k): v for k, v in sorted(statuses.items())}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the query service vs. worker processes.")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64, help="open connections in total")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--endpoint", choices=["answer", "context"], default="answer")
+    parser.add_argument("--hops", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", default=os.path.join(REPO_ROOT, "data/processed"))
+    parser.add_argument("--graph-file", default="kg.csr")
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data, "kg.pkl"), "rb") as f:
+        questions = question_mix(pickle.load(f), args.requests, args.seed)
+    paths = [f"/{args.endpoint}?hops={args.hops}&q={quote(q)}" for q in questions]
+
+    report = []
+    for workers in [int(w) for w in args.workers.split(",")]:
+        result = run_once(workers, paths, args)
+        report.append(result)
+        lat = result["latency_ms"]
+        print(f"workers={workers:>2}  {result['requests_per_s']:8.1f} req/s  p50={lat['p50']:.1f}ms  "
+              f"p95={lat['p95']:.1f}ms  p99={lat['p99']:.1f}ms  status={result['status']}", flush=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
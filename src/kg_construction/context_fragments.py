@@ -0,0 +1,291 @@
+"""Precomputed 1-hop context fragments, one per entity.
+
+The graph is read-only between builds, yet every query walks the ego graph of
+its seeds, ranks the triples and renders them again. GraphBuilder.save_fragments
+does that once per entity: the 1-hop triples of the entity, ranked by the
+personalized PageRank restarted at it (as GraphRetriever.retrieve_facts does
+for a single seed), each stored as its rendered line and token length, plus one
+"Entity: name (props)" line per entity. GraphRetriever memory-maps the file
+and assembles contexts from the fragments of the seeds (see
+rag_engine/context_builder.render_fragments).
+
+Entities whose ego graph has more than max_triples triples (hubs) get no
+fragment; queries on them fall back to the live traversal.
+
+Layout as in csr_graph.py: MAGIC | u32 header length | JSON header | 8-byte
+aligned sections. Names are sorted by UTF-8 bytes and looked up by bisection.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+try:
+    from ..rag_engine.context_builder import personalized_pagerank, estimate_tokens, format_props
+except ImportError:
+    from context_builder import personalized_pagerank, estimate_tokens, format_props
+
+FRAGMENT_FILE = "fragments.bin"
+MAGIC = b"KGFRG001"
+ALIGN = 8
+MAX_TRIPLES = 2000
+
+# Section name -> array typecode ("B" for raw byte blobs)
+SECTIONS = [
+    ("name_offsets", "Q"),
+    ("names", "B"),
+    ("entity_offsets", "Q"),     # per node: "Entity: ..." line (empty if the node has no properties)
+    ("entities", "B"),
+    ("entity_tokens", "I"),
+    ("unit_offsets", "Q"),       # per node: range of its ranked triples; -> units below
+    ("unit_heads", "I"),
+    ("unit_tails", "I"),
+    ("unit_tokens", "I"),
+    ("line_offsets", "Q"),       # per unit: rendered "(h) --[REL]--> (t)" line
+    ("lines", "B"),
+    ("complete", "B"),           # 1 if the node has a fragment, 0 for hubs over max_triples
+]
+
+
+def ego_triples(G, node):
+    """(u, v, relation) among node and its neighbours, ignoring direction (GraphRetriever.ego_edges, hops=1)."""
+    nodes = {node} | set(G.successors(node)) | set(G.predecessors(node))
+    return [(u, v, rel) for u in nodes for _, v, rel in G.out_edges(u, data="relation", default="RELATED")
+            if v in nodes]
+
+
+def rank_triples(triples, seed):
+    """Triples in the order retrieve_facts ranks them for the single seed."""
+    rank = personalized_pagerank(triples, [seed])
+    return sorted(triples, key=lambda t: (-(rank.get(t[0], 0.0) + rank.get(t[1], 0.0)), t[0], t[2], t[1]))
+
+
+class FragmentStore:
+    def __init__(self, sections, num_nodes, max_triples, buffer=None):
+        self._buffer = buffer
+        self.num_nodes = num_nodes
+        self.max_triples = max_triples
+        for key, _ in SECTIONS:
+            setattr(self, key, sections[key])
+
+    # === Construction ===
+
+    @classmethod
+    def from_networkx(cls, G, max_triples=MAX_TRIPLES):
+        encoded = sorted((str(n).encode("utf-8"), n) for n in G.nodes())
+        node_ids = {n: i for i, (_, n) in enumerate(encoded)}
+
+        name_offsets, names = array("Q", [0]), bytearray()
+        entity_offsets, entities, entity_tokens = array("Q", [0]), bytearray(), array("I")
+        unit_offsets, unit_heads, unit_tails, unit_tokens = array("Q", [0]), array("I"), array("I"), array("I")
+        line_offsets, lines = array("Q", [0]), bytearray()
+        complete = bytearray()
+
+        for raw, n in encoded:
+            names += raw
+            name_offsets.append(len(names))
+            props = format_props(G.nodes[n])
+            line = f"Entity: {n} ({props})" if props else ""
+            entities += line.encode("utf-8")
+            entity_offsets.append(len(entities))
+            entity_tokens.append(estimate_tokens(line))
+
+            # Cheap bound first: the ego graph has at least degree(n) triples
+            triples = ego_triples(G, n) if G.degree(n) <= max_triples else None
+            if triples is None or len(triples) > max_triples:
+                complete.append(0)
+            else:
+                complete.append(1)
+                for u, v, rel in rank_triples(triples, n):
+                    line = f"({u}) --[{rel}]--> ({v})"
+                    unit_heads.append(node_ids[u])
+                    unit_tails.append(node_ids[v])
+                    unit_tokens.append(estimate_tokens(line))
+                    lines += line.encode("utf-8")
+                    line_offsets.append(len(lines))
+            unit_offsets.append(len(unit_heads))
+
+        sections = {
+            "name_offsets": name_offsets, "names": bytes(names),
+            "entity_offsets": entity_offsets, "entities": bytes(entities), "entity_tokens": entity_tokens,
+            "unit_offsets": unit_offsets, "unit_heads": unit_heads, "unit_tails": unit_tails,
+            "unit_tokens": unit_tokens, "line_offsets": line_offsets, "lines": bytes(lines),
+            "complete": bytes(complete),
+        }
+        return cls(sections, len(encoded), max_triples)
+
+    # === Binary format ===
+
+    def save(self, output_path):
+        path = os.path.join(output_path, FRAGMENT_FILE)
+        payloads = []
+        for key, _ in SECTIONS:
+            sec = getattr(self, key)
+            payloads.append(sec.tobytes() if isinstance(sec, array) else bytes(sec))
+
+        # The header records absolute section offsets, so size it first.
+        header = {"num_nodes": self.num_nodes, "max_triples": self.max_triples, "sections": {}}
+        header_bytes = b""
+        while True:
+            pos = _align(len(MAGIC) + 4 + len(header_bytes))
+            for (key, code), payload in zip(SECTIONS, payloads):
+                header["sections"][key] = [pos, len(payload), code]
+                pos = _align(pos + len(payload))
+            encoded = json.dumps(header).encode("utf-8")
+            if len(encoded) == len(header_bytes):
+                header_bytes = encoded
+                break
+            header_bytes = encoded
+
+        # Write-then-rename: processes that memory-mapped the old file keep reading it intact
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for (key, _), payload in zip(SECTIONS, payloads):
+                f.write(b"\0" * (header["sections"][key][0] - f.tell()))
+                f.write(payload)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, output_path):
+        """Memory-maps fragments.bin; sections are zero-copy views over the file."""
+        path = os.path.join(output_path, FRAGMENT_FILE)
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a context fragment file")
+        (header_len,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(buffer[start:start + header_len].decode("utf-8"))
+
+        view = memoryview(buffer)
+        sections = {}
+        for key, (offset, length, code) in header["sections"].items():
+            sec = view[offset:offset + length]
+            sections[key] = sec if code == "B" else sec.cast(code)
+        return cls(sections, header["num_nodes"], header["max_triples"], buffer)
+
+    # === Lookup ===
+
+    def _name_bytes(self, i):
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]])
+
+    def node_name(self, i):
+        return self._name_bytes(i).decode("utf-8")
+
+    def node_id(self, name):
+        key = name.encode("utf-8")
+        lo = bisect.bisect_left(_NameView(self), key)
+        if lo < self.num_nodes and self._name_bytes(lo) == key:
+            return lo
+        return None
+
+    def entity_line(self, i):
+        """("Entity: name (props)", tokens) of node id i, or None if the entity has no properties."""
+        start, end = self.entity_offsets[i], self.entity_offsets[i + 1]
+        if start == end:
+            return None
+        return bytes(self.entities[start:end]).decode("utf-8"), self.entity_tokens[i]
+
+    def units(self, name):
+        """Ranked [(head id, tail id, triple line, tokens)] of name's fragment; None if it has none."""
+        i = self.node_id(name)
+        if i is None or self.complete[i] != 1:
+            return None
+        first, last = self.unit_offsets[i], self.unit_offsets[i + 1]
+        base = self.line_offsets[first]
+        # One copy of the fragment's text, then slices of it
+        block = bytes(self.lines[base:self.line_offsets[last]])
+        return [(self.unit_heads[k], self.unit_tails[k],
+                 block[self.line_offsets[k] - base:self.line_offsets[k + 1] - base].decode("utf-8"),
+                 self.unit_tokens[k])
+                for k in range(first, last)]
+
+
+class _NameView:
+    """Sequence adapter so bisect can search the names in place."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store.num_nodes
+
+    def __getitem__(self, i):
+        return self.store._name_bytes(i)
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_fragments(G, output_path, max_triples=MAX_TRIPLES):
+    start = time.perf_counter()
+    store = FragmentStore.from_networkx(G, max_triples)
+    path = store.save(output_path)
+    hubs = store.num_nodes - sum(store.complete)
+    return path, {"nodes": store.num_nodes, "units": len(store.unit_heads), "hubs": hubs,
+                  "bytes": os.path.getsize(path), "seconds": time.perf_counter() - start}
+
+
+def compare(data_path, graph_file="kg.pkl", queries=2000, max_tokens=2000, seed=0):
+    """Latency and CPU time per query: contexts assembled from fragments vs. the live traversal.
+
+    Queries mention one or two random entities, as in graph_bench. Also
+    reports how many single-entity contexts differ from the live ones.
+    """
+    import random
+    from ..rag_engine.retriever import GraphRetriever
+
+    retriever = GraphRetriever(os.path.join(data_path, graph_file))
+    fragments = retriever.fragments
+    if fragments is None:
+        raise ValueError(f"no {FRAGMENT_FILE} for {graph_file} in {data_path}")
+    rng = random.Random(seed)
+    names = sorted(retriever.G.nodes())
+    questions = [f"{rng.choice(names)}能买什么保险？" if rng.random() < 0.7 else
+                 f"{rng.choice(names)}和{rng.choice(names)}有什么关系？" for _ in range(queries)]
+
+    def run(use_fragments):
+        retriever.fragments = fragments if use_fragments else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        contexts = [retriever.get_context(q, hops=1, max_tokens=max_tokens) for q in questions]
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        return contexts, {"latency_ms": wall / queries * 1000, "cpu_ms": cpu / queries * 1000}
+
+    run(False)  # warm-up (matcher, first-touch page faults)
+    live, live_stats = run(False)
+    assembled, fragment_stats = run(True)
+    retriever.fragments = fragments
+    single = [i for i, q in enumerate(questions) if len(retriever.search_entities(q)) == 1]
+    return {
+        "nodes": fragments.num_nodes,
+        "file_bytes": os.path.getsize(os.path.join(data_path, FRAGMENT_FILE)),
+        "hubs": fragments.num_nodes - sum(fragments.complete),
+        "queries": queries,
+        "live": live_stats,
+        "fragments": fragment_stats,
+        "single_seed_queries": len(single),
+        "single_seed_mismatches": sum(live[i] != assembled[i] for i in single),
+    }
+
+
+if __name__ == "__main__":
+    import pickle
+    from .manifest import record_artifacts
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    proc_path = os.path.join(current_dir, "../../data/processed")
+    graph_file = sys.argv[1] if len(sys.argv) > 1 else "kg.pkl"
+    with open(os.path.join(proc_path, "kg.pkl"), "rb") as f:
+        path, stats = save_fragments(pickle.load(f), proc_path)
+    record_artifacts(proc_path, [FRAGMENT_FILE])
+    print(f"Context fragments saved to {path}: {json.dumps(stats)}")
+    print(json.dumps(compare(proc_path, graph_file), indent=2))
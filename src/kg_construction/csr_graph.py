@@ -0,0 +1,304 @@
+import bisect
+import json
+import mmap
+import os
+import pickle
+import struct
+import time
+import tracemalloc
+from array import array
+from collections import deque
+
+MAGIC = b"KGCSR001"
+ALIGN = 8
+
+# Section name -> array typecode ("B" for raw byte blobs)
+SECTIONS = [
+    ("name_offsets", "Q"),
+    ("names", "B"),
+    ("attr_offsets", "Q"),
+    ("attrs", "B"),
+    ("out_offsets", "Q"),
+    ("out_targets", "I"),
+    ("out_rels", "H"),
+    ("in_offsets", "Q"),
+    ("in_sources", "I"),
+    ("in_rels", "H"),
+]
+
+
+class CSRGraph:
+    """Read-optimized, memory-mappable directed multigraph.
+
+    Node names are interned to integer ids (assigned in UTF-8 byte order so a
+    name can be resolved by binary search without a dict). Out- and in-adjacency
+    are stored as CSR offset/target arrays, with relation-type codes in a
+    parallel array. Node attributes are kept as one JSON document per node and
+    decoded on access.
+    """
+
+    def __init__(self, sections, relations, num_nodes, num_edges, buffer=None):
+        self._buffer = buffer
+        self.relations = relations
+        self.num_nodes = num_nodes
+        self.num_edges = num_edges
+        for key, _ in SECTIONS:
+            setattr(self, key, sections[key])
+
+    # === Conversion ===
+
+    @classmethod
+    def from_networkx(cls, G):
+        encoded = sorted((str(n).encode("utf-8"), n) for n in G.nodes())
+        node_ids = {n: i for i, (_, n) in enumerate(encoded)}
+
+        relations = []
+        rel_codes = {}
+        name_offsets, names = array("Q", [0]), bytearray()
+        attr_offsets, attrs = array("Q", [0]), bytearray()
+        out_offsets, out_targets, out_rels = array("Q", [0]), array("I"), array("H")
+        in_offsets, in_sources, in_rels = array("Q", [0]), array("I"), array("H")
+
+        def rel_code(data):
+            rel = data.get("relation", "RELATED")
+            if rel not in rel_codes:
+                rel_codes[rel] = len(relations)
+                relations.append(rel)
+            return rel_codes[rel]
+
+        for raw, n in encoded:
+            names += raw
+            name_offsets.append(len(names))
+            attrs += json.dumps(G.nodes[n], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            attr_offsets.append(len(attrs))
+
+            for _, v, data in G.out_edges(n, data=True):
+                out_targets.append(node_ids[v])
+                out_rels.append(rel_code(data))
+            out_offsets.append(len(out_targets))
+
+            for u, _, data in G.in_edges(n, data=True):
+                in_sources.append(node_ids[u])
+                in_rels.append(rel_code(data))
+            in_offsets.append(len(in_sources))
+
+        sections = {
+            "name_offsets": name_offsets, "names": bytes(names),
+            "attr_offsets": attr_offsets, "attrs": bytes(attrs),
+            "out_offsets": out_offsets, "out_targets": out_targets, "out_rels": out_rels,
+            "in_offsets": in_offsets, "in_sources": in_sources, "in_rels": in_rels,
+        }
+        return cls(sections, relations, len(encoded), len(out_targets))
+
+    # === Binary format ===
+
+    def save(self, path):
+        """Layout: MAGIC | u32 header length | JSON header | 8-byte aligned sections."""
+        payloads = []
+        for key, _ in SECTIONS:
+            sec = getattr(self, key)
+            payloads.append(sec.tobytes() if isinstance(sec, array) else bytes(sec))
+
+        # The header records absolute section offsets, so size it first.
+        header = {"num_nodes": self.num_nodes, "num_edges": self.num_edges,
+                  "relations": self.relations, "sections": {}}
+        header_bytes = b""
+        while True:
+            pos = _align(len(MAGIC) + 4 + len(header_bytes))
+            for (key, code), payload in zip(SECTIONS, payloads):
+                header["sections"][key] = [pos, len(payload), code]
+                pos = _align(pos + len(payload))
+            encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            if len(encoded) == len(header_bytes):
+                header_bytes = encoded
+                break
+            header_bytes = encoded
+
+        # Write-then-rename: processes that memory-mapped the old file keep reading it intact
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for (key, _), payload in zip(SECTIONS, payloads):
+                f.write(b"\0" * (header["sections"][key][0] - f.tell()))
+                f.write(payload)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved graph; sections are zero-copy views over the file."""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a CSR graph file")
+        (header_len,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(buffer[start:start + header_len].decode("utf-8"))
+
+        view = memoryview(buffer)
+        sections = {}
+        for key, (offset, length, code) in header["sections"].items():
+            sec = view[offset:offset + length]
+            sections[key] = sec if code == "B" else sec.cast(code)
+        return cls(sections, header["relations"], header["num_nodes"], header["num_edges"], buffer)
+
+    # === Lookup ===
+
+    def node_name(self, i):
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+
+    def node_id(self, name):
+        key = name.encode("utf-8")
+        lo = bisect.bisect_left(_NameView(self), key)
+        if lo < self.num_nodes and self._name_bytes(lo) == key:
+            return lo
+        return None
+
+    def _name_bytes(self, i):
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]])
+
+    def nodes(self):
+        for i in range(self.num_nodes):
+            yield self.node_name(i)
+
+    def has_node(self, name):
+        return self.node_id(name) is not None
+
+    def node_data(self, name):
+        i = self.node_id(name)
+        if i is None:
+            raise KeyError(name)
+        return json.loads(bytes(self.attrs[self.attr_offsets[i]:self.attr_offsets[i + 1]]).decode("utf-8"))
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    # === Traversal ===
+
+    def neighbors_undirected(self, i):
+        for k in range(self.out_offsets[i], self.out_offsets[i + 1]):
+            yield self.out_targets[k]
+        for k in range(self.in_offsets[i], self.in_offsets[i + 1]):
+            yield self.in_sources[k]
+
+    def adjacent(self, name):
+        """[(neighbor, relation, "out" | "in")] for all edges incident to name."""
+        i = self.node_id(name)
+        if i is None:
+            return []
+        adj = [(self.node_name(self.out_targets[k]), self.relations[self.out_rels[k]], "out")
+               for k in range(self.out_offsets[i], self.out_offsets[i + 1])]
+        adj += [(self.node_name(self.in_sources[k]), self.relations[self.in_rels[k]], "in")
+                for k in range(self.in_offsets[i], self.in_offsets[i + 1])]
+        return adj
+
+    def ego_node_ids(self, i, radius=1):
+        """Undirected BFS, equivalent to nx.ego_graph(G.to_undirected(), n, radius)."""
+        seen = {i}
+        frontier = deque([(i, 0)])
+        while frontier:
+            u, depth = frontier.popleft()
+            if depth >= radius:
+                continue
+            for v in self.neighbors_undirected(u):
+                if v not in seen:
+                    seen.add(v)
+                    frontier.append((v, depth + 1))
+        return seen
+
+    def ego_edges(self, name, radius=1):
+        """Edges (u, v, relation) of the subgraph induced by the ego network of name."""
+        i = self.node_id(name)
+        if i is None:
+            return []
+        ids = self.ego_node_ids(i, radius)
+        edges = []
+        for u in sorted(ids):
+            for k in range(self.out_offsets[u], self.out_offsets[u + 1]):
+                v = self.out_targets[k]
+                if v in ids:
+                    edges.append((self.node_name(u), self.node_name(v), self.relations[self.out_rels[k]]))
+        return edges
+
+
+class _NameView:
+    """Sequence adapter so bisect can search the interned names in place."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return self.graph.num_nodes
+
+    def __getitem__(self, i):
+        return self.graph._name_bytes(i)
+
+
+def _align(pos):
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+def convert(kg_path, csr_path):
+    """Converts a pickled networkx MultiDiGraph (kg.pkl) to the CSR binary format."""
+    with open(kg_path, "rb") as f:
+        G = pickle.load(f)
+    CSRGraph.from_networkx(G).save(csr_path)
+    return csr_path
+
+
+def compare(kg_path, csr_path, repeat=200):
+    """Memory and 1-hop traversal latency of the pickled networkx graph vs. the CSR file."""
+    import networkx as nx
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with open(kg_path, "rb") as f:
+        G = pickle.load(f)
+    nx_load = time.perf_counter() - t0
+    nx_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    csr = CSRGraph.load(csr_path)
+    csr_load = time.perf_counter() - t0
+    csr_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    seeds = sorted(G.nodes(), key=G.degree, reverse=True)[:20]
+    G_undir = G.to_undirected(as_view=True)
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for s in seeds:
+            list(G.subgraph(nx.ego_graph(G_undir, s, radius=1).nodes()).edges(data=True))
+    nx_query = (time.perf_counter() - t0) / (repeat * len(seeds))
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for s in seeds:
+            csr.ego_edges(s, radius=1)
+    csr_query = (time.perf_counter() - t0) / (repeat * len(seeds))
+
+    return {
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "networkx": {"load_s": nx_load, "heap_bytes": nx_mem, "file_bytes": os.path.getsize(kg_path),
+                     "ego_query_ms": nx_query * 1000},
+        "csr": {"load_s": csr_load, "heap_bytes": csr_mem, "file_bytes": os.path.getsize(csr_path),
+                "ego_query_ms": csr_query * 1000},
+    }
+
+
+if __name__ == "__main__":
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    proc_path = os.path.join(current_dir, "../../data/processed")
+    kg_path = os.path.join(proc_path, "kg.pkl")
+    csr_path = os.path.join(proc_path, "kg.csr")
+    convert(kg_path, csr_path)
+    print(f"CSR graph saved to {csr_path}")
+    print(json.dumps(compare(kg_path, csr_path), indent=2))
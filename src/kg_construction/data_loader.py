@@ -1,56 +1,132 @@
 import json
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import os
+try:
+    from .pdf_ingest import PdfClauseIngestor
+except ImportError:
+    from pdf_ingest import PdfClauseIngestor
 
 class DataLoader:
-    def __init__(self, raw_data_path):
+    # Read size for streaming the nursing-home JSON array
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, raw_data_path, pdf_workers=1, pdf_cache_dir=None):
         self.raw_data_path = raw_data_path
+        self.pdf_workers = pdf_workers
+        self.pdf_cache_dir = pdf_cache_dir
 
-    def load_insurance_data(self) -> List[Dict[str, Any]]:
-        file_path = os.path.join(self.raw_data_path, "insurance_clauses.txt")
-        products = []
+    @staticmethod
+    def parse_block(lines) -> Dict[str, Any]:
+        """Parses one 'key: value' clause block into a dict."""
+        item = {}
+        for line in lines:
+            if ':' in line:
+                key, val = line.split(':', 1)
+                item[key.strip()] = val.strip()
+        return item
+
+    def iter_blocks(self, file_path, start=0, end=None) -> Iterator[Dict[str, Any]]:
+        """Streams blank-line separated clause blocks, holding one block in memory at a time.
+
+        start / end restrict it to a byte range from block_ranges().
+        """
+        block = []
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            pos = start
+            for raw in f:
+                if end is not None and pos >= end:
+                    break
+                pos += len(raw)
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line:
+                    block.append(line)
+                    continue
+                item = self.parse_block(block)
+                if item:
+                    yield item
+                block = []
+        item = self.parse_block(block)
+        if item:
+            yield item
+
+    @staticmethod
+    def block_ranges(file_path, parts):
+        """Splits a clause file into at most `parts` (start, end) byte ranges, each cut after a blank line."""
+        size = os.path.getsize(file_path)
+        cuts = [0]
+        with open(file_path, 'rb') as f:
+            for i in range(1, parts):
+                f.seek(max(size * i // parts, cuts[-1]))
+                f.readline()  # rest of the line the offset fell into
+                line = f.readline()
+                while line and line.rstrip(b'\r\n'):
+                    line = f.readline()
+                if cuts[-1] < f.tell() < size:
+                    cuts.append(f.tell())
+        cuts.append(size)
+        return list(zip(cuts, cuts[1:]))
+
+    def iter_json_array(self, file_path) -> Iterator[Any]:
+        """Incrementally decodes the elements of a top-level JSON array."""
+        decoder = json.JSONDecoder()
+        separators = ' \t\r\n,'
         with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        blocks = content.split('\n\n')
-        for block in blocks:
-            if not block.strip():
-                continue
-            item = {}
-            lines = block.split('\n')
-            for line in lines:
-                if ':' in line:
-                    key, val = line.split(':', 1)
-                    item[key.strip()] = val.strip()
-            if item:
-                products.append(item)
-        return products
+            buf = ''
+            while not buf:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                buf = chunk.lstrip()
+            if not buf.startswith('['):
+                raise ValueError(f"{file_path}: expected a JSON array")
+            pos, eof = 1, False
+            while True:
+                while pos < len(buf) and buf[pos] in separators:
+                    pos += 1
+                if pos < len(buf) and buf[pos] == ']':
+                    return
+                try:
+                    if pos == len(buf):
+                        raise json.JSONDecodeError("Unexpected end of data", buf, pos)
+                    obj, pos = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    # Element spans the chunk boundary: keep the unread tail and read more
+                    chunk = f.read(self.CHUNK_SIZE)
+                    eof = not chunk
+                    buf, pos = buf[pos:] + chunk, 0
+                    continue
+                yield obj
+
+    def iter_insurance_data(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_blocks(os.path.join(self.raw_data_path, "insurance_clauses.txt"))
+
+    def iter_medical_data(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_blocks(os.path.join(self.raw_data_path, "medical_guidelines.txt"))
+
+    def iter_nursing_data(self) -> Iterator[Dict[str, Any]]:
+        return self.iter_json_array(os.path.join(self.raw_data_path, "nursing_homes.json"))
+
+    def iter_pdf_data(self) -> Iterator[Dict[str, Any]]:
+        """Insurance records segmented from the policy PDFs in policies/ (none if there is no such directory)."""
+        pdf_dir = os.path.join(self.raw_data_path, "policies")
+        if not os.path.isdir(pdf_dir):
+            return iter(())
+        paths = [os.path.join(pdf_dir, f) for f in sorted(os.listdir(pdf_dir)) if f.lower().endswith(".pdf")]
+        ingestor = PdfClauseIngestor(workers=self.pdf_workers, cache_dir=self.pdf_cache_dir)
+        return ingestor.iter_records(paths)
+
+    def load_insurance_data(self) -> List[Dict[str, Any]]:
+        return list(self.iter_insurance_data())
 
     def load_medical_data(self) -> List[Dict[str, Any]]:
-        file_path = os.path.join(self.raw_data_path, "medical_guidelines.txt")
-        diseases = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        blocks = content.split('\n\n')
-        for block in blocks:
-            if not block.strip():
-                continue
-            item = {}
-            lines = block.split('\n')
-            for line in lines:
-                if ':' in line:
-                    key, val = line.split(':', 1)
-                    item[key.strip()] = val.strip()
-            if item:
-                diseases.append(item)
-        return diseases
+        return list(self.iter_medical_data())
 
     def load_nursing_data(self) -> List[Dict[str, Any]]:
-        file_path = os.path.join(self.raw_data_path, "nursing_homes.json")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return list(self.iter_nursing_data())
 
 if __name__ == "__main__":
     loader = DataLoader("../../data/raw")
@@ -0,0 +1,276 @@
+"""Build-time entity resolution: hierarchy by blocking, spelling variants by MinHash LSH.
+
+Raw names are node keys as-is, so "原发性高血压(2型)", "原发性高血压" and "高血压",
+or "阿司匹林片(100mg)" and "阿司匹林缓释片(100mg)", end up unrelated. Two stages,
+neither compares all pairs of names:
+
+1. Blocking. Known qualifiers (subtype, disease prefix; batch, dosage, dosage
+   form) are stripped one at a time. Each name gets IS_A to the nearest
+   stripped form that is itself a node; names without one are grouped by their
+   core term, and a core shared by at least two of them becomes a new node.
+2. MinHash LSH over the character bigrams of the names left without a parent
+   (the roots of step 1), per entity type. Pairs sharing a band bucket are
+   verified by exact Jaccard; clusters get ALIAS_OF to one canonical spelling
+   ("高血压病" -> "高血压").
+
+The alias map (aliases.json) lets the retriever seed queries with canonical names.
+"""
+import json
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+try:
+    from .ontology import EntityType, RelationType
+except ImportError:
+    from ontology import EntityType, RelationType
+
+ALIAS_FILE = "aliases.json"
+
+DISEASE_PREFIXES = ("原发性", "继发性", "复发性", "急性", "慢性", "老年", "小儿", "早期", "晚期")
+DRUG_FORMS = ("缓释片", "分散片", "肠溶片", "软胶囊", "胶囊", "注射液", "口服液", "颗粒", "滴丸", "栓剂", "片")
+
+_PAREN = r"[(（]{}[)）]$"
+_SUBTYPE = re.compile(_PAREN.format(r"\d+型"))
+_DOSAGE = re.compile(_PAREN.format(r"[\d.]+\s*(?:mg|g|ml|μg|ug|iu|万?单位)"), re.IGNORECASE)
+_BATCH = re.compile(r"·\d+号$")
+# Branch of a nursing home chain: "泰康之家·燕园 (北京分院 18部)"
+_BRANCH = re.compile(r"\s*[(（][^()（）]*分院[^()（）]*[)）]$")
+
+# 常见俗称 -> 图谱中的标准名称 (lay terms users type instead of the catalog name);
+# extra rows of the fuzzy name indexes, only used for names present in the graph
+COMMON_ALIASES = {
+    "老年痴呆": "阿尔茨海默病",
+    "老年痴呆症": "阿尔茨海默病",
+    "中风": "脑卒中",
+    "脑中风": "脑卒中",
+    "慢阻肺": "慢性阻塞性肺疾病",
+    "哮喘": "支气管哮喘",
+    "心衰": "心力衰竭",
+    "肾衰": "肾功能不全",
+    "帕金森病": "帕金森",
+    "骨松": "骨质疏松",
+}
+
+
+def _strip_pattern(pattern):
+    return lambda name: pattern.sub("", name)
+
+
+def _strip_prefix(prefixes):
+    def strip(name):
+        for p in prefixes:
+            if name.startswith(p) and len(name) > len(p):
+                return name[len(p):]
+        return name
+    return strip
+
+
+def _strip_suffix(suffixes):
+    def strip(name):
+        for s in suffixes:
+            if name.endswith(s) and len(name) > len(s):
+                return name[:-len(s)]
+        return name
+    return strip
+
+
+# Outermost qualifier first; every rule is applied at most once per name
+QUALIFIERS = {
+    EntityType.DISEASE.value: [_strip_pattern(_SUBTYPE), _strip_prefix(DISEASE_PREFIXES)],
+    EntityType.DRUG.value: [_strip_pattern(_BATCH), _strip_pattern(_DOSAGE), _strip_suffix(DRUG_FORMS)],
+}
+
+
+def generalizations(name, entity_type):
+    """Progressively stripped forms of name, most specific first ("阿司匹林片(50mg)" -> ["阿司匹林片", "阿司匹林"])."""
+    chain, current = [], name
+    for rule in QUALIFIERS.get(entity_type, ()):
+        stripped = rule(current).strip()
+        if stripped and stripped != current:
+            chain.append(stripped)
+            current = stripped
+    return chain
+
+
+# === MinHash LSH ===
+
+_PRIME = (1 << 31) - 1
+
+
+def shingles(name, n=2):
+    if len(name) <= n:
+        return {name}
+    return {name[i:i + n] for i in range(len(name) - n + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def minhash_signatures(shingle_sets, num_perm=64, seed=1, chunk_rows=20000):
+    """(len(shingle_sets), num_perm) uint64 signatures, h_i(x) = (a_i * x + b_i) mod 2^31-1."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _PRIME, num_perm).astype(np.uint64)[:, None]
+    b = rng.randint(0, _PRIME, num_perm).astype(np.uint64)[:, None]
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for start in range(0, len(shingle_sets), chunk_rows):
+        chunk = shingle_sets[start:start + chunk_rows]
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        x = np.fromiter((zlib.crc32(g.encode("utf-8")) % _PRIME for s in chunk for g in s),
+                        dtype=np.uint64, count=int(lengths.sum()))
+        hashed = (a * x[None, :] + b) % _PRIME
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return signatures
+
+
+def lsh_candidates(signatures, bands=16, max_bucket=50):
+    """Index pairs (i < j) whose signatures agree on at least one band of rows.
+
+    Buckets larger than max_bucket (very common short names) are skipped, which
+    keeps the candidate count linear in the number of names.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    mix = np.random.RandomState(0).randint(1, 1 << 62, rows).astype(np.uint64)
+    pairs = set()
+    for band in range(bands):
+        # Collisions of this combined key only add candidates; they are verified afterwards
+        keys = (signatures[:, band * rows:(band + 1) * rows] * mix).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for bucket in np.split(order, bounds):
+            if 1 < len(bucket) <= max_bucket:
+                members = sorted(bucket.tolist())
+                pairs.update((members[i], members[j]) for i in range(len(members))
+                             for j in range(i + 1, len(members)))
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def alias_clusters(names, threshold=0.6, num_perm=64, bands=16):
+    """Groups of near-identical names (bigram Jaccard >= threshold), found through LSH."""
+    if len(names) < 2:
+        return []
+    sets = [shingles(n) for n in names]
+    candidates = lsh_candidates(minhash_signatures(sets, num_perm), bands)
+    uf = _UnionFind(len(names))
+    for i, j in candidates:
+        # Digits carry dosages / subtypes / editions: names differing in them are different entities
+        if re.sub(r"\D", "", names[i]) != re.sub(r"\D", "", names[j]):
+            continue
+        if jaccard(sets[i], sets[j]) >= threshold:
+            uf.union(i, j)
+    groups = {}
+    for i in range(len(names)):
+        groups.setdefault(uf.find(i), []).append(names[i])
+    return [g for g in groups.values() if len(g) > 1]
+
+
+# === Resolution ===
+
+class Resolution:
+    def __init__(self):
+        self.created = []    # (name, entity type) of new core nodes
+        self.edges = []      # (u, v, relation)
+        self.aliases = {}    # alias -> canonical name
+        self.stats = {}
+
+
+def resolve(nodes, degree=None, min_block=2, threshold=0.6):
+    """Resolves (name, entity type) pairs; degree(name) breaks ties when choosing a canonical name."""
+    start = time.perf_counter()
+    degree = degree or (lambda name: 0)
+    result = Resolution()
+    types = {}
+    for name, entity_type in nodes:
+        types[name] = entity_type
+
+    # 1. Blocking on core terms: IS_A to the nearest existing generalization
+    blocks = {}
+    roots = {}
+    for name, entity_type in types.items():
+        chain = generalizations(name, entity_type)
+        if not chain:
+            roots.setdefault(entity_type, []).append(name)
+            continue
+        parent = next((g for g in chain if types.get(g) == entity_type), None)
+        if parent is not None:
+            result.edges.append((name, parent, RelationType.IS_A.value))
+        else:
+            blocks.setdefault((entity_type, chain[-1]), []).append(name)
+    for (entity_type, core), members in blocks.items():
+        if len(members) >= min_block and core not in types:
+            result.created.append((core, entity_type))
+            result.edges.extend((m, core, RelationType.IS_A.value) for m in members)
+            roots.setdefault(entity_type, []).append(core)
+        else:
+            roots.setdefault(entity_type, []).extend(members)
+
+    # 2. MinHash LSH among the roots of each type
+    for entity_type, names in roots.items():
+        if entity_type not in QUALIFIERS:
+            continue  # products, homes, locations: near-identical names are distinct entities
+        for cluster in alias_clusters(sorted(names), threshold):
+            canonical = min(cluster, key=lambda n: (-degree(n), len(n), n))
+            for name in cluster:
+                if name != canonical:
+                    result.aliases[name] = canonical
+                    result.edges.append((name, canonical, RelationType.ALIAS_OF.value))
+
+    result.stats = {"names": len(types), "is_a": sum(e[2] == RelationType.IS_A.value for e in result.edges),
+                    "aliases": len(result.aliases), "created": len(result.created),
+                    "seconds": time.perf_counter() - start}
+    return result
+
+
+def lookup_aliases(names):
+    """Extra (alias, name) rows for the fuzzy name indexes, which only keep those of known names.
+
+    Lay terms from COMMON_ALIASES, and the chain name of each nursing home
+    branch ("泰康之家·燕园" -> every "泰康之家·燕园 (...分院...)"), which users
+    type without the branch. Not graph edges: a branch is a separate entity.
+    """
+    yield from COMMON_ALIASES.items()
+    for name in names:
+        m = _BRANCH.search(name)
+        if m and m.start() > 0:
+            yield name[:m.start()], name
+
+
+def save_aliases(aliases, output_path):
+    path = os.path.join(output_path, ALIAS_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(aliases, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_aliases(output_path):
+    """alias -> canonical name ({} if the graph was built without resolution)."""
+    try:
+        with open(os.path.join(output_path, ALIAS_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
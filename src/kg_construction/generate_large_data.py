@@ -1,12 +1,18 @@
-import random
+import argparse
+import bisect
+import heapq
 import json
 import os
+import random
+import time
+from array import array
+from itertools import accumulate
+from multiprocessing import Pool
 
 # 配置路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Fix: Path should be ../../data/raw relative to src/kg_construction
 raw_data_path = os.path.join(current_dir, "../../data/raw")
-os.makedirs(raw_data_path, exist_ok=True)
 
 # === 基础词库 ===
 departments = ["心血管内科", "神经内科", "内分泌科", "呼吸内科", "消化内科", "肿瘤科", "骨科", "老年病科"]
@@ -18,162 +24,207 @@ dosages = ["10mg", "20mg", "50mg", "100mg", "0.5g", "0.25g", "5ml", "10ml"]
 
 insurance_adjectives = ["全能", "乐享", "安康", "长寿", "无忧", "尊享", "惠民", "百万", "终身", "特定", "至尊", "卓越", "守护", "关爱", "安心"]
 insurance_types = ["医疗险", "重疾险", "护理险", "意外险", "防癌险"]
+insurance_letters = ["A", "B", "C", "Pro", "Plus", "2026版"]
 
 services = ["独立生活", "协助生活", "专业护理", "记忆照护", "康复训练", "老年大学", "居家上门", "陪诊服务", "临终关怀", "中医理疗"]
 locations = ["北京", "上海", "广州", "深圳", "成都", "武汉", "杭州", "苏州", "南京", "天津"]
 nursing_names = ["泰康之家·燕园", "泰康之家·申园", "泰康之家·粤园", "泰康之家·蜀园", "泰康之家·楚园", "泰康之家·吴园", "泰康之家·苏园", "幸福人家", "夕阳红公寓", "松鹤楼", "颐和山庄"]
 
-# === 生成逻辑 ===
-
-def generate_diseases(count=250):
-    diseases = []
-    generated_names = set()
-    
-    # 保证核心疾病都在
-    for d in disease_cores:
-        name = d
-        if name not in generated_names:
-            dept = random.choice(departments) # 简化逻辑：随机分配科室
-            diseases.append({
-                "疾病名称": name,
-                "相关科室": dept,
-                "常用药物": [],
-                "饮食建议": "清淡饮食，遵医嘱。",
-                "护理建议": "定期复查，注意休息。"
-            })
-            generated_names.add(name)
-
-    while len(diseases) < count:
-        core = random.choice(disease_cores)
-        prefix = random.choice(disease_prefixes)
-        name = f"{prefix}{core}"
-        
-        if name in generated_names:
-            name = f"{name}({random.randint(1,3)}型)"
-        
-        if name not in generated_names:
-            dept = random.choice(departments)
-            diseases.append({
-                "疾病名称": name,
-                "相关科室": dept,
-                "常用药物": [],
-                "饮食建议": "低盐低脂，避免劳累。",
-                "护理建议": "监测生命体征。"
-            })
-            generated_names.add(name)
-            
-    return diseases
-
-def generate_drugs(count=200):
-    drugs = []
-    generated_names = set()
-    while len(drugs) < count:
-        core = random.choice(drug_cores)
-        suffix = random.choice(drug_suffixes)
-        dosage = random.choice(dosages)
-        # 增加剂量组合以扩大样本空间
-        name = f"{core}{suffix}({dosage})"
-        if name not in generated_names:
-            drugs.append(name)
-            generated_names.add(name)
-        
-        # 安全退出机制，防止死循环
-        if len(generated_names) >= len(drug_cores) * len(drug_suffixes) * len(dosages):
-             print("Warning: Max possible drug combinations reached.")
-             break
-    return list(generated_names)
-
-def generate_insurances(count=60, disease_list=[]):
-    products = []
-    generated_names = set()
-    
-    for _ in range(count):
-        adj = random.choice(insurance_adjectives)
-        itype = random.choice(insurance_types)
-        letter = random.choice(["A", "B", "C", "Pro", "Plus", "2026版"])
-        name = f"泰康{adj}{itype} {letter}"
-        
-        if name not in generated_names:
-            # 随机覆盖 5-15 种疾病
-            covered = random.sample([d["疾病名称"] for d in disease_list], k=random.randint(5, 15))
-            
-            products.append({
-                "产品名称": name,
-                "适用年龄": f"{random.randint(0, 60)}-{random.randint(70, 100)}岁",
-                "保险责任": f"提供{itype}相关保障，包含住院津贴。",
-                "且覆盖疾病": "，".join(covered),
-                "特别说明": "具体条款以合同为准。"
-            })
-            generated_names.add(name)
-    return products
-
-def generate_nursing_homes(count=30):
-    homes = []
-    for i in range(count):
-        base_name = random.choice(nursing_names)
-        loc = random.choice(locations)
-        # 避免重名
-        name = f"{base_name} ({loc}分院 {i+1}部)"
-        
-        my_services = random.sample(services, k=random.randint(3, 8))
-        
-        homes.append({
-            "name": name,
-            "location": loc,
-            "services": my_services,
-            "price_range": f"{random.randint(5000, 20000)}-{random.randint(21000, 50000)}/月"
-        })
-    return homes
+# === 确定性命名 ===
+# Names are a pure function of the entity index (mixed radix over the word lists,
+# with a serial suffix once the combinations run out), so there is no ceiling on
+# the count, no duplicate-retry loop, and no global name set to keep in memory.
+
+def disease_name(i):
+    if i < len(disease_cores):
+        return disease_cores[i]  # 保证核心疾病都在
+    i -= len(disease_cores)
+    core = disease_cores[i % len(disease_cores)]
+    i //= len(disease_cores)
+    prefix = disease_prefixes[i % len(disease_prefixes)]
+    variant = i // len(disease_prefixes)
+    return f"{prefix}{core}" if variant == 0 else f"{prefix}{core}({variant}型)"
+
+def drug_name(i):
+    core = drug_cores[i % len(drug_cores)]
+    i //= len(drug_cores)
+    suffix = drug_suffixes[i % len(drug_suffixes)]
+    i //= len(drug_suffixes)
+    dosage = dosages[i % len(dosages)]
+    batch = i // len(dosages)
+    return f"{core}{suffix}({dosage})" if batch == 0 else f"{core}{suffix}({dosage})·{batch}号"
+
+def insurance_type(i):
+    return insurance_types[(i // len(insurance_adjectives)) % len(insurance_types)]
+
+def insurance_name(i):
+    adj = insurance_adjectives[i % len(insurance_adjectives)]
+    itype = insurance_type(i)
+    i //= len(insurance_adjectives) * len(insurance_types)
+    letter = insurance_letters[i % len(insurance_letters)]
+    edition = i // len(insurance_letters)
+    name = f"泰康{adj}{itype} {letter}"
+    return name if edition == 0 else f"{name} 第{edition + 1}款"
+
+def nursing_home_name(i, base_name, loc):
+    # 避免重名: the running index keeps names unique
+    return f"{base_name} ({loc}分院 {i + 1}部)"
+
+# === 度分布 ===
+
+_zipf_cache = {}
+
+def _zipf_cumulative(n, alpha):
+    key = (n, alpha)
+    if key not in _zipf_cache:
+        _zipf_cache[key] = array("d", accumulate(1.0 / (rank + 1) ** alpha for rank in range(n)))
+    return _zipf_cache[key]
+
+def sample_targets(rng, n, k, dist="uniform", alpha=1.2):
+    """k distinct indices in [0, n). 'powerlaw' picks index r with probability ~ 1/(r+1)^alpha."""
+    k = min(k, n)
+    if k <= 0:
+        return []
+    if dist == "uniform":
+        return rng.sample(range(n), k)
+    cumulative = _zipf_cumulative(n, alpha)
+    total = cumulative[-1]
+    chosen = []
+    seen = set()
+    # Rejection is cheap while k is small next to n; when most of the mass is
+    # already taken it stalls, so stop after a bounded number of repeats
+    misses = 0
+    while len(chosen) < k and misses <= 2 * k + 16:
+        r = bisect.bisect_left(cumulative, rng.random() * total)
+        if r not in seen:
+            seen.add(r)
+            chosen.append(r)
+        else:
+            misses += 1
+    if len(chosen) < k:
+        # Weighted shuffle of the rest: key u ** (1 / w) with w = 1 / (r + 1) ** alpha
+        chosen += heapq.nlargest(k - len(chosen), (r for r in range(n) if r not in seen),
+                                 key=lambda r: rng.random() ** ((r + 1) ** alpha))
+    return chosen
+
+# === 分块渲染 ===
+# Every chunk gets its own RNG seeded from (seed, kind, chunk index), so the output
+# is byte-identical for any worker count as long as seed and chunk_size match.
+
+def _render_chunk(task):
+    kind, chunk_index, start, end, cfg = task
+    rng = random.Random(f"{cfg['seed']}:{kind}:{chunk_index}")
+    out = []
+    if kind == "medical":
+        for i in range(start, end):
+            core = i < len(disease_cores)
+            d_drugs = [drug_name(j) for j in sample_targets(rng, cfg["drugs"], rng.randint(1, 3),
+                                                             cfg["drug_dist"], cfg["alpha"])]
+            out.append(f"疾病名称: {disease_name(i)}\n"
+                       f"相关科室: {rng.choice(departments)}\n"
+                       f"常用药物: {'，'.join(d_drugs)}\n"
+                       f"饮食建议: {'清淡饮食，遵医嘱。' if core else '低盐低脂，避免劳累。'}\n"
+                       f"护理建议: {'定期复查，注意休息。' if core else '监测生命体征。'}\n"
+                       "\n")
+    elif kind == "insurance":
+        for i in range(start, end):
+            name = insurance_name(i)
+            itype = insurance_type(i)
+            k = rng.randint(cfg["coverage_min"], cfg["coverage_max"])
+            covered = [disease_name(j) for j in sample_targets(rng, cfg["diseases"], k,
+                                                               cfg["coverage_dist"], cfg["alpha"])]
+            out.append(f"产品名称: {name}\n"
+                       f"适用年龄: {rng.randint(0, 60)}-{rng.randint(70, 100)}岁\n"
+                       f"保险责任: 提供{itype}相关保障，包含住院津贴。\n"
+                       f"且覆盖疾病: {'，'.join(covered)}\n"
+                       "特别说明: 具体条款以合同为准。\n"
+                       "\n")
+    elif kind == "nursing":
+        for i in range(start, end):
+            base_name = rng.choice(nursing_names)
+            loc = rng.choice(locations)
+            home = {
+                "name": nursing_home_name(i, base_name, loc),
+                "location": loc,
+                "services": rng.sample(services, k=rng.randint(3, 8)),
+                "price_range": f"{rng.randint(5000, 20000)}-{rng.randint(21000, 50000)}/月"
+            }
+            out.append(json.dumps(home, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+        return "    " + ",\n    ".join(out)
+    return "".join(out)
+
+def _tasks(kind, count, cfg):
+    size = cfg["chunk_size"]
+    for chunk_index, start in enumerate(range(0, count, size)):
+        yield kind, chunk_index, start, min(start + size, count), cfg
+
+def generate_corpus(out_dir, seed=42, diseases=300, drugs=300, products=100, homes=50,
+                    coverage_dist="uniform", coverage_min=5, coverage_max=15, drug_dist="uniform",
+                    alpha=1.2, workers=1, chunk_size=10000):
+    """Writes the three raw files for the given target counts, streaming chunk by chunk.
+
+    Returns the number of entities written per file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cfg = {"seed": seed, "diseases": diseases, "drugs": drugs, "coverage_dist": coverage_dist,
+           "coverage_min": coverage_min, "coverage_max": coverage_max, "drug_dist": drug_dist,
+           "alpha": alpha, "chunk_size": chunk_size}
+    files = [("medical", "medical_guidelines.txt", diseases),
+             ("insurance", "insurance_clauses.txt", products),
+             ("nursing", "nursing_homes.json", homes)]
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        for kind, file_name, count in files:
+            tasks = _tasks(kind, count, cfg)
+            chunks = pool.imap(_render_chunk, tasks) if pool else map(_render_chunk, tasks)
+            with open(os.path.join(out_dir, file_name), "w", encoding="utf-8") as f:
+                if kind == "nursing":
+                    f.write("[\n")
+                    for n, chunk in enumerate(chunks):
+                        f.write((",\n" if n else "") + chunk)
+                    f.write("\n]" if count else "]")
+                else:
+                    for chunk in chunks:
+                        f.write(chunk)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return {kind: count for kind, _, count in files}
 
 # === 执行生成并写入文件 ===
 def main():
+    parser = argparse.ArgumentParser(description="Seeded synthetic corpus generator for load and scale testing.")
+    parser.add_argument("--out", default=raw_data_path, help="output directory for the three raw files")
+    parser.add_argument("--seed", type=int, default=42)
+    # 默认规模：300 疾病、300 药品、100 保险产品、50 养老机构
+    parser.add_argument("--diseases", type=int, default=300)
+    parser.add_argument("--drugs", type=int, default=300)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--homes", type=int, default=50)
+    parser.add_argument("--coverage-dist", choices=["uniform", "powerlaw"], default="uniform",
+                        help="how products pick covered diseases")
+    parser.add_argument("--coverage-min", type=int, default=5)
+    parser.add_argument("--coverage-max", type=int, default=15)
+    parser.add_argument("--drug-dist", choices=["uniform", "powerlaw"], default="uniform",
+                        help="how diseases pick their drugs")
+    parser.add_argument("--alpha", type=float, default=1.2, help="power-law exponent")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="records per chunk; part of the reproducibility key together with --seed")
+    args = parser.parse_args()
+
     print("Generating synthetic data...")
-    
-    # 1. Medical Data
-    # 增加数量以确保覆盖 500+实体和 1000+关系
-    drugs = generate_drugs(300)      # 300 药品实体
-    diseases = generate_diseases(300) # 300 疾病实体
-    
-    # 关联药品到疾病 (关系：Treats)
-    # 每个疾病关联 1-3 个药品
-    for d in diseases:
-        d_drugs = random.sample(drugs, k=random.randint(1, 3))
-        d["常用药物"] = "，".join(d_drugs)
-        
-    print(f"Generated {len(diseases)} diseases and {len(drugs)} drugs.")
-    
-    # 写入 medical_guidelines.txt
-    with open(os.path.join(raw_data_path, "medical_guidelines.txt"), "w", encoding="utf-8") as f:
-        for d in diseases:
-            f.write(f"疾病名称: {d['疾病名称']}\n")
-            f.write(f"相关科室: {d['相关科室']}\n")
-            f.write(f"常用药物: {d['常用药物']}\n")
-            f.write(f"饮食建议: {d['饮食建议']}\n")
-            f.write(f"护理建议: {d['护理建议']}\n")
-            f.write("\n") # Block separator
-
-    # 2. Insurance Data
-    # 100 保险产品实体
-    insurances = generate_insurances(100, diseases)
-    print(f"Generated {len(insurances)} insurance products.")
-    
-    with open(os.path.join(raw_data_path, "insurance_clauses.txt"), "w", encoding="utf-8") as f:
-        for p in insurances:
-            f.write(f"产品名称: {p['产品名称']}\n")
-            f.write(f"适用年龄: {p['适用年龄']}\n")
-            f.write(f"保险责任: {p['保险责任']}\n")
-            f.write(f"且覆盖疾病: {p['且覆盖疾病']}\n")
-            f.write(f"特别说明: {p['特别说明']}\n")
-            f.write("\n")
-
-    # 3. Nursing Data
-    # 50 养老机构实体
-    homes = generate_nursing_homes(50)
-    print(f"Generated {len(homes)} nursing homes.")
-    
-    with open(os.path.join(raw_data_path, "nursing_homes.json"), "w", encoding="utf-8") as f:
-        json.dump(homes, f, ensure_ascii=False, indent=4)
-        
+    start = time.perf_counter()
+    counts = generate_corpus(args.out, seed=args.seed, diseases=args.diseases, drugs=args.drugs,
+                             products=args.products, homes=args.homes, coverage_dist=args.coverage_dist,
+                             coverage_min=args.coverage_min, coverage_max=args.coverage_max,
+                             drug_dist=args.drug_dist, alpha=args.alpha, workers=args.workers,
+                             chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {counts['medical']} diseases, {counts['insurance']} insurance products and "
+          f"{counts['nursing']} nursing homes in {elapsed:.2f}s.")
     print("All data generated successfully!")
 
 if __name__ == "__main__":
@@ -1,110 +1,565 @@
+import argparse
 import networkx as nx
 import os
 import pickle
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 try:
     from .data_loader import DataLoader
     from .ontology import EntityType, RelationType
+    from .csr_graph import CSRGraph
+    from .graph_shards import write_shards
+    from .query_index import save_query_index
+    from .context_fragments import save_fragments
+    from .sqlite_graph import SQLiteGraphWriter, SQLITE_FILE
+    from .node_store import NodeStore, STORE_FILE
+    from .manifest import record_artifacts, finish_build
+    from .entity_resolution import resolve, save_aliases, ALIAS_FILE
+    from .incremental import (SOURCES, BuildState, file_hash, source_hash, fingerprinting, diff_fingerprints,
+                              chain, record_digest)
+    from .neo4j_export import export_csv, export_unwind_cypher, cypher_string, cypher_identifier
 except ImportError:
     from data_loader import DataLoader
     from ontology import EntityType, RelationType
+    from csr_graph import CSRGraph
+    from graph_shards import write_shards
+    from query_index import save_query_index
+    from context_fragments import save_fragments
+    from sqlite_graph import SQLiteGraphWriter, SQLITE_FILE
+    from node_store import NodeStore, STORE_FILE
+    from manifest import record_artifacts, finish_build
+    from entity_resolution import resolve, save_aliases, ALIAS_FILE
+    from incremental import (SOURCES, BuildState, file_hash, source_hash, fingerprinting, diff_fingerprints,
+                             chain, record_digest)
+    from neo4j_export import export_csv, export_unwind_cypher, cypher_string, cypher_identifier
+
+# Blank-line separated clause files (DataLoader.iter_blocks); build_parallel splits these by byte range
+BLOCK_SOURCES = ("insurance", "medical")
 
 class GraphBuilder:
-    def __init__(self, data_path, output_path):
-        self.loader = DataLoader(data_path)
+    def __init__(self, data_path, output_path, pdf_workers=1):
+        # Records parsed from policy PDFs are cached by file content next to the graph
+        self.loader = DataLoader(data_path, pdf_workers=pdf_workers,
+                                 pdf_cache_dir=os.path.join(output_path, "pdf_cache"))
         self.output_path = output_path
         self.G = nx.MultiDiGraph()
 
-    def build_graph(self):
+    def build_graph(self, incremental=False, workers=1, part_bytes=1 << 22, resolve_entities=False):
+        state = BuildState.load(self.output_path) if incremental else None
+        kg_path = os.path.join(self.output_path, "kg.pkl")
+        # The state is only valid for the exact kg.pkl it was recorded with
+        if state is not None and os.path.exists(kg_path) and state.graph_hash == file_hash(kg_path):
+            self.build_incremental(state, resolve_entities)
+            return
+        if incremental:
+            print("No matching build state found, falling back to a full build.")
+
         print("Starting Graph Construction...")
-        # 1. Process Insurance
-        ins_data = self.loader.load_insurance_data()
-        for item in ins_data:
-            p_name = item.get("产品名称")
-            if not p_name: continue
-            
-            # Create Node
-            self.G.add_node(p_name, type=EntityType.INSURANCE_PRODUCT.value, 
-                            age_limit=item.get("适用年龄"), 
-                            special_note=item.get("特别说明"))
-            
-            # Relations
-            covered_diseases = item.get("且覆盖疾病", "").replace("，", ",").split(",")
-            for d in covered_diseases:
-                d = d.strip()
-                if d:
-                    self.G.add_node(d, type=EntityType.DISEASE.value) # Ensure node exists
-                    self.G.add_edge(p_name, d, relation=RelationType.COVERS_DISEASE.value)
+        # Records are streamed from the raw files, so memory is bounded by the graph, not the corpus
+        state = BuildState()
+        start = time.perf_counter()
+        if workers > 1:
+            count = self.build_parallel(state, workers, part_bytes)
+        else:
+            count = 0
+            for source, item in self.iter_records(state):
+                getattr(self, f"add_{source}_record")(item)
+                count += 1
+        elapsed = time.perf_counter() - start
+
+        print(f"Graph built with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges "
+              f"from {count} records in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} records/s, {workers} workers).")
+        if resolve_entities:
+            self.resolve_entities()
+        self.save_graph()
+        state.graph_hash = file_hash(kg_path)
+        state.save(self.output_path)
+
+    def iter_records(self, state):
+        """Streams (source, record) in build order, fingerprinting each source into state."""
+        for source, file_name, iter_name, key in SOURCES:
+            fingerprints = {}
+            for item in fingerprinting(getattr(self.loader, iter_name)(), key, fingerprints):
+                yield source, item
+            state.sources[source] = {"hash": source_hash(os.path.join(self.loader.raw_data_path, file_name)),
+                                     "records": fingerprints}
+
+    def build_parallel(self, state, workers, part_bytes):
+        """Parses and builds the raw files in a process pool and merges the shards in order.
+
+        Each task reads its own part of a raw file (a byte range of the clause
+        files cut at block boundaries, or the whole nursing-home file), so parsing
+        runs in the workers and only finished shards and record digests come back.
+        Shards are merged in record order, so node order, attribute values and edge
+        keys come out identical to the serial build. At most 2 * workers parts are
+        in flight. Policy PDFs are extracted by their own process pool
+        (--pdf-workers) and built here.
+        """
+        nodes, edges, count = {}, [], 0
+        tasks = []
+        for source, file_name, iter_name, key in SOURCES:
+            if source == "policy_pdf":
+                continue
+            path = os.path.join(self.loader.raw_data_path, file_name)
+            ranges = [None]
+            if source in BLOCK_SOURCES:
+                parts = max(workers, -(-os.path.getsize(path) // part_bytes))
+                ranges = self.loader.block_ranges(path, parts)
+            tasks += [(source, file_name, iter_name, key, r) for r in ranges]
+
+        fingerprints = {source: {} for source, _, _, _ in SOURCES}
+
+        def merge(result):
+            source, shard, digests, records = result
+            ShardBuilder.merge(nodes, edges, shard)
+            for k, digest in digests:
+                fingerprints[source][k] = chain(fingerprints[source].get(k), digest)
+            return records
+
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for task in tasks:
+                pending.append(pool.submit(build_part, self.loader.raw_data_path, *task))
+                if len(pending) >= 2 * workers:
+                    count += merge(pending.popleft().result())
+            while pending:
+                count += merge(pending.popleft().result())
+        pdf_records = list(fingerprinting(self.loader.iter_pdf_data(), "产品名称", fingerprints["policy_pdf"]))
+        ShardBuilder.merge(nodes, edges, build_shard(("policy_pdf", item) for item in pdf_records))
+        count += len(pdf_records)
+
+        for source, file_name, _, _ in SOURCES:
+            state.sources[source] = {"hash": source_hash(os.path.join(self.loader.raw_data_path, file_name)),
+                                     "records": fingerprints[source]}
+        self.G.add_nodes_from(nodes.items())
+        self.G.add_edges_from(edges)
+        return count
+
+    def build_incremental(self, state, resolve_entities=False):
+        """Applies only the record-level deltas since the last build to the saved graph."""
+        print("Starting Incremental Graph Update...")
+        with open(os.path.join(self.output_path, "kg.pkl"), "rb") as f:
+            self.G = pickle.load(f)
+
+        touched = set()
+        dirty = False
+        for source, file_name, iter_name, key in SOURCES:
+            digest = source_hash(os.path.join(self.loader.raw_data_path, file_name))
+            old = state.sources.get(source, {"hash": None, "records": {}})
+            if old["hash"] == digest:
+                continue
+            dirty = True
+
+            # Pass 1: fingerprint the new file; pass 2: re-apply only the affected records
+            fingerprints = {}
+            for _ in fingerprinting(getattr(self.loader, iter_name)(), key, fingerprints):
+                pass
+            added, changed, removed = diff_fingerprints(old["records"], fingerprints)
+            print(f"{source}: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+
+            remove_record = getattr(self, f"remove_{source}_record")
+            for k in changed | removed:
+                touched |= remove_record(k)
+            add_record = getattr(self, f"add_{source}_record")
+            for item in getattr(self.loader, iter_name)():
+                if item.get(key) in added or item.get(key) in changed:
+                    add_record(item)
+
+            state.sources[source] = {"hash": digest, "records": fingerprints}
+
+        if not dirty:
+            print("Raw data unchanged, graph is up to date.")
+            return
+
+        # Resolution edges are recomputed below and must not keep orphans alive
+        self.clear_resolution()
+        # Drop nodes left without edges unless a raw record still owns them
+        primary = state.primary_keys()
+        for node in touched:
+            if self.G.has_node(node) and self.G.degree(node) == 0 and node not in primary:
+                self.G.remove_node(node)
+
+        if resolve_entities:
+            self.resolve_entities()
+        print(f"Graph updated to {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges.")
+        self.save_graph()
+        state.graph_hash = file_hash(os.path.join(self.output_path, "kg.pkl"))
+        state.save(self.output_path)
+
+    def resolve_entities(self):
+        """Links name variants (see entity_resolution.py): IS_A to the nearest more general
+        entity, ALIAS_OF to a canonical spelling. Re-running replaces the previous result."""
+        self.clear_resolution()
+        result = resolve(((n, t) for n, t in self.G.nodes(data="type")), degree=self.G.degree)
+        for name, entity_type in result.created:
+            self.put_node(name, {"type": entity_type})
+        for u, v, relation in result.edges:
+            self.put_edge(u, v, relation)
+        self.G.graph["resolution_nodes"] = [name for name, _ in result.created]
+        stats = result.stats
+        print(f"Entity resolution: {stats['is_a']} IS_A, {stats['aliases']} ALIAS_OF, "
+              f"{stats['created']} core entities added ({stats['seconds']:.2f}s).")
+
+    def clear_resolution(self):
+        resolved = {RelationType.IS_A.value, RelationType.ALIAS_OF.value}
+        self._remove_edges(list(self.G.edges(keys=True, data="relation")), resolved)
+        # Core nodes created by the last run, unless a record has attached edges to them since
+        created = self.G.graph.pop("resolution_nodes", [])
+        self.G.remove_nodes_from([n for n in created if self.G.has_node(n) and self.G.degree(n) == 0])
+
+    # === Per-record construction ===
+
+    def put_node(self, name, attrs, defaults=None):
+        """Creates or updates a node; defaults are only applied if the node is new."""
+        if defaults and not self.G.has_node(name):
+            self.G.add_node(name, **defaults)
+        self.G.add_node(name, **attrs)
+
+    def put_edge(self, u, v, relation, **attrs):
+        self.G.add_edge(u, v, relation=relation, **attrs)
+
+    def add_insurance_record(self, item, source="insurance"):
+        p_name = item.get("产品名称")
+        if not p_name: return
         
-        # 2. Process Medical
-        med_data = self.loader.load_medical_data()
-        for item in med_data:
-            d_name = item.get("疾病名称")
-            if not d_name: continue
-            
-            # Update or Create Node
-            if self.G.has_node(d_name):
-                self.G.nodes[d_name].update({"diet": item.get("饮食建议"), "care": item.get("护理建议")})
-            else:
-                self.G.add_node(d_name, type=EntityType.DISEASE.value,
-                                diet=item.get("饮食建议"), care=item.get("护理建议"))
-                                
-            # Department
-            dept = item.get("相关科室")
-            if dept:
-                self.G.add_node(dept, type=EntityType.DEPARTMENT.value)
-                self.G.add_edge(d_name, dept, relation=RelationType.BELONGS_TO.value)
-                
-            # Drugs
-            drugs = item.get("常用药物", "").replace("，", ",").split(",")
-            for drug in drugs:
-                drug = drug.strip()
-                if drug:
-                    self.G.add_node(drug, type=EntityType.DRUG.value)
-                    # Relations: Drug TREATS Disease
-                    self.G.add_edge(drug, d_name, relation=RelationType.TREATS.value)
-
-        # 3. Process Nursing
-        nurs_data = self.loader.load_nursing_data()
-        for item in nurs_data:
-            n_name = item["name"]
-            self.G.add_node(n_name, type=EntityType.NURSING_HOME.value, price=item["price_range"])
-            
-            loc = item["location"]
-            self.G.add_node(loc, type=EntityType.LOCATION.value)
-            self.G.add_edge(n_name, loc, relation=RelationType.LOCATED_IN.value)
+        # Create Node
+        self.put_node(p_name, {"type": EntityType.INSURANCE_PRODUCT.value,
+                               "age_limit": item.get("适用年龄"),
+                               "special_note": item.get("特别说明")})
+        
+        # Relations
+        covered_diseases = item.get("且覆盖疾病", "").replace("，", ",").split(",")
+        for d in covered_diseases:
+            d = d.strip()
+            if d:
+                self.put_node(d, {"type": EntityType.DISEASE.value}) # Ensure node exists
+                # Tagged with the source, so an incremental update of one source leaves the other's edges
+                self.put_edge(p_name, d, RelationType.COVERS_DISEASE.value, source=source)
+
+    def add_medical_record(self, item):
+        d_name = item.get("疾病名称")
+        if not d_name: return
+        
+        # Update or Create Node
+        self.put_node(d_name, {"diet": item.get("饮食建议"), "care": item.get("护理建议")},
+                      defaults={"type": EntityType.DISEASE.value})
+                            
+        # Department
+        dept = item.get("相关科室")
+        if dept:
+            self.put_node(dept, {"type": EntityType.DEPARTMENT.value})
+            self.put_edge(d_name, dept, RelationType.BELONGS_TO.value)
             
-            for svc in item["services"]:
-                self.G.add_node(svc, type=EntityType.SERVICE.value)
-                self.G.add_edge(n_name, svc, relation=RelationType.PROVIDES_SERVICE.value)
+        # Drugs
+        drugs = item.get("常用药物", "").replace("，", ",").split(",")
+        for drug in drugs:
+            drug = drug.strip()
+            if drug:
+                self.put_node(drug, {"type": EntityType.DRUG.value})
+                # Relations: Drug TREATS Disease
+                self.put_edge(drug, d_name, RelationType.TREATS.value)
 
-        print(f"Graph built with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges.")
-        self.save_graph()
+    def add_nursing_record(self, item):
+        n_name = item["name"]
+        self.put_node(n_name, {"type": EntityType.NURSING_HOME.value, "price": item["price_range"]})
+        
+        loc = item["location"]
+        self.put_node(loc, {"type": EntityType.LOCATION.value})
+        self.put_edge(n_name, loc, RelationType.LOCATED_IN.value)
+        
+        for svc in item["services"]:
+            self.put_node(svc, {"type": EntityType.SERVICE.value})
+            self.put_edge(n_name, svc, RelationType.PROVIDES_SERVICE.value)
+
+    def add_policy_pdf_record(self, item):
+        # Policy PDFs carry the same fields as insurance_clauses.txt
+        self.add_insurance_record(item, source="policy_pdf")
+
+    # Each record owns the edges it created, identified by relation type around its key node.
+    # remove_* drops them and returns the touched nodes for orphan cleanup.
+
+    def remove_insurance_record(self, p_name, source="insurance"):
+        if not self.G.has_node(p_name): return set()
+        # A product can be in insurance_clauses.txt and in policy PDFs; keep the other source's edges.
+        # Untagged edges (graphs built before edges carried a source) go with either.
+        edges = [(u, v, k, data.get("relation")) for u, v, k, data in self.G.out_edges(p_name, keys=True, data=True)
+                 if data.get("source", source) == source]
+        return self._remove_edges(edges, {RelationType.COVERS_DISEASE.value}) | {p_name}
+
+    def remove_medical_record(self, d_name):
+        if not self.G.has_node(d_name): return set()
+        touched = self._remove_edges(self.G.out_edges(d_name, keys=True, data="relation"),
+                                     {RelationType.BELONGS_TO.value})
+        touched |= self._remove_edges(self.G.in_edges(d_name, keys=True, data="relation"),
+                                      {RelationType.TREATS.value})
+        self.G.nodes[d_name].pop("diet", None)
+        self.G.nodes[d_name].pop("care", None)
+        return touched | {d_name}
+
+    def remove_nursing_record(self, n_name):
+        if not self.G.has_node(n_name): return set()
+        return self._remove_edges(self.G.out_edges(n_name, keys=True, data="relation"),
+                                  {RelationType.LOCATED_IN.value, RelationType.PROVIDES_SERVICE.value}) | {n_name}
+
+    def remove_policy_pdf_record(self, p_name):
+        return self.remove_insurance_record(p_name, source="policy_pdf")
+
+    def _remove_edges(self, edges, relations):
+        doomed = [(u, v, k) for u, v, k, rel in edges if rel in relations]
+        self.G.remove_edges_from(doomed)
+        return {n for u, v, _ in doomed for n in (u, v)}
 
     def save_graph(self):
-        # Save as pickle for easy python loading
-        with open(os.path.join(self.output_path, "kg.pkl"), "wb") as f:
+        # Save as pickle for easy python loading; write-then-rename so readers never see a partial file
+        kg_path = os.path.join(self.output_path, "kg.pkl")
+        with open(kg_path + ".tmp", "wb") as f:
             pickle.dump(self.G, f)
-        print(f"Graph saved to {os.path.join(self.output_path, 'kg.pkl')}")
+        os.replace(kg_path + ".tmp", kg_path)
+        print(f"Graph saved to {kg_path}")
+        # Written with every kg.pkl (also incremental builds) so the two never disagree
+        self.save_node_store()
+        aliases = {u: v for u, v, rel in self.G.edges(data="relation") if rel == RelationType.ALIAS_OF.value}
+        save_aliases(aliases, self.output_path)
+        # New snapshot version; the artifacts saved below are recorded under it (see manifest.py)
+        version = record_artifacts(self.output_path, ["kg.pkl", STORE_FILE, ALIAS_FILE], bump=True)
+        print(f"Graph snapshot version {version}")
+
+    def save_node_store(self):
+        # Dictionary-encoded node attributes with pre-rendered property strings (GraphRetriever reads these)
+        path = NodeStore.from_graph(self.G).save(self.output_path)
+        print(f"Node store saved to {path}")
+
+    def save_csr(self):
+        # Compact memory-mappable copy for read-only serving (GraphRetriever accepts *.csr)
+        csr_path = os.path.join(self.output_path, "kg.csr")
+        CSRGraph.from_networkx(self.G).save(csr_path)
+        record_artifacts(self.output_path, ["kg.csr"])
+        print(f"CSR graph saved to {csr_path}")
+
+    def save_shards(self):
+        # One pickle per domain plus a name index; GraphRetriever loads shards lazily from the directory
+        shard_dir = os.path.join(self.output_path, "kg_shards")
+        counts = write_shards(self.G, shard_dir)
+        record_artifacts(self.output_path, ["kg_shards"])
+        print(f"Graph shards saved to {shard_dir} ({', '.join(f'{k}: {v} nodes' for k, v in counts.items())})")
+
+    def save_query_index(self):
+        # Lookup tables for the fast path of RAGPipeline (disease/drug -> products, age ranges, homes)
+        path = save_query_index(self.G, self.output_path)
+        record_artifacts(self.output_path, [os.path.basename(path)])
+        print(f"Query index saved to {path}")
+
+    def save_fragments(self):
+        # Ranked, pre-rendered 1-hop context per entity; GraphRetriever assembles contexts from these
+        path, stats = save_fragments(self.G, self.output_path)
+        record_artifacts(self.output_path, [os.path.basename(path)])
+        print(f"Context fragments saved to {path} ({stats['units']} triples, {stats['hubs']} hubs left to "
+              f"live traversal, {stats['bytes'] / 2 ** 20:.1f} MB, {stats['seconds']:.2f}s)")
+
+    def finish_build(self):
+        # Serving processes pick up the new version only after this (see manifest.py)
+        version = finish_build(self.output_path)
+        print(f"Graph snapshot version {version} complete")
 
     def export_cypher(self):
-        # Generate Cypher statements (Mock)
+        # Generate Cypher statements (Mock). One statement per row; see export_bulk for large graphs.
         cypher_file = os.path.join(self.output_path, "import.cypher")
         with open(cypher_file, "w", encoding="utf-8") as f:
             for node, data in self.G.nodes(data=True):
                 labels = data.get("type", "Thing")
-                props = ", ".join([f"{k}: '{v}'" for k,v in data.items() if k != "type" and v])
-                f.write(f"MERGE (n:`{labels}` {{name: '{node}', {props}}});\n")
+                props = "".join([f", {cypher_identifier(k)}: {cypher_string(v)}" for k,v in data.items() if k != "type" and v])
+                f.write(f"MERGE (n:{cypher_identifier(labels)} {{name: {cypher_string(node)}{props}}});\n")
             
             for u, v, data in self.G.edges(data=True):
                 rel = data.get("relation", "RELATED_TO")
-                f.write(f"MATCH (a {{name: '{u}'}}), (b {{name: '{v}'}}) MERGE (a)-[:{rel}]->(b);\n")
+                f.write(f"MATCH (a {{name: {cypher_string(u)}}}), (b {{name: {cypher_string(v)}}}) "
+                        f"MERGE (a)-[:{cypher_identifier(rel)}]->(b);\n")
         print(f"Cypher exported to {cypher_file}")
 
+    def export_bulk(self, batch_size=1000):
+        """Index-friendly Neo4j export: neo4j-admin CSVs plus a batched UNWIND Cypher script."""
+        csv_dir = os.path.join(self.output_path, "neo4j")
+        node_files, rel_files = export_csv(self.G, csv_dir)
+        cypher_file = os.path.join(self.output_path, "import_bulk.cypher")
+        export_unwind_cypher(self.G, cypher_file, batch_size=batch_size)
+        print(f"Neo4j CSVs exported to {csv_dir}; offline import with:")
+        print("  neo4j-admin database import full "
+              + " ".join(f"--nodes={os.path.join(csv_dir, n)}" for n in node_files) + " "
+              + " ".join(f"--relationships={os.path.join(csv_dir, r)}" for r in rel_files))
+        print(f"Batched Cypher exported to {cypher_file} (run with cypher-shell -f)")
+
+class ShardBuilder(GraphBuilder):
+    """Runs the per-record logic of GraphBuilder against a compact shard buffer.
+
+    Nodes map to an ordered dict of key -> (value, is_default); edges are
+    (u, v, attributes) tuples. is_default marks values that only apply if the
+    node has no such attribute yet (the "update or create" disease case).
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = []
+
+    def put_node(self, name, attrs, defaults=None):
+        node = self.nodes.setdefault(name, {})
+        for k, v in (defaults or {}).items():
+            if k not in node:
+                node[k] = (v, True)
+        for k, v in attrs.items():
+            node[k] = (v, False)
+
+    def put_edge(self, u, v, relation, **attrs):
+        self.edges.append((u, v, dict(relation=relation, **attrs)))
+
+    @staticmethod
+    def merge(nodes, edges, shard):
+        """Folds a shard into the running node table and edge list, in shard order."""
+        shard_nodes, shard_edges = shard
+        for name, attrs in shard_nodes.items():
+            node = nodes.setdefault(name, {})
+            for k, (v, is_default) in attrs.items():
+                if not (is_default and k in node):
+                    node[k] = v
+        edges.extend(shard_edges)
+
+
+class SQLiteBuilder(GraphBuilder):
+    """Runs the per-record logic of GraphBuilder straight into kg.sqlite (see sqlite_graph.py).
+
+    Records are streamed from the raw files and written in batched
+    transactions; besides a bounded cache of node ids only the names and types
+    needed by entity resolution are held in memory, so the catalog may be
+    larger than RAM. Always a full build.
+    """
+
+    def __init__(self, data_path, output_path, pdf_workers=1, batch_size=10000):
+        super().__init__(data_path, output_path, pdf_workers)
+        self.G = None
+        self.batch_size = batch_size
+        self.writer = None
+
+    def build_graph(self, resolve_entities=False):
+        print("Starting SQLite Graph Construction...")
+        start = time.perf_counter()
+        path = os.path.join(self.output_path, SQLITE_FILE)
+        self.writer = SQLiteGraphWriter(path, self.batch_size)
+        count = 0
+        for source, item in self.iter_records(BuildState()):
+            getattr(self, f"add_{source}_record")(item)
+            count += 1
+        if resolve_entities:
+            self.writer.create_indexes()
+            result = resolve(self.writer.iter_nodes(), degree=self.writer.degree)
+            for name, entity_type in result.created:
+                self.put_node(name, {"type": entity_type})
+            for u, v, relation in result.edges:
+                self.put_edge(u, v, relation)
+            stats = result.stats
+            print(f"Entity resolution: {stats['is_a']} IS_A, {stats['aliases']} ALIAS_OF, "
+                  f"{stats['created']} core entities added ({stats['seconds']:.2f}s).")
+        stats = self.writer.close()
+        self.writer = None
+        elapsed = time.perf_counter() - start
+        record_artifacts(self.output_path, [SQLITE_FILE], bump=True)
+        finish_build(self.output_path)
+        print(f"SQLite graph saved to {path}: {stats['nodes']} nodes and {stats['edges']} edges from {count} "
+              f"records in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} records/s, "
+              f"{stats['bytes'] / 2 ** 20:.1f} MB).")
+
+    def put_node(self, name, attrs, defaults=None):
+        self.writer.put_node(name, attrs, defaults)
+
+    def put_edge(self, u, v, relation, **attrs):
+        # Edge sources only serve incremental updates, which this backend does not do
+        self.writer.put_edge(u, v, relation)
+
+
+def build_shard(records):
+    shard = ShardBuilder()
+    for source, item in records:
+        getattr(shard, f"add_{source}_record")(item)
+    return shard.nodes, shard.edges
+
+
+def build_part(data_path, source, file_name, iter_name, key, byte_range=None):
+    """Worker side of build_parallel: parses one part of a raw file and builds its records.
+
+    Returns (source, shard, [(record key, record digest)], record count).
+    """
+    loader = DataLoader(data_path)
+    if byte_range is None:
+        records = getattr(loader, iter_name)()
+    else:
+        records = loader.iter_blocks(os.path.join(data_path, file_name), *byte_range)
+    shard = ShardBuilder()
+    add_record = getattr(shard, f"add_{source}_record")
+    digests, count = [], 0
+    for item in records:
+        k = item.get(key)
+        if k:
+            digests.append((k, record_digest(item)))
+        add_record(item)
+        count += 1
+    return source, (shard.nodes, shard.edges), digests, count
+
+
+def benchmark_workers(data_path, worker_counts, part_bytes=1 << 22):
+    """Builds with each worker count, checks the result equals the serial build, reports records/s."""
+    results = []
+    reference = None
+    for workers in worker_counts:
+        with tempfile.TemporaryDirectory() as out:
+            builder = GraphBuilder(data_path, out)
+            start = time.perf_counter()
+            builder.build_graph(workers=workers, part_bytes=part_bytes)
+            elapsed = time.perf_counter() - start
+            count = sum(len(s["records"]) for s in BuildState.load(out).sources.values())
+            # Compare order-sensitive views: node order, attribute order/values, edge keys
+            snapshot = ([(n, list(d.items())) for n, d in builder.G.nodes(data=True)],
+                        list(builder.G.edges(keys=True, data=True)))
+        if reference is None:
+            reference = snapshot
+        results.append({"workers": workers, "seconds": elapsed, "records_per_s": count / elapsed,
+                        "identical": snapshot == reference})
+    for r in results:
+        print(f"workers={r['workers']:>2}  {r['seconds']:.2f}s  {r['records_per_s']:.0f} records/s  "
+              f"identical={r['identical']}")
+    return results
+
 if __name__ == "__main__":
     current_dir = os.path.dirname(os.path.abspath(__file__))
     # Fix: Correct relative path
     raw_path = os.path.join(current_dir, "../../data/raw")
     proc_path = os.path.join(current_dir, "../../data/processed")
-    builder = GraphBuilder(raw_path, proc_path)
-    builder.build_graph()
+    parser = argparse.ArgumentParser(description="Build the insurance/medical/nursing knowledge graph.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="apply only changed raw records to the existing kg.pkl")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of build processes (each parses and builds its own part of the raw files)")
+    parser.add_argument("--pdf-workers", type=int, default=os.cpu_count() or 1,
+                        help="processes extracting pages from raw/policies/*.pdf")
+    parser.add_argument("--backend", choices=["networkx", "sqlite"], default="networkx",
+                        help="sqlite: build kg.sqlite record by record on disk, for catalogs larger than RAM")
+    parser.add_argument("--resolve", action="store_true",
+                        help="run entity resolution (IS_A / ALIAS_OF links between name variants)")
+    parser.add_argument("--scaling", type=str, default=None,
+                        help="comma-separated worker counts to benchmark, e.g. 1,2,4 (writes nothing)")
+    args = parser.parse_args()
+    if args.scaling:
+        benchmark_workers(raw_path, [int(w) for w in args.scaling.split(",")])
+        raise SystemExit
+    if args.backend == "sqlite":
+        SQLiteBuilder(raw_path, proc_path, pdf_workers=args.pdf_workers).build_graph(
+            resolve_entities=args.resolve)
+        raise SystemExit
+    builder = GraphBuilder(raw_path, proc_path, pdf_workers=args.pdf_workers)
+    builder.build_graph(incremental=args.incremental, workers=args.workers, resolve_entities=args.resolve)
+    builder.save_csr()
+    builder.save_shards()
+    builder.save_query_index()
+    builder.save_fragments()
+    builder.finish_build()
     builder.export_cypher()
+    builder.export_bulk()
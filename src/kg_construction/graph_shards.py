@@ -0,0 +1,253 @@
+"""Domain-sharded graph artifacts with lazy loading.
+
+    kg_shards/
+        index.pkl               name -> shard and type, shard -> file, shard pairs that share edges
+        insurance.<gen>.pkl     networkx MultiDiGraph per domain
+        medical.<gen>.pkl
+        nursing.<gen>.pkl
+
+A shard holds the nodes it owns (with attributes) and every edge incident to
+them, in both directions, so cross-shard edges are stored in both endpoint
+shards and the far endpoint appears there as an attribute-less stub. Opening
+the store reads only the index; a shard is unpickled the first time a query
+needs one of its nodes.
+
+Shard files are never rewritten in place: each write uses a new generation
+suffix and the index, renamed into place last, switches readers to it. A
+reader keeps the file names of the index it opened, so its lazy loads stay on
+that generation; the previous generation is kept on disk for such readers.
+"""
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import deque
+
+try:
+    from .ontology import EntityType
+except ImportError:
+    from ontology import EntityType
+
+INDEX_FILE = "index.pkl"
+
+# Entity type -> shard. Types not listed fall into DEFAULT_SHARD.
+DOMAINS = {
+    EntityType.INSURANCE_PRODUCT.value: "insurance",
+    EntityType.DISEASE.value: "medical",
+    EntityType.DRUG.value: "medical",
+    EntityType.DEPARTMENT.value: "medical",
+    EntityType.NURSING_HOME.value: "nursing",
+    EntityType.SERVICE.value: "nursing",
+    EntityType.LOCATION.value: "nursing",
+}
+DEFAULT_SHARD = "misc"
+
+
+def shard_of(data):
+    return DOMAINS.get(data.get("type"), DEFAULT_SHARD)
+
+
+def _dump(obj, path):
+    # Write-then-rename, so a reader never sees a half-written shard
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def write_shards(G, out_dir):
+    """Splits a MultiDiGraph into per-domain shards plus the global index. Returns {shard: node count}."""
+    import networkx as nx
+
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, INDEX_FILE)
+    previous = set()
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            previous = set(pickle.load(f)["files"].values())
+    owner = {node: shard_of(data) for node, data in G.nodes(data=True)}
+    shards = {}
+    for node, data in G.nodes(data=True):
+        shard = shards.get(owner[node])
+        if shard is None:
+            shard = shards[owner[node]] = nx.MultiDiGraph()
+        shard.add_node(node, **data)
+
+    pairs = set()
+    for u, v, key, data in G.edges(keys=True, data=True):
+        su, sv = owner[u], owner[v]
+        pairs.add((su, sv))
+        shards[su].add_edge(u, v, key=key, **data)
+        if sv != su:
+            shards[sv].add_edge(u, v, key=key, **data)
+
+    generation = uuid.uuid4().hex[:12]
+    files = {}
+    for name, shard in shards.items():
+        files[name] = f"{name}.{generation}.pkl"
+        _dump(shard, os.path.join(out_dir, files[name]))
+    # The index goes last: it is what readers open, and its rename marks the new version
+    types = {node: data.get("type") for node, data in G.nodes(data=True)}
+    _dump({"nodes": owner, "types": types, "files": files, "pairs": pairs}, index_path)
+    # Keep this and the previous generation; older shard files have no reader left to switch
+    keep = set(files.values()) | previous | {INDEX_FILE}
+    for entry in os.listdir(out_dir):
+        if entry.endswith(".pkl") and entry not in keep:
+            os.remove(os.path.join(out_dir, entry))
+    return {name: sum(1 for n in shard if owner[n] == name) for name, shard in shards.items()}
+
+
+def _adjacent(G, name):
+    adj = [(v, rel, "out") for _, v, rel in G.out_edges(name, data="relation")]
+    adj += [(u, rel, "in") for u, _, rel in G.in_edges(name, data="relation")]
+    return adj
+
+
+class ShardedGraph:
+    """Read-only view over kg_shards/ with the node_data / ego_edges interface of CSRGraph."""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, INDEX_FILE), "rb") as f:
+            index = pickle.load(f)
+        self.owner = index["nodes"]
+        self.files = index["files"]
+        self.pairs = index["pairs"]
+        self.types = index.get("types")
+        self.loaded = {}
+        self.load_times = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, shard_dir):
+        return cls(shard_dir)
+
+    def shard(self, name):
+        G = self.loaded.get(name)
+        if G is not None:
+            return G
+        with self._lock:
+            if name not in self.loaded:
+                start = time.perf_counter()
+                with open(os.path.join(self.shard_dir, self.files[name]), "rb") as f:
+                    self.loaded[name] = pickle.load(f)
+                self.load_times[name] = time.perf_counter() - start
+            return self.loaded[name]
+
+    def nodes(self):
+        return self.owner.keys()
+
+    def has_node(self, name):
+        return name in self.owner
+
+    def __contains__(self, name):
+        return name in self.owner
+
+    def number_of_nodes(self):
+        return len(self.owner)
+
+    def node_data(self, name):
+        return self.shard(self.owner[name]).nodes[name]
+
+    def node_type(self, name):
+        # Answered from the index, so type filters do not force shards in
+        if self.types is not None:
+            return self.types[name]
+        return self.node_data(name).get("type")
+
+    def adjacent(self, name):
+        """[(neighbor, relation, "out" | "in")] for all edges incident to name."""
+        if name not in self.owner:
+            return []
+        return _adjacent(self.shard(self.owner[name]), name)
+
+    def _neighbors(self, name):
+        # The owning shard holds all incident edges, so one shard answers both directions
+        G = self.shard(self.owner[name])
+        yield from G.successors(name)
+        yield from G.predecessors(name)
+
+    def ego_node_ids(self, name, radius=1):
+        """Nodes within `radius` undirected hops of name, in BFS order."""
+        seen = {name: 0}
+        order = [name]
+        queue = deque([name])
+        while queue:
+            node = queue.popleft()
+            depth = seen[node]
+            if depth >= radius:
+                continue
+            for nbr in self._neighbors(node):
+                if nbr not in seen:
+                    seen[nbr] = depth + 1
+                    order.append(nbr)
+                    queue.append(nbr)
+        return order
+
+    def ego_edges(self, name, radius=1):
+        """(u, v, relation) for edges induced by the ego network of name, ignoring direction.
+
+        An edge is stored in the shards of both endpoints, so it is read from
+        whichever of them is loaded; the traversal has already loaded the shards
+        of the expanded nodes. A shard is only opened for edges whose endpoints
+        both live in shards not loaded yet (the index records which shard pairs
+        share edges).
+        """
+        if name not in self.owner:
+            return []
+        order = self.ego_node_ids(name, radius)
+        members = set(order)
+        shards = sorted({self.owner[v] for v in order})
+        for s in shards:
+            unloaded = [t for t in shards if t not in self.loaded]
+            if s in unloaded and any((s, t) in self.pairs or (t, s) in self.pairs for t in unloaded):
+                self.shard(s)
+        loaded = [s for s in shards if s in self.loaded]
+        edges = []
+        for u in order:
+            su = self.owner[u]
+            # Out-edges of u: all in its own shard, else spread over the shards of their heads
+            for s in ([su] if su in self.loaded else loaded):
+                G = self.shard(s)
+                if u not in G:
+                    continue
+                for _, v, data in G.out_edges(u, data=True):
+                    if v in members and (s == su or self.owner[v] == s):
+                        edges.append((u, v, data.get("relation", "RELATED")))
+        return edges
+
+def compare(kg_path, shard_dir, questions):
+    """Startup and time-to-first-answer of the full kg.pkl load vs. the lazy shard store."""
+    try:
+        from ..rag_engine.retriever import GraphRetriever
+    except ImportError:
+        from src.rag_engine.retriever import GraphRetriever
+
+    report = {}
+    for label, path in (("full", kg_path), ("sharded", shard_dir)):
+        runs = []
+        for q in questions:
+            t0 = time.perf_counter()
+            retriever = GraphRetriever(path)
+            startup = time.perf_counter() - t0
+            retriever.get_context(q, hops=1)
+            first = time.perf_counter() - t0
+            shards = sorted(retriever.G.loaded) if label == "sharded" else None
+            runs.append({"question": q, "startup_s": startup, "first_answer_s": first, "shards_loaded": shards})
+        report[label] = runs
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    proc_path = os.path.join(current_dir, "../../data/processed")
+    kg_path = os.path.join(proc_path, "kg.pkl")
+    shard_dir = os.path.join(proc_path, "kg_shards")
+    with open(kg_path, "rb") as f:
+        counts = write_shards(pickle.load(f), shard_dir)
+    print(f"Shards written to {shard_dir}: {counts}")
+    print(json.dumps(compare(kg_path, shard_dir, ["泰康之家·燕园在哪里？", "高血压能买什么保险？"]),
+                     ensure_ascii=False, indent=2))
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+
+# (source, raw file, DataLoader iterator, record key)
+SOURCES = [
+    ("insurance", "insurance_clauses.txt", "iter_insurance_data", "产品名称"),
+    ("medical", "medical_guidelines.txt", "iter_medical_data", "疾病名称"),
+    ("nursing", "nursing_homes.json", "iter_nursing_data", "name"),
+    ("policy_pdf", "policies", "iter_pdf_data", "产品名称"),
+]
+
+STATE_FILE = "build_state.json"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_hash(path):
+    """file_hash of a raw file; for a directory (policies/), a hash over its files; None if absent."""
+    if os.path.isdir(path):
+        h = hashlib.sha1()
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            if os.path.isfile(full):
+                h.update(f"{name}\0{file_hash(full)}\0".encode("utf-8"))
+        return h.hexdigest()
+    if not os.path.exists(path):
+        return None
+    return file_hash(path)
+
+
+def record_digest(item):
+    return hashlib.sha1(json.dumps(item, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def chain(fingerprint, digest):
+    """Folds one record digest into the running fingerprint of its key."""
+    return hashlib.sha1(f"{fingerprint or ''}:{digest}".encode("ascii")).hexdigest()
+
+
+def fingerprinting(records, key, fingerprints):
+    """Passes records through while folding each one into fingerprints[record[key]].
+
+    Records sharing a key are chained in file order, so the fingerprint of a key
+    changes whenever any of its records is added, edited, reordered or removed.
+    The chain only needs the record digests, which parallel build workers
+    compute for their part of the file (see GraphBuilder.build_parallel).
+    """
+    for item in records:
+        k = item.get(key)
+        if k:
+            fingerprints[k] = chain(fingerprints.get(k), record_digest(item))
+        yield item
+
+
+def diff_fingerprints(old, new):
+    """Returns (added, changed, removed) key sets between two fingerprint maps."""
+    added = {k for k in new if k not in old}
+    removed = {k for k in old if k not in new}
+    changed = {k for k in new if k in old and old[k] != new[k]}
+    return added, changed, removed
+
+
+class BuildState:
+    """Per-source file hashes and per-record fingerprints of the last build."""
+
+    def __init__(self, sources=None, graph_hash=None):
+        # source -> {"hash": str, "records": {key: fingerprint}}
+        self.sources = sources or {}
+        # Hash of the kg.pkl these fingerprints describe
+        self.graph_hash = graph_hash
+
+    @classmethod
+    def load(cls, output_path):
+        path = os.path.join(output_path, STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["sources"], data.get("graph_hash"))
+
+    def save(self, output_path):
+        with open(os.path.join(output_path, STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"graph_hash": self.graph_hash, "sources": self.sources}, f, ensure_ascii=False)
+
+    def primary_keys(self):
+        """Names of nodes owned by a raw record; these survive even with no edges."""
+        keys = set()
+        for source in self.sources.values():
+            keys.update(source["records"])
+        return keys
@@ -0,0 +1,81 @@
+"""Build manifest (manifest.json): the version each artifact in data/processed belongs to.
+
+GraphBuilder bumps the version when it saves kg.pkl and records every artifact
+it writes afterwards (kg.csr, kg_shards, query_index.pkl, ...) under that
+version, and marks the build finished once they are all written. Artifacts are
+written to a temp file and renamed, so an artifact that is recorded is
+complete. Serving processes poll the manifest to pick up rebuilds (see
+rag_engine/hot_reload.py) and use each auxiliary artifact only if it was
+recorded by the same build as the graph file.
+"""
+import json
+import os
+import time
+
+MANIFEST_FILE = "manifest.json"
+
+
+def read_manifest(output_path):
+    try:
+        with open(os.path.join(output_path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"version": 0, "files": {}}
+
+
+def _write_manifest(output_path, manifest):
+    manifest["updated"] = time.time()
+    path = os.path.join(output_path, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def record_artifacts(output_path, names, bump=False):
+    """Records names at the current version (a new one if bump); returns that version.
+
+    A new version counts as being built until finish_build() is called.
+    """
+    manifest = read_manifest(output_path)
+    if bump:
+        manifest["version"] += 1
+        manifest["building"] = manifest["version"]
+    for name in names:
+        manifest["files"][name] = manifest["version"]
+    _write_manifest(output_path, manifest)
+    return manifest["version"]
+
+
+def finish_build(output_path):
+    """Marks the current version complete: all artifacts of the build are recorded."""
+    manifest = read_manifest(output_path)
+    manifest.pop("building", None)
+    _write_manifest(output_path, manifest)
+    return manifest["version"]
+
+
+def snapshot_version(output_path, graph_file):
+    """Version of the build that wrote graph_file; None if it is not recorded or that build is unfinished.
+
+    The snapshot is graph_file plus whatever else its build recorded (see
+    same_build), so an artifact the build does not regenerate does not hold
+    the version back.
+    """
+    manifest = read_manifest(output_path)
+    version = manifest["files"].get(graph_file)
+    if version is None or manifest.get("building") == version:
+        return None
+    return version
+
+
+def same_build(output_path, graph_file, name):
+    """True if name was recorded by the build that wrote graph_file.
+
+    An artifact the manifest does not record counts as another build's, unless
+    graph_file is not recorded either (data written before manifests existed).
+    """
+    files = read_manifest(output_path)["files"]
+    if graph_file not in files:
+        return True
+    return files.get(name) == files[graph_file]
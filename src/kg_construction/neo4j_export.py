@@ -0,0 +1,135 @@
+import csv
+import os
+
+
+def cypher_string(value):
+    """Single-quoted Cypher string literal with backslash escaping."""
+    s = str(value)
+    s = s.replace("\\", "\\\\").replace("'", "\\'")
+    s = s.replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    return f"'{s}'"
+
+
+def cypher_identifier(name):
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def cypher_map(props):
+    return "{" + ", ".join(f"{cypher_identifier(k)}: {cypher_string(v)}" for k, v in props.items()) + "}"
+
+
+def node_props(data):
+    return {k: v for k, v in data.items() if k != "type" and v is not None and v != ""}
+
+
+def _label(G, node):
+    return G.nodes[node].get("type", "Thing")
+
+
+def export_csv(G, out_dir):
+    """Writes neo4j-admin import files: one node CSV per label, one relationship CSV per type.
+
+    Two streaming passes over the graph: the first only collects the property
+    columns of each label, the second writes rows through csv.writer, so memory
+    does not depend on graph size beyond the open file handles.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    columns = {}
+    for _, data in G.nodes(data=True):
+        cols = columns.setdefault(data.get("type", "Thing"), [])
+        for k in node_props(data):
+            if k not in cols:
+                cols.append(k)
+
+    node_files, writers = {}, {}
+    try:
+        for label, cols in columns.items():
+            path = os.path.join(out_dir, f"nodes_{label}.csv")
+            node_files[label] = open(path, "w", encoding="utf-8", newline="")
+            writers[label] = csv.writer(node_files[label])
+            writers[label].writerow(["name:ID"] + cols + [":LABEL"])
+        for node, data in G.nodes(data=True):
+            label = data.get("type", "Thing")
+            props = node_props(data)
+            writers[label].writerow([node] + [props.get(c, "") for c in columns[label]] + [label])
+    finally:
+        for f in node_files.values():
+            f.close()
+
+    rel_files, writers = {}, {}
+    try:
+        for u, v, data in G.edges(data=True):
+            rel = data.get("relation", "RELATED_TO")
+            if rel not in writers:
+                rel_files[rel] = open(os.path.join(out_dir, f"relationships_{rel}.csv"), "w",
+                                      encoding="utf-8", newline="")
+                writers[rel] = csv.writer(rel_files[rel])
+                writers[rel].writerow([":START_ID", ":END_ID", ":TYPE"])
+            writers[rel].writerow([u, v, rel])
+    finally:
+        for f in rel_files.values():
+            f.close()
+
+    return sorted(f"nodes_{label}.csv" for label in columns), sorted(f"relationships_{rel}.csv" for rel in rel_files)
+
+
+def export_unwind_cypher(G, path, batch_size=1000):
+    """Writes a cypher-shell script: constraints first, then batched `:param` + UNWIND statements.
+
+    Every MERGE/MATCH is on a label with a uniqueness constraint on name, so
+    Neo4j resolves endpoints through the index instead of scanning all nodes.
+    Relationship batches are grouped by (relation, start label, end label).
+    At most one pending batch per group is held in memory.
+    """
+    labels = []
+    for _, data in G.nodes(data=True):
+        label = data.get("type", "Thing")
+        if label not in labels:
+            labels.append(label)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for label in labels:
+            f.write(f"CREATE CONSTRAINT {cypher_identifier(label.lower() + '_name')} IF NOT EXISTS "
+                    f"FOR (n:{cypher_identifier(label)}) REQUIRE n.name IS UNIQUE;\n")
+        f.write("CALL db.awaitIndexes();\n\n")
+
+        def flush(statement, rows):
+            f.write(":param batch => [" + ", ".join(rows) + "];\n")
+            f.write(statement + "\n")
+
+        node_batches = {}
+        for node, data in G.nodes(data=True):
+            label = data.get("type", "Thing")
+            row = f"{{name: {cypher_string(node)}, props: {cypher_map(node_props(data))}}}"
+            batch = node_batches.setdefault(label, [])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(_node_statement(label), batch)
+                batch.clear()
+        for label, batch in node_batches.items():
+            if batch:
+                flush(_node_statement(label), batch)
+
+        edge_batches = {}
+        for u, v, data in G.edges(data=True):
+            key = (data.get("relation", "RELATED_TO"), _label(G, u), _label(G, v))
+            batch = edge_batches.setdefault(key, [])
+            batch.append(cypher_map({"src": u, "dst": v}))
+            if len(batch) >= batch_size:
+                flush(_edge_statement(*key), batch)
+                batch.clear()
+        for key, batch in edge_batches.items():
+            if batch:
+                flush(_edge_statement(*key), batch)
+
+
+def _node_statement(label):
+    return (f"UNWIND $batch AS row MERGE (n:{cypher_identifier(label)} {{name: row.name}}) "
+            f"SET n += row.props;")
+
+
+def _edge_statement(rel, src_label, dst_label):
+    return (f"UNWIND $batch AS row "
+            f"MATCH (a:{cypher_identifier(src_label)} {{name: row.src}}) "
+            f"MATCH (b:{cypher_identifier(dst_label)} {{name: row.dst}}) "
+            f"MERGE (a)-[:{cypher_identifier(rel)}]->(b);")
@@ -0,0 +1,252 @@
+"""Columnar node attributes, dictionary-encoded.
+
+networkx keeps one attribute dict per node, and the raw records give every
+node its own copy of values that are shared by thousands of nodes (the
+`diet` / `care` texts of diseases, `special_note` of products, the `type`
+string of every node). Here each attribute is an int32 code column over a
+dictionary of its distinct values, `type` is an int8 code over EntityType,
+and the property string used in contexts (format_props) is pre-rendered
+once, dictionary-encoded as well.
+
+node_store.pkl holds plain lists and numpy arrays; rows follow the node
+order of the graph it was built from, whose names it is checked against on
+load (fingerprint).
+"""
+import hashlib
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    from .ontology import EntityType
+except ImportError:
+    from ontology import EntityType
+
+STORE_FILE = "node_store.pkl"
+MISSING = -1
+
+
+def render_props(data):
+    # Same text as rag_engine.context_builder.format_props
+    return ", ".join([f"{k}: {v}" for k, v in data.items() if k != 'type'])
+
+
+def fingerprint(names):
+    """Digest of a set of node names, independent of their order (CSR graphs list names sorted)."""
+    h = hashlib.sha1()
+    for name in sorted(names):
+        h.update(name.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _hashable(value):
+    return value if isinstance(value, str) else (type(value).__name__, repr(value))
+
+
+class _Encoder:
+    """Builds one dictionary-encoded column."""
+
+    def __init__(self, size):
+        self.codes = np.full(size, MISSING, dtype=np.int32)
+        self.values = []
+        self._index = {}
+
+    def set(self, row, value):
+        key = _hashable(value)
+        code = self._index.get(key)
+        if code is None:
+            code = self._index[key] = len(self.values)
+            self.values.append(value)
+        self.codes[row] = code
+
+
+class NodeStore:
+    def __init__(self, names, types, type_values, layouts, layout, columns, props, prop_values, fingerprint=None):
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+        self.fingerprint = fingerprint      # of the graph's node names; None in stores written before it
+        self.types = types                # int8 code into type_values per row
+        self.type_values = type_values
+        self.layouts = layouts            # attribute key order per distinct layout
+        self.layout = layout              # int16 code into layouts per row
+        self.columns = columns            # attr -> (int32 codes, distinct values)
+        self.props = props                # int32 code into prop_values per row
+        self.prop_values = prop_values
+
+    @classmethod
+    def from_graph(cls, G):
+        names = list(G.nodes())
+        n = len(names)
+        type_values = [t.value for t in EntityType]
+        type_codes = {t: i for i, t in enumerate(type_values)}
+        types = np.full(n, MISSING, dtype=np.int8)
+        layout_codes, layouts = {}, []
+        layout = np.zeros(n, dtype=np.int16)
+        encoders = {}
+        props = _Encoder(n)
+        for i, (_, data) in enumerate(G.nodes(data=True)):
+            keys = tuple(data)
+            code = layout_codes.get(keys)
+            if code is None:
+                code = layout_codes[keys] = len(layouts)
+                layouts.append(keys)
+            layout[i] = code
+            for k, v in data.items():
+                if k == "type":
+                    if v not in type_codes:
+                        type_codes[v] = len(type_values)
+                        type_values.append(v)
+                    types[i] = type_codes[v]
+                else:
+                    encoder = encoders.get(k)
+                    if encoder is None:
+                        encoder = encoders[k] = _Encoder(n)
+                    encoder.set(i, v)
+            props.set(i, render_props(data))
+        columns = {k: (e.codes, e.values) for k, e in encoders.items()}
+        return cls(names, types, type_values, layouts, layout, columns, props.codes, props.values,
+                   fingerprint(names))
+
+    def tables(self):
+        return {"names": self.names, "types": self.types, "type_values": self.type_values,
+                "layouts": self.layouts, "layout": self.layout, "columns": self.columns,
+                "props": self.props, "prop_values": self.prop_values, "fingerprint": self.fingerprint}
+
+    def save(self, output_path):
+        path = os.path.join(output_path, STORE_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.tables(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, output_path):
+        with open(os.path.join(output_path, STORE_FILE), "rb") as f:
+            return cls(**pickle.load(f))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def node_type(self, name):
+        code = self.types[self.ids[name]]
+        return self.type_values[code] if code != MISSING else None
+
+    def value(self, name, attr, default=None):
+        if attr == "type":
+            return self.node_type(name)
+        column = self.columns.get(attr)
+        if column is None:
+            return default
+        code = column[0][self.ids[name]]
+        return column[1][code] if code != MISSING else default
+
+    def node_data(self, name):
+        """The node's attribute dict, keys in their original order."""
+        i = self.ids[name]
+        data = {}
+        for k in self.layouts[self.layout[i]]:
+            if k == "type":
+                data[k] = self.type_values[self.types[i]]
+            else:
+                codes, values = self.columns[k]
+                data[k] = values[codes[i]]
+        return data
+
+    def format_props(self, name):
+        """Pre-rendered "key: value, ..." string of the node (without type)."""
+        return self.prop_values[self.props[self.ids[name]]]
+
+    def matches(self, names):
+        """True if the store was built for a graph with exactly these node names."""
+        return self.fingerprint is not None and self.fingerprint == fingerprint(names)
+
+
+def _fresh(value):
+    # A new string object, as each raw record yields its own copy
+    return (value + ".")[:-1] if isinstance(value, str) else value
+
+
+def synthetic_nodes(G, count):
+    """count (name, attrs) pairs cycling through G's nodes, with per-node copies of the values."""
+    base = list(G.nodes(data=True))
+    for i in range(count):
+        name, data = base[i % len(base)]
+        yield f"{name}#{i}", {k: _fresh(v) for k, v in data.items()}
+
+
+def _heap_after(load):
+    """Heap still held once load() returns (its result is kept alive until measured)."""
+    tracemalloc.start()
+    kept = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def compare(kg_path, nodes=1_000_000):
+    """Resident heap of a loaded graph of `nodes` nodes: networkx with its per-node attribute
+    dicts vs. networkx with the dicts cleared plus NodeStore, as GraphRetriever serves it.
+
+    Both sides are measured through a pickle round trip, i.e. what loading the
+    files costs; the store side includes its own names and name -> row index.
+    """
+    import networkx as nx
+
+    with open(kg_path, "rb") as f:
+        G = pickle.load(f)
+    big = nx.MultiDiGraph()
+    big.add_nodes_from(synthetic_nodes(G, nodes))
+    t0 = time.perf_counter()
+    store = NodeStore.from_graph(big)
+    build_s = time.perf_counter() - t0
+    graph_blob = pickle.dumps(big, protocol=pickle.HIGHEST_PROTOCOL)
+    store_blob = pickle.dumps(store.tables(), protocol=pickle.HIGHEST_PROTOCOL)
+    del big, G
+
+    def load_graph():
+        return pickle.loads(graph_blob)
+
+    def load_bare_graph():
+        graph = pickle.loads(graph_blob)
+        for _, data in graph.nodes(data=True):
+            data.clear()
+        return graph
+
+    def load_graph_and_store():
+        graph = load_bare_graph()
+        loaded = NodeStore(**pickle.loads(store_blob))
+        loaded.matches(graph.nodes())
+        return graph, loaded
+
+    dict_bytes = _heap_after(load_graph)
+    bare_bytes = _heap_after(load_bare_graph)
+    store_bytes = _heap_after(load_graph_and_store)
+    return {
+        "nodes": nodes,
+        "graph_heap_bytes": dict_bytes,
+        "graph_with_store_heap_bytes": store_bytes,
+        "attribute_dicts_bytes": dict_bytes - bare_bytes,
+        "store_bytes": store_bytes - bare_bytes,
+        "saved_bytes_per_million_nodes": (dict_bytes - store_bytes) * 1_000_000 // nodes,
+        "distinct_props": len(store.prop_values),
+        "build_s": build_s,
+    }
+
+
+if __name__ == "__main__":
+    import json
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    proc_path = os.path.join(current_dir, "../../data/processed")
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(json.dumps(compare(os.path.join(proc_path, "kg.pkl"), nodes), indent=2))
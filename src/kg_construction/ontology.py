@@ -18,3 +18,5 @@ class RelationType(Enum):
     HAS_COMPLICATION = "HAS_COMPLICATION"    # Disease -> Disease
     LOCATED_IN = "LOCATED_IN"                # NursingHome -> Location
     PROVIDES_SERVICE = "PROVIDES_SERVICE"    # NursingHome -> Service
+    IS_A = "IS_A"                            # Variant -> more general entity of the same type (原发性高血压 -> 高血压)
+    ALIAS_OF = "ALIAS_OF"                    # Spelling variant -> canonical name
@@ -0,0 +1,198 @@
+"""Insurance records from policy PDFs.
+
+Pages are extracted with pypdf in a process pool (a file is split into page
+ranges, so one long policy also spreads over the workers) and their text is
+streamed, in page order, through ClauseSegmenter, which yields the same
+records as DataLoader.iter_insurance_data (产品名称 / 适用年龄 / 保险责任 /
+且覆盖疾病 / 特别说明). Results are cached per file under its content hash, so
+an unchanged PDF is never parsed again.
+"""
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    from .incremental import file_hash
+except ImportError:
+    from incremental import file_hash
+
+# Bump when the segmenter output changes, so cached records are rebuilt
+SEGMENTER_VERSION = 1
+
+# Wording used in policy documents -> record key
+FIELD_ALIASES = {
+    "产品名称": "产品名称", "保险产品名称": "产品名称", "产品全称": "产品名称",
+    "适用年龄": "适用年龄", "投保年龄": "适用年龄", "承保年龄": "适用年龄", "被保险人年龄": "适用年龄",
+    "保险责任": "保险责任", "保障责任": "保险责任",
+    "且覆盖疾病": "且覆盖疾病", "覆盖疾病": "且覆盖疾病", "保障疾病": "且覆盖疾病", "承保疾病": "且覆盖疾病",
+    "特别说明": "特别说明", "特别约定": "特别说明",
+}
+# Fields whose value may wrap onto following lines (and pages)
+_LIST_FIELDS = {"且覆盖疾病"}
+_TEXT_FIELDS = {"保险责任", "特别说明"}
+
+_FIELD = re.compile(r"^(?:[一二三四五六七八九十\d]+[、.．)）]\s*)?(%s)\s*[:：]\s*(.*)$"
+                    % "|".join(sorted(FIELD_ALIASES, key=len, reverse=True)))
+# Page headers / footers: "第 3 页 共 120 页", "3 / 120", "- 3 -"
+_PAGE_NOISE = re.compile(r"^(?:第\s*\d+\s*页(?:\s*[,，/]?\s*共\s*\d+\s*页)?|\d+\s*/\s*\d+|-\s*\d+\s*-)$")
+_LIST_SEPARATORS = re.compile(r"\s*[、；;，,]\s*")
+
+
+class ClauseSegmenter:
+    """Incremental line-oriented parser: feed() page texts in order, then close()."""
+
+    def __init__(self):
+        self.record = None
+        self.field = None
+
+    def feed(self, text):
+        """Yields the records completed by this text."""
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or _PAGE_NOISE.match(line):
+                continue
+            m = _FIELD.match(line)
+            if m:
+                key = FIELD_ALIASES[m.group(1)]
+                if key == "产品名称" or self.record is None or key in self.record:
+                    # A product name (or a repeated field) starts the next product
+                    yield from self.close()
+                    self.record = {}
+                self.record[key] = m.group(2).strip()
+                self.field = key
+                self._end_field_at_period()
+            elif self.field is not None:
+                # Wrapped value: PDF lines break anywhere, also inside a disease name
+                self.record[self.field] += line
+                self._end_field_at_period()
+
+    def _end_field_at_period(self):
+        if self.field in _LIST_FIELDS or self.field in _TEXT_FIELDS:
+            if self.record[self.field].endswith("。"):
+                if self.field in _LIST_FIELDS:
+                    self.record[self.field] = self.record[self.field][:-1]
+                self.field = None
+        else:
+            self.field = None
+
+    def close(self):
+        record, self.record, self.field = self.record, None, None
+        if record and record.get("产品名称"):
+            if "且覆盖疾病" in record:
+                items = _LIST_SEPARATORS.split(record["且覆盖疾病"])
+                record["且覆盖疾病"] = "，".join(i.replace(" ", "") for i in items if i.strip())
+            yield record
+
+
+def extract_pages(path, start, stop):
+    """Text of pages [start, stop) of path (runs in a pool worker)."""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class PdfClauseIngestor:
+    def __init__(self, workers=1, cache_dir=None, pages_per_task=16):
+        if PdfReader is None:
+            raise ImportError("Please install pypdf: pip install pypdf")
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.pages_per_task = pages_per_task
+        self.stats = {}
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.v{SEGMENTER_VERSION}.json")
+
+    def _load_cached(self, digest):
+        if self.cache_dir is None or not os.path.exists(self._cache_path(digest)):
+            return None
+        with open(self._cache_path(digest), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _store(self, digest, records):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(digest)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def iter_records(self, paths):
+        """Streams the records of paths in file order.
+
+        At most 2 * workers page ranges are in flight, so memory stays bounded
+        however many (or however long) the PDFs are.
+        """
+        stats = self.stats = {"files": 0, "cached_files": 0, "pages": 0, "records": 0, "seconds": 0.0}
+        start = time.perf_counter()
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        submit = pool.submit if pool else (lambda fn, *args: _done(fn(*args)))
+        # (path, digest, future or None, last range of the file, cached records or None)
+        pending = deque()
+
+        def tasks():
+            for path in paths:
+                digest = file_hash(path)
+                cached = self._load_cached(digest)
+                if cached is not None:
+                    yield path, digest, None, True, cached
+                    continue
+                num_pages = len(PdfReader(path).pages)
+                stats["pages"] += num_pages
+                ranges = [(s, min(s + self.pages_per_task, num_pages))
+                          for s in range(0, num_pages, self.pages_per_task)] or [(0, 0)]
+                for i, (s, e) in enumerate(ranges):
+                    yield path, digest, submit(extract_pages, path, s, e), i == len(ranges) - 1, None
+
+        try:
+            segmenter, records = ClauseSegmenter(), []
+            task_iter = tasks()
+            for task in task_iter:
+                pending.append(task)
+                if len(pending) < 2 * max(self.workers, 1):
+                    continue
+                yield from self._consume(pending.popleft(), segmenter, records)
+            while pending:
+                yield from self._consume(pending.popleft(), segmenter, records)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            stats["seconds"] = time.perf_counter() - start
+            parsed = stats["pages"]
+            print(f"PDF ingestion: {stats['files']} files ({stats['cached_files']} cached), {parsed} pages "
+                  f"parsed in {stats['seconds']:.2f}s ({parsed / max(stats['seconds'], 1e-9):.1f} pages/s, "
+                  f"{self.workers} workers), {stats['records']} records.")
+
+    def _consume(self, task, segmenter, records):
+        path, digest, future, last, cached = task
+        if cached is not None:
+            new = cached
+            self.stats["cached_files"] += 1
+        else:
+            new = []
+            for text in future.result():
+                new.extend(segmenter.feed(text))
+            if last:
+                new.extend(segmenter.close())
+        records.extend(new)
+        if last:
+            if cached is None:
+                self._store(digest, records)
+            self.stats["files"] += 1
+            self.stats["records"] += len(records)
+            records.clear()
+        yield from new
@@ -0,0 +1,243 @@
+"""Precomputed lookups for the common question shapes, built with the graph.
+
+    disease  -> products covering it
+    drug     -> diseases it treats -> products covering those
+    core term -> its variants / aliases that have coverage (entity resolution, kept apart
+                 from the direct tables so a variant's coverage is never reported as the core term's)
+    age      -> products whose parsed 适用年龄 range contains it (interval tree)
+    location / service -> nursing homes
+
+The file (query_index.pkl) holds plain dicts and lists only; the interval
+tree is rebuilt on load, which takes milliseconds.
+"""
+import bisect
+import os
+import pickle
+import re
+
+try:
+    from .ontology import EntityType, RelationType
+except ImportError:
+    from ontology import EntityType, RelationType
+
+INDEX_FILE = "query_index.pkl"
+
+_RANGE = re.compile(r"(\d+)\s*(天|日|个月|月|周?岁)?\s*[-~～至到]\s*(\d+)\s*周?岁")
+_FROM = re.compile(r"(\d+)\s*周?岁(?:以上|及以上|起)")
+_UNTIL = re.compile(r"(?:(\d+)\s*周?岁以下|至\s*(\d+)\s*周?岁)")
+MAX_AGE = 150
+
+
+def parse_age_range(text):
+    """"0-85岁" -> (0, 85); "出生满28天-65周岁" -> (0, 65); "60岁以上" -> (60, 150). None if unparsable."""
+    if not text:
+        return None
+    m = _RANGE.search(text)
+    if m:
+        lo = int(m.group(1))
+        if m.group(2) in ("天", "日", "个月", "月"):
+            lo = 0  # newborn limits ("出生满28天") count as age 0
+        return lo, int(m.group(3))
+    m = _FROM.search(text)
+    if m:
+        return int(m.group(1)), MAX_AGE
+    m = _UNTIL.search(text)
+    if m:
+        return 0, int(m.group(1) or m.group(2))
+    return None
+
+
+class IntervalIndex:
+    """Static centered interval tree over closed [lo, hi] ranges.
+
+    stab(x) returns the items whose range contains x in O(log n + k).
+    """
+
+    def __init__(self, intervals):
+        self.size = len(intervals)
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(p for lo, hi, _ in intervals for p in (lo, hi))
+        center = points[len(points) // 2]
+        left = [iv for iv in intervals if iv[1] < center]
+        right = [iv for iv in intervals if iv[0] > center]
+        here = [iv for iv in intervals if iv[0] <= center <= iv[1]]
+        by_lo = sorted(here, key=lambda iv: (iv[0], iv[2]))
+        by_hi = sorted(here, key=lambda iv: (-iv[1], iv[2]))
+        return (center, [iv[0] for iv in by_lo], [iv[2] for iv in by_lo],
+                [-iv[1] for iv in by_hi], [iv[2] for iv in by_hi],
+                self._build(left), self._build(right))
+
+    def stab(self, x):
+        out = []
+        node = self.root
+        while node is not None:
+            center, los, lo_items, neg_his, hi_items, left, right = node
+            if x < center:
+                # Ranges here end at or after center > x; those starting at or before x match
+                out.extend(lo_items[:bisect.bisect_right(los, x)])
+                node = left
+            elif x > center:
+                out.extend(hi_items[:bisect.bisect_right(neg_his, -x)])
+                node = right
+            else:
+                out.extend(lo_items)
+                break
+        return out
+
+    def __len__(self):
+        return self.size
+
+
+def _ancestors(parents, node):
+    """Nodes reachable from node over IS_A / ALIAS_OF edges (node excluded)."""
+    seen = {node}
+    stack = list(parents.get(node, ()))
+    while stack:
+        parent = stack.pop()
+        if parent not in seen:
+            seen.add(parent)
+            stack.extend(parents.get(parent, ()))
+    seen.discard(node)
+    return seen
+
+
+def build_query_index(G):
+    """Extracts the lookup tables from a built MultiDiGraph (plain, picklable dicts)."""
+    covers = {}
+    treats = {}
+    homes_by_location = {}
+    homes_by_service = {}
+    parents = {}
+    for u, v, rel in G.edges(data="relation"):
+        if rel in (RelationType.IS_A.value, RelationType.ALIAS_OF.value):
+            parents.setdefault(u, []).append(v)
+        elif rel == RelationType.COVERS_DISEASE.value:
+            covers.setdefault(v, set()).add(u)
+        elif rel == RelationType.TREATS.value:
+            treats.setdefault(u, set()).add(v)
+        elif rel == RelationType.LOCATED_IN.value:
+            homes_by_location.setdefault(v, set()).add(u)
+        elif rel == RelationType.PROVIDES_SERVICE.value:
+            homes_by_service.setdefault(v, set()).add(u)
+
+    # Entity resolution links variants to their core term ("原发性高血压" -IS_A-> "高血压",
+    # "阿司匹林肠溶片" -IS_A-> "阿司匹林"); the core term often has no other edges
+    disease_variants, drug_variants = {}, {}
+    for table, variants in ((covers, disease_variants), (treats, drug_variants)):
+        for node in table:
+            for ancestor in _ancestors(parents, node):
+                variants.setdefault(ancestor, set()).add(node)
+
+    ages = {}
+    for node, data in G.nodes(data=True):
+        if data.get("type") == EntityType.INSURANCE_PRODUCT.value:
+            parsed = parse_age_range(data.get("age_limit"))
+            if parsed is not None:
+                ages[node] = parsed
+
+    def sorted_lists(d):
+        return {k: sorted(v) for k, v in d.items()}
+
+    return {
+        "disease_products": sorted_lists(covers),
+        "drug_diseases": sorted_lists(treats),
+        "disease_variants": sorted_lists(disease_variants),
+        "drug_variants": sorted_lists(drug_variants),
+        "product_ages": ages,
+        "homes_by_location": sorted_lists(homes_by_location),
+        "homes_by_service": sorted_lists(homes_by_service),
+    }
+
+
+def save_query_index(G, output_path):
+    path = os.path.join(output_path, INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(build_query_index(G), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
+
+
+class QueryIndex:
+    """Typed lookups over query_index.pkl. All results are sorted lists of node names."""
+
+    def __init__(self, tables):
+        self.disease_products = tables["disease_products"]
+        self.drug_diseases = tables["drug_diseases"]
+        # Absent from indexes written before variants were tracked
+        self.disease_variants = tables.get("disease_variants", {})
+        self.drug_variants = tables.get("drug_variants", {})
+        self.product_ages = tables["product_ages"]
+        self.homes_by_location = tables["homes_by_location"]
+        self.homes_by_service = tables["homes_by_service"]
+        self.ages = IntervalIndex([(lo, hi, p) for p, (lo, hi) in self.product_ages.items()])
+
+    @classmethod
+    def load(cls, output_path):
+        with open(os.path.join(output_path, INDEX_FILE), "rb") as f:
+            return cls(pickle.load(f))
+
+    @classmethod
+    def from_graph(cls, G):
+        return cls(build_query_index(G))
+
+    def age_range(self, product):
+        """(lo, hi) parsed from the product's 适用年龄, or None."""
+        return self.product_ages.get(product)
+
+    def accepts_age(self, product, age):
+        r = self.product_ages.get(product)
+        return r is not None and r[0] <= age <= r[1]
+
+    def products_for_age(self, age):
+        return sorted(self.ages.stab(age))
+
+    def products_for_disease(self, disease, age=None):
+        products = self.disease_products.get(disease, [])
+        if age is None:
+            return list(products)
+        return [p for p in products if self.accepts_age(p, age)]
+
+    def diseases_for_drug(self, drug):
+        return list(self.drug_diseases.get(drug, []))
+
+    def products_for_drug(self, drug, age=None):
+        """{disease treated by drug: products covering it} (diseases without products are omitted)."""
+        out = {}
+        for disease in self.drug_diseases.get(drug, []):
+            products = self.products_for_disease(disease, age)
+            if products:
+                out[disease] = products
+        return out
+
+    def variant_products(self, disease, age=None):
+        """{variant / alias of disease: products covering it}; a variant's coverage is not the disease's."""
+        out = {}
+        for variant in self.disease_variants.get(disease, []):
+            products = self.products_for_disease(variant, age)
+            if products:
+                out[variant] = products
+        return out
+
+    def variant_products_for_drug(self, drug, age=None):
+        """{variant / alias of drug: products_for_drug(variant)} (variants without products are omitted)."""
+        out = {}
+        for variant in self.drug_variants.get(drug, []):
+            by_disease = self.products_for_drug(variant, age)
+            if by_disease:
+                out[variant] = by_disease
+        return out
+
+    def nursing_homes(self, location=None, services=()):
+        """Homes in location (if given) that provide every service in services."""
+        candidates = None
+        if location is not None:
+            candidates = set(self.homes_by_location.get(location, ()))
+        for svc in services:
+            homes = set(self.homes_by_service.get(svc, ()))
+            candidates = homes if candidates is None else candidates & homes
+        return sorted(candidates or ())
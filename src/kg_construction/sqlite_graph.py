@@ -0,0 +1,396 @@
+"""Out-of-core graph store in an embedded SQLite database (kg.sqlite).
+
+For catalogs that do not fit in memory, neither as a networkx graph nor while
+building one. Tables:
+
+    nodes(id, name UNIQUE, type)        name index for exact seed lookup
+    attrs(id, node, key, value)         one row per attribute, JSON value, insertion order by id
+    edges(src, dst, rel)                indexed on src and on dst
+    name_grams                          FTS5 over the character bigrams of names and aliases
+    meta(key, value)                    node / edge counts, longest name
+
+SQLiteGraphWriter takes the put_node / put_edge calls of GraphBuilder (see
+SQLiteBuilder in graph_builder.py) in batched transactions, so the build keeps
+only a bounded cache of node ids in memory. SQLiteGraph offers the read
+interface of CSRGraph / ShardedGraph (node_data, adjacent, ego_edges, ...),
+each call an indexed query; every thread gets its own read-only connection
+with a page cache of cache_mb.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .entity_resolution import lookup_aliases
+    from ..rag_engine.fuzzy_index import char_ngrams
+except ImportError:
+    from entity_resolution import lookup_aliases
+    from fuzzy_index import char_ngrams
+
+SQLITE_FILE = "kg.sqlite"
+CACHE_MB = 64
+# Bound parameters per IN (...) list
+_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE nodes (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, type TEXT);
+CREATE TABLE attrs (id INTEGER PRIMARY KEY, node INTEGER NOT NULL, key TEXT NOT NULL, value TEXT,
+                    UNIQUE (node, key));
+CREATE TABLE edges (src INTEGER NOT NULL, dst INTEGER NOT NULL, rel TEXT NOT NULL);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE VIRTUAL TABLE name_grams USING fts5(grams, text UNINDEXED, node UNINDEXED, detail=none);
+"""
+# Built after the bulk load, which is faster than maintaining them row by row
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS edges_src ON edges (src)",
+    "CREATE INDEX IF NOT EXISTS edges_dst ON edges (dst)",
+]
+
+
+def _grams(text):
+    """Space-separated bigrams of text for name_grams (only those FTS5 keeps as a token)."""
+    return " ".join(g for g in char_ngrams(text, (2,)) if any(ch.isalnum() for ch in g))
+
+
+def _chunks(items, size=_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SQLiteGraphWriter:
+    def __init__(self, path, batch_size=10000, cache_mb=CACHE_MB, id_cache=100000):
+        self.path = path
+        self.tmp = path + ".tmp"
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp, isolation_level=None)
+        # A temp file renamed on close: no journal needed
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(f"PRAGMA cache_size = {-cache_mb * 1024}")
+        self.conn.executescript(SCHEMA)
+        self.batch_size = batch_size
+        self.id_cache = id_cache
+        self._ids = OrderedDict()
+        self._pending = 0
+        self.conn.execute("BEGIN")
+
+    def _tick(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+            self._pending = 0
+
+    def node_id(self, name):
+        """Id of name, created (without attributes) if new."""
+        i = self._ids.get(name)
+        if i is not None:
+            self._ids.move_to_end(name)
+            return i
+        cur = self.conn.execute("INSERT OR IGNORE INTO nodes (name) VALUES (?)", (name,))
+        if cur.rowcount:
+            i = cur.lastrowid
+        else:
+            (i,) = self.conn.execute("SELECT id FROM nodes WHERE name = ?", (name,)).fetchone()
+        self._ids[name] = i
+        if len(self._ids) > self.id_cache:
+            self._ids.popitem(last=False)
+        return i
+
+    def put_node(self, name, attrs, defaults=None):
+        """Creates or updates a node; defaults only fill attributes the node does not have yet."""
+        i = self.node_id(name)
+        for k, v in (defaults or {}).items():
+            cur = self.conn.execute("INSERT OR IGNORE INTO attrs (node, key, value) VALUES (?, ?, ?)",
+                                    (i, k, json.dumps(v, ensure_ascii=False)))
+            if k == "type" and cur.rowcount:
+                self.conn.execute("UPDATE nodes SET type = ? WHERE id = ?", (v, i))
+        for k, v in attrs.items():
+            # The upsert keeps the row id, so the attribute keeps its position in node_data
+            self.conn.execute("INSERT INTO attrs (node, key, value) VALUES (?, ?, ?) "
+                              "ON CONFLICT (node, key) DO UPDATE SET value = excluded.value",
+                              (i, k, json.dumps(v, ensure_ascii=False)))
+            if k == "type":
+                self.conn.execute("UPDATE nodes SET type = ? WHERE id = ?", (v, i))
+        self._tick()
+
+    def put_edge(self, u, v, relation):
+        self.conn.execute("INSERT INTO edges (src, dst, rel) VALUES (?, ?, ?)",
+                          (self.node_id(u), self.node_id(v), relation))
+        self._tick()
+
+    def create_indexes(self):
+        for statement in INDEXES:
+            self.conn.execute(statement)
+
+    def iter_nodes(self):
+        """(name, type) of all nodes, streamed."""
+        yield from self.conn.execute("SELECT name, type FROM nodes ORDER BY id")
+
+    def degree(self, name):
+        """In + out degree (after create_indexes this is two index lookups)."""
+        i = self.node_id(name)
+        (out,) = self.conn.execute("SELECT count(*) FROM edges WHERE src = ?", (i,)).fetchone()
+        (inc,) = self.conn.execute("SELECT count(*) FROM edges WHERE dst = ?", (i,)).fetchone()
+        return out + inc
+
+    def close(self):
+        """Builds the indexes and name grams, then moves the database into place."""
+        conn = self.conn
+        self.create_indexes()
+        rows = conn.execute("SELECT id, name FROM nodes ORDER BY id")
+        while True:
+            batch = rows.fetchmany(self.batch_size)
+            if not batch:
+                break
+            conn.executemany("INSERT INTO name_grams (grams, text, node) VALUES (?, ?, ?)",
+                             [(_grams(name), name, i) for i, name in batch])
+        # Lay terms, chain names of branches and per-node aliases are extra rows pointing at their node
+        aliases = list(lookup_aliases(name for (name,) in conn.execute("SELECT name FROM nodes ORDER BY id")))
+        for target, value in conn.execute("SELECT n.name, a.value FROM attrs a JOIN nodes n ON n.id = a.node "
+                                          "WHERE a.key = 'aliases'").fetchall():
+            value = json.loads(value)
+            if isinstance(value, str):
+                value = [a for a in value.split(",") if a]
+            aliases += [(alias, target) for alias in value or ()]
+        for alias, target in aliases:
+            row = conn.execute("SELECT id FROM nodes WHERE name = ?", (target,)).fetchone()
+            exists = conn.execute("SELECT 1 FROM nodes WHERE name = ?", (alias,)).fetchone()
+            if row and not exists:
+                conn.execute("INSERT INTO name_grams (grams, text, node) VALUES (?, ?, ?)",
+                             (_grams(alias), alias, row[0]))
+
+        (num_nodes,) = conn.execute("SELECT count(*) FROM nodes").fetchone()
+        (num_edges,) = conn.execute("SELECT count(*) FROM edges").fetchone()
+        (max_len,) = conn.execute("SELECT coalesce(max(length(name)), 0) FROM nodes").fetchone()
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [("num_nodes", num_nodes), ("num_edges", num_edges), ("max_name_len", max_len)])
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.close()
+        # Write-then-rename: open readers keep the previous file
+        os.replace(self.tmp, self.path)
+        return {"nodes": num_nodes, "edges": num_edges, "bytes": os.path.getsize(self.path)}
+
+
+def write_sqlite(G, path, batch_size=10000):
+    """Copies a networkx MultiDiGraph into a new SQLite store (nodes, then edges, in graph order)."""
+    writer = SQLiteGraphWriter(path, batch_size)
+    for name, data in G.nodes(data=True):
+        writer.put_node(name, data)
+    for u, v, rel in G.edges(data="relation", default="RELATED"):
+        writer.put_edge(u, v, rel)
+    return writer.close()
+
+
+class SQLiteGraph:
+    """Read side of kg.sqlite; same lookup / traversal interface as CSRGraph."""
+
+    out_of_core = True
+
+    def __init__(self, path, cache_mb=CACHE_MB):
+        self.path = path
+        self.cache_mb = cache_mb
+        self._local = threading.local()
+        meta = dict(self._conn().execute("SELECT key, value FROM meta"))
+        self.num_nodes = int(meta["num_nodes"])
+        self.num_edges = int(meta["num_edges"])
+        self.max_name_len = int(meta["max_name_len"])
+
+    @classmethod
+    def load(cls, path, cache_mb=CACHE_MB):
+        return cls(path, cache_mb)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            # Bounded page cache per connection; the OS page cache does the rest
+            conn.execute(f"PRAGMA cache_size = {-self.cache_mb * 1024}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("CREATE TEMP TABLE ego (id INTEGER PRIMARY KEY)")
+            self._local.conn = conn
+        return conn
+
+    # === Lookup ===
+
+    def nodes(self):
+        for (name,) in self._conn().execute("SELECT name FROM nodes ORDER BY id"):
+            yield name
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    def node_id(self, name):
+        row = self._conn().execute("SELECT id FROM nodes WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def has_node(self, name):
+        return self.node_id(name) is not None
+
+    def node_type(self, name):
+        row = self._conn().execute("SELECT type FROM nodes WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def node_data(self, name):
+        rows = self._conn().execute("SELECT a.key, a.value FROM nodes n JOIN attrs a ON a.node = n.id "
+                                    "WHERE n.name = ? ORDER BY a.id", (name,)).fetchall()
+        if not rows and not self.has_node(name):
+            raise KeyError(name)
+        return {k: json.loads(v) for k, v in rows}
+
+    def names_in(self, candidates):
+        """The candidates that are node names (one indexed IN query per chunk)."""
+        conn, found = self._conn(), []
+        for chunk in _chunks(candidates):
+            found += [name for (name,) in conn.execute(
+                f"SELECT name FROM nodes WHERE name IN ({','.join('?' * len(chunk))})", chunk)]
+        return found
+
+    def names_with_prefix(self, text, limit=3):
+        """Names starting with text, shortest first, then by name (a range of the name index)."""
+        return [name for (name,) in self._conn().execute(
+            "SELECT name FROM nodes WHERE name >= ? AND name < ? ORDER BY length(name), name LIMIT ?",
+            (text, text + "\U0010ffff", limit))]
+
+    def aliases(self):
+        """alias -> canonical name from the ALIAS_OF edges of entity resolution."""
+        rows = self._conn().execute("SELECT s.name, d.name FROM edges e JOIN nodes s ON s.id = e.src "
+                                    "JOIN nodes d ON d.id = e.dst WHERE e.rel = 'ALIAS_OF'")
+        return dict(rows)
+
+    def fuzzy_search(self, query, top_k=5, entity_type=None, min_score=0.5, candidates=50):
+        """[(node name, score)] by FTS over name bigrams; score is the share of the name's bigrams in query."""
+        grams = _grams(query).split()
+        if not grams:
+            return []
+        query_grams = set(grams)
+        conn = self._conn()
+        match = " OR ".join('"' + g.replace('"', '""') + '"' for g in query_grams)
+        rows = conn.execute("SELECT text, node FROM name_grams WHERE name_grams MATCH ? ORDER BY rank LIMIT ?",
+                            (match, max(candidates, top_k * 10))).fetchall()
+        type_value = getattr(entity_type, "value", entity_type)
+        scored = {}
+        for text, node in rows:
+            name, node_type = conn.execute("SELECT name, type FROM nodes WHERE id = ?", (node,)).fetchone()
+            if type_value is not None and node_type != type_value:
+                continue
+            name_grams = set(_grams(text).split())
+            score = len(name_grams & query_grams) / max(len(name_grams), 1)
+            if score >= min_score and score > scored.get(name, 0.0):
+                scored[name] = score
+        return sorted(scored.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+    # === Traversal ===
+
+    def adjacent(self, name):
+        """[(neighbor, relation, "out" | "in")] for all edges incident to name."""
+        i = self.node_id(name)
+        if i is None:
+            return []
+        conn = self._conn()
+        adj = [(v, rel, "out") for v, rel in conn.execute(
+            "SELECT d.name, e.rel FROM edges e JOIN nodes d ON d.id = e.dst WHERE e.src = ? ORDER BY e.rowid", (i,))]
+        adj += [(u, rel, "in") for u, rel in conn.execute(
+            "SELECT s.name, e.rel FROM edges e JOIN nodes s ON s.id = e.src WHERE e.dst = ? ORDER BY e.rowid", (i,))]
+        return adj
+
+    def ego_edges(self, name, radius=1):
+        """Edges (u, v, relation) of the subgraph induced by the ego network of name."""
+        i = self.node_id(name)
+        if i is None:
+            return []
+        conn = self._conn()
+        seen, frontier = {i}, [i]
+        for _ in range(radius):
+            reached = set()
+            for chunk in _chunks(frontier):
+                marks = ",".join("?" * len(chunk))
+                reached.update(n for (n,) in conn.execute(
+                    f"SELECT dst FROM edges WHERE src IN ({marks}) UNION SELECT src FROM edges WHERE dst IN ({marks})",
+                    chunk + chunk))
+            frontier = list(reached - seen)
+            seen |= reached
+            if not frontier:
+                break
+        # Induced edges: join through a temp table of the ego's ids
+        conn.execute("DELETE FROM temp.ego")
+        conn.executemany("INSERT INTO temp.ego (id) VALUES (?)", ((n,) for n in seen))
+        return conn.execute("SELECT s.name, d.name, e.rel FROM temp.ego x JOIN edges e ON e.src = x.id "
+                            "JOIN temp.ego y ON y.id = e.dst JOIN nodes s ON s.id = e.src "
+                            "JOIN nodes d ON d.id = e.dst ORDER BY e.src, e.rowid").fetchall()
+
+
+def compare(data_path, graph_file="kg.pkl", sqlite_file=SQLITE_FILE, queries=1000, seed=0):
+    """Per-query latency of GraphRetriever on the in-memory graph vs. kg.sqlite (same questions).
+
+    Both graphs must come from the same raw data. Also reports the heap taken
+    by loading each and how many contexts differ.
+    """
+    import random
+    import tracemalloc
+    from ..rag_engine.retriever import GraphRetriever
+
+    def load(name):
+        tracemalloc.start()
+        start = time.perf_counter()
+        retriever = GraphRetriever(os.path.join(data_path, name))
+        seconds = time.perf_counter() - start
+        heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Fragments would bypass both traversals
+        retriever.fragments = None
+        return retriever, {"load_s": seconds, "heap_bytes": heap}
+
+    memory, memory_load = load(graph_file)
+    disk, disk_load = load(sqlite_file)
+    rng = random.Random(seed)
+    names = sorted(memory.G.nodes())
+    questions = [f"{rng.choice(names)}能买什么保险？" if rng.random() < 0.7 else
+                 f"{rng.choice(names)}和{rng.choice(names)}有什么关系？" for _ in range(queries)]
+
+    def run(retriever, stats):
+        retriever.get_context(questions[0])
+        for step, fn in (("search_ms", retriever.search_entities),
+                         ("context_ms", lambda q: retriever.get_context(q, hops=1, max_tokens=2000))):
+            samples = []
+            for q in questions:
+                start = time.perf_counter()
+                fn(q)
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            stats[step] = {"mean": sum(samples) / len(samples) * 1000,
+                           "p50": samples[len(samples) // 2] * 1000,
+                           "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000}
+        return stats
+
+    result = {
+        "nodes": memory.G.number_of_nodes(),
+        "queries": queries,
+        graph_file: run(memory, memory_load),
+        sqlite_file: run(disk, dict(disk_load, file_bytes=os.path.getsize(os.path.join(data_path, sqlite_file)))),
+    }
+    result["context_mismatches"] = sum(memory.get_context(q, max_tokens=2000) != disk.get_context(q, max_tokens=2000)
+                                       for q in questions)
+    return result
+
+
+if __name__ == "__main__":
+    import pickle
+    from .manifest import record_artifacts
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    proc_path = os.path.join(current_dir, "../../data/processed")
+    with open(os.path.join(proc_path, "kg.pkl"), "rb") as f:
+        stats = write_sqlite(pickle.load(f), os.path.join(proc_path, SQLITE_FILE))
+    record_artifacts(proc_path, [SQLITE_FILE])
+    print(f"SQLite graph saved: {json.dumps(stats)}")
+    print(json.dumps(compare(proc_path), indent=2))
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_TRAILING_PUNCT = re.compile(r"[\s?？!！。.，,、~～]+$")
+
+
+def normalize_question(question):
+    """Canonical form used as the retrieval cache key ("高血压能买什么保险？ " == "高血压能买什么保险?")."""
+    q = unicodedata.normalize("NFKC", question).strip().lower()
+    q = re.sub(r"\s+", " ", q)
+    return _TRAILING_PUNCT.sub("", q)
+
+
+def prompt_key(prompt, model):
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with an optional per-entry TTL (seconds)."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """Persistent tier: one SQLite table per namespace, JSON values, TTL checked on read."""
+
+    def __init__(self, path, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                           "namespace TEXT, key TEXT, value TEXT, created REAL, "
+                           "PRIMARY KEY (namespace, key))")
+        self._conn.commit()
+
+    def get(self, namespace, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE namespace = ? AND key = ?",
+                                     (namespace, key)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl and created + self.ttl < time.time():
+            self.delete(namespace, key)
+            return None
+        return json.loads(value)
+
+    def put(self, namespace, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                               (namespace, key, json.dumps(value, ensure_ascii=False), time.time()))
+            self._conn.commit()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def clear(self, namespace):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+
+class CacheLevel:
+    """One cache level: memory LRU in front of an optional disk tier, with hit counters."""
+
+    def __init__(self, namespace, maxsize, ttl, disk=None):
+        self.namespace = namespace
+        self.memory = LRUCache(maxsize, ttl)
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # The counters are updated from executor threads (answer_batch, the query service)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(self.namespace, key)
+            if value is not None:
+                self.memory.put(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(self.namespace, key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear(self.namespace)
+
+    def stats(self):
+        with self._lock:
+            hits, disk_hits, misses = self.hits, self.disk_hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "disk_hits": disk_hits, "misses": misses,
+                "hit_rate": hits / total if total else 0.0, "size": len(self.memory)}
+
+
+class AnswerCache:
+    """Two-level RAG cache.
+
+    - retrieval: normalized question -> get_context result
+    - generation: sha256(model, prompt) -> LLM answer
+
+    Retrieval entries are tied to the graph file they were computed from and are
+    dropped when kg_path changes (mtime/size). Generation entries key on the full
+    prompt, which embeds the context, so they stay valid across graph rebuilds.
+    """
+
+    def __init__(self, kg_path=None, maxsize=1024, ttl=3600, disk_path=None):
+        self.kg_path = kg_path
+        disk = DiskCache(disk_path, ttl) if disk_path else None
+        self.retrieval = CacheLevel("retrieval", maxsize, ttl, disk)
+        self.generation = CacheLevel("generation", maxsize, ttl, disk)
+        self._graph_version = self._current_graph_version()
+        self._checked_at = 0.0
+        self._pinned = False
+
+    def _current_graph_version(self):
+        if not self.kg_path or not os.path.exists(self.kg_path):
+            return None
+        st = os.stat(self.kg_path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def set_graph_version(self, version):
+        """Keys retrieval entries on the graph version actually being served (e.g. a hot-reloaded
+        snapshot) instead of kg_path's mtime; the file may change before the new graph is loaded."""
+        self._pinned = True
+        if version != self._graph_version:
+            self._graph_version = version
+            self.retrieval.clear()
+
+    def _check_graph(self):
+        if self._pinned:
+            return
+        # stat() at most once per second; cheap enough for every query path
+        now = time.monotonic()
+        if now - self._checked_at < 1.0:
+            return
+        self._checked_at = now
+        version = self._current_graph_version()
+        if version != self._graph_version:
+            self._graph_version = version
+            self.retrieval.clear()
+
+    def _retrieval_key(self, question, hops, budget=None, mode="ego"):
+        # The version prefix keeps stale persistent entries from surviving a rebuild across restarts
+        return f"{self._graph_version}|{mode}|{hops}|{budget}|{normalize_question(question)}"
+
+    def get_context(self, question, hops, budget=None, mode="ego"):
+        self._check_graph()
+        return self.retrieval.get(self._retrieval_key(question, hops, budget, mode))
+
+    def put_context(self, question, hops, context, budget=None, mode="ego"):
+        self.retrieval.put(self._retrieval_key(question, hops, budget, mode), context)
+
+    def get_answer(self, prompt, model):
+        return self.generation.get(prompt_key(prompt, model))
+
+    def put_answer(self, prompt, model, answer):
+        self.generation.put(prompt_key(prompt, model), answer)
+
+    def stats(self):
+        return {"retrieval": self.retrieval.stats(), "generation": self.generation.stats()}
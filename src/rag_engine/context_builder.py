@@ -0,0 +1,242 @@
+from collections import defaultdict
+
+NO_CONTEXT = "No relevant entities found in Knowledge Graph."
+
+
+def personalized_pagerank(edges, seeds, alpha=0.15, iterations=20):
+    """PageRank restarted at the seeds, over the undirected version of `edges`.
+
+    Runs on the retrieved subgraph only, so cost is O(iterations * len(edges)).
+    Mass reaching a node is split across its neighbours, so hubs do not
+    dominate just by having many edges.
+    """
+    adj = defaultdict(list)
+    for u, v, _ in edges:
+        adj[u].append(v)
+        adj[v].append(u)
+    restart = {s: 1.0 / len(seeds) for s in seeds}
+    rank = dict(restart)
+    for _ in range(iterations):
+        nxt = defaultdict(float)
+        for n, r in restart.items():
+            nxt[n] += alpha * r
+        dangling = 0.0
+        for n, r in rank.items():
+            neighbours = adj.get(n)
+            if not neighbours:
+                dangling += r
+                continue
+            share = (1 - alpha) * r / len(neighbours)
+            for m in neighbours:
+                nxt[m] += share
+        for n, r in restart.items():
+            nxt[n] += (1 - alpha) * dangling * r
+        rank = nxt
+    return rank
+
+
+def estimate_tokens(text):
+    """Rough token count: one per CJK character, one per four other characters."""
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def format_props(node_data):
+    return ", ".join([f"{k}: {v}" for k, v in node_data.items() if k != 'type'])
+
+
+def _line_cost(line, max_tokens=None):
+    # +1 for the newline joining it to the next line
+    if max_tokens is not None:
+        return estimate_tokens(line) + 1
+    return len(line) + 1
+
+
+def render_context(facts, max_chars=None, max_tokens=None):
+    """Serializes ranked facts into the prompt context format, within an optional budget.
+
+    Triples are admitted in score order; an admitted triple also brings in its
+    seed's section header and the property lines of endpoints not yet shown.
+    Triples that do not fit are skipped, so the highest-ranked facts always
+    survive. The output keeps one section per seed, each ordered by score.
+    """
+    if not facts["seeds"]:
+        return NO_CONTEXT
+
+    def cost(line):
+        return _line_cost(line, max_tokens)
+
+    budget = max_tokens if max_tokens is not None else max_chars
+    used = 0
+    sections = {seed: [] for seed in facts["seeds"]}
+    shown_entities = set()
+
+    for triple in facts["triples"]:
+        head, rel, tail, seed = triple["head"], triple["relation"], triple["tail"], triple["seed"]
+        lines = []
+        if not sections[seed]:
+            lines.append(f"\n--- Context for '{seed}' ---")
+        new_entities = []
+        for node in (head, tail):
+            if node not in shown_entities and node not in new_entities:
+                new_entities.append(node)
+                props = facts["entities"].get(node)
+                if props:
+                    lines.append(f"Entity: {node} ({props})")
+        lines.append(f"({head}) --[{rel}]--> ({tail})")
+
+        line_cost = sum(cost(line) for line in lines)
+        if budget is not None and used + line_cost > budget:
+            continue
+        used += line_cost
+        shown_entities.update(new_entities)
+        sections[seed].extend(lines)
+
+    out = []
+    for seed in facts["seeds"]:
+        out.extend(sections[seed])
+    return "\n".join(out) + "\n" if out else ""
+
+
+def render_fragments(seeds, units, entity_line, aliases_of=None, max_chars=None, max_tokens=None):
+    """render_context over precomputed 1-hop fragments (kg_construction/context_fragments.py).
+
+    units maps each walk start (seeds and their aliases) to its fragment, the
+    ranked (head, tail, triple line, tokens) of FragmentStore.units;
+    entity_line(node) gives an endpoint's (property line, tokens) or None. Each
+    seed's fragment (then those of its aliases) is concatenated in its
+    precomputed order; a triple shared by several seeds is reported once, under
+    the first. Admission within the budget follows render_context, so a single
+    seed gives the same context as the live traversal. With several seeds each
+    section keeps its own seed's ranking instead of the joint one.
+    """
+    if not seeds:
+        return NO_CONTEXT
+    aliases_of = aliases_of or {}
+    budget = max_tokens if max_tokens is not None else max_chars
+
+    def cost(line, tokens):
+        return tokens + 1 if max_tokens is not None else len(line) + 1
+
+    used = 0
+    out, seen, shown_entities = [], set(), set()
+    for seed in seeds:
+        section = []
+        for start in [seed] + aliases_of.get(seed, []):
+            for head, tail, triple_line, tokens in units.get(start, ()):
+                if triple_line in seen:
+                    continue
+                seen.add(triple_line)
+                lines = []
+                if not section:
+                    header = f"\n--- Context for '{seed}' ---"
+                    lines.append((header, estimate_tokens(header)))
+                new_entities = []
+                for node in (head, tail):
+                    if node not in shown_entities and node not in new_entities:
+                        new_entities.append(node)
+                        entity = entity_line(node)
+                        if entity:
+                            lines.append(entity)
+                lines.append((triple_line, tokens))
+
+                line_cost = sum(cost(line, t) for line, t in lines)
+                if budget is not None and used + line_cost > budget:
+                    continue
+                used += line_cost
+                shown_entities.update(new_entities)
+                section.extend(line for line, _ in lines)
+        out.extend(section)
+    return "\n".join(out) + "\n" if out else ""
+
+
+def format_path(path):
+    """(阿司匹林片) --[TREATS]--> (高血压) <--[COVERS_DISEASE]-- (泰康全能保)"""
+    parts = [f"({path['nodes'][0]})"]
+    for (rel, direction), node in zip(path["relations"], path["nodes"][1:]):
+        parts.append(f"--[{rel}]-->" if direction == "out" else f"<--[{rel}]--")
+        parts.append(f"({node})")
+    return " ".join(parts)
+
+
+def render_paths(facts, max_chars=None, max_tokens=None):
+    """Context for retrieve_paths results: ranked path lines, each preceded by the
+    properties of entities not shown yet. Paths that do not fit the budget are skipped."""
+    if not facts["seeds"]:
+        return NO_CONTEXT
+    budget = max_tokens if max_tokens is not None else max_chars
+    header = "\n--- Paths for " + ", ".join(f"'{s}'" for s in facts["seeds"]) + " ---"
+    out, used = [header], _line_cost(header, max_tokens)
+    shown = set()
+    for path in facts["paths"]:
+        lines, new = [], []
+        for node in path["nodes"]:
+            if node not in shown and node not in new:
+                new.append(node)
+                props = facts["entities"].get(node)
+                if props:
+                    lines.append(f"Entity: {node} ({props})")
+        lines.append(format_path(path))
+        line_cost = sum(_line_cost(line, max_tokens) for line in lines)
+        if budget is not None and used + line_cost > budget:
+            continue
+        used += line_cost
+        shown.update(new)
+        out.extend(lines)
+    if len(out) == 1:
+        out.append("No connecting paths found.")
+    return "\n".join(out) + "\n"
+
+
+def render_structured(result, max_tokens=None):
+    """Compact context for a structured_lookup result: one line per matching entity.
+
+    Lines past max_tokens are dropped and summarized as a count. The sections
+    of a "multiple" result share max_tokens equally.
+    """
+    intent, age = result["intent"], result.get("age")
+    if intent == "multiple":
+        share = max_tokens // len(result["sections"]) if max_tokens is not None else None
+        return "".join(render_structured(section, max_tokens=share) for section in result["sections"])
+    age_note = f" (age {age})" if age is not None else ""
+    ages = result.get("ages", {})
+
+    def product_line(p):
+        r = ages.get(p)
+        return f"{p} (适用年龄 {r[0]}-{r[1]}岁)" if r else p
+
+    entity = result.get("entity")
+
+    def drug_lines(by_disease):
+        return [f"{d}: " + "; ".join(product_line(p) for p in ps) for d, ps in by_disease.items()]
+
+    # Coverage of a variant (entity resolution) is stated with the variant named, never as the entity's own
+    if intent == "products_for_disease":
+        header = f"--- Products covering '{entity}'{age_note} ---"
+        lines = [product_line(p) for p in result["results"]]
+        lines += [f"covers {v}, a form of {entity}: " + "; ".join(product_line(p) for p in ps)
+                  for v, ps in result.get("variants", {}).items()]
+    elif intent == "products_for_drug":
+        header = f"--- Products covering diseases treated by '{entity}'{age_note} ---"
+        lines = drug_lines(result["results"])
+        for v, by_disease in result.get("variants", {}).items():
+            lines += [f"{v} (a form of {entity}) treats {line}" for line in drug_lines(by_disease)]
+    elif intent == "products_for_age":
+        header = f"--- Products accepting age {age} ---"
+        lines = [product_line(p) for p in result["results"]]
+    else:
+        filters = [f"in '{result['location']}'"] if result.get("location") else []
+        filters += [f"providing '{s}'" for s in result.get("services", [])]
+        header = f"--- Nursing homes {' and '.join(filters)} ---"
+        lines = list(result["results"])
+
+    if not lines:
+        return f"\n{header}\nNone found.\n"
+    out, used = [f"\n{header}"], estimate_tokens(header) + 1
+    for i, line in enumerate(lines):
+        used += estimate_tokens(line) + 1
+        if max_tokens is not None and used > max_tokens:
+            out.append(f"... ({len(lines) - i} more)")
+            break
+        out.append(line)
+    return "\n".join(out) + "\n"
@@ -0,0 +1,113 @@
+from collections import deque
+
+
+class EntityMatcher:
+    """Aho-Corasick dictionary matcher over entity names.
+
+    The automaton is built once from the graph's node names; a single pass over
+    the query then reports every entity mention, in O(len(query) + #matches).
+    """
+
+    def __init__(self, names=()):
+        # State 0 is the root. goto[s] maps a character to the next state.
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]     # name ending exactly at this state
+        self.dict_link = [0]     # nearest suffix state with an output (0 = none)
+        self.size = 0
+        for name in names:
+            self.add(name)
+        self.build()
+
+    def add(self, name):
+        if not name:
+            return
+        state = 0
+        for ch in name:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+                self.dict_link.append(0)
+                self.goto[state][ch] = nxt
+            state = nxt
+        if self.output[state] is None:
+            self.size += 1
+        self.output[state] = name
+
+    def build(self):
+        """Computes failure and dictionary links (BFS over the trie)."""
+        queue = deque()
+        for nxt in self.goto[0].values():
+            self.fail[nxt] = 0
+            self.dict_link[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(ch, 0)
+                if f == nxt:
+                    f = 0
+                self.fail[nxt] = f
+                self.dict_link[nxt] = f if self.output[f] is not None else self.dict_link[f]
+
+    def iter_matches(self, text):
+        """Yields (start, end, name) for every dictionary entry occurring in text."""
+        goto, fail, output, dict_link = self.goto, self.fail, self.output, self.dict_link
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            s = state if output[state] is not None else dict_link[state]
+            while s:
+                name = output[s]
+                yield i + 1 - len(name), i + 1, name
+                s = dict_link[s]
+
+    def find(self, text):
+        """Returns the longest non-overlapping mentions as (start, end, name), in text order."""
+        candidates = sorted(self.iter_matches(text), key=lambda m: (m[0] - m[1], m[0]))
+        taken = [False] * len(text)
+        selected = []
+        for start, end, name in candidates:
+            if any(taken[start:end]):
+                continue
+            for i in range(start, end):
+                taken[i] = True
+            selected.append((start, end, name))
+        selected.sort()
+        return selected
+
+    def __len__(self):
+        return self.size
+
+
+class IndexedMatcher(EntityMatcher):
+    """EntityMatcher.find over a name index that stays on disk (kg_construction/sqlite_graph.py).
+
+    Instead of an automaton over all names, every substring of the text up to
+    the longest name is looked up in one batch; lookup(candidates) returns the
+    candidates that are names.
+    """
+
+    def __init__(self, lookup, max_len, size=0):
+        self.lookup = lookup
+        self.max_len = max_len
+        self.size = size
+
+    def iter_matches(self, text):
+        spans = {}
+        for i in range(len(text)):
+            for j in range(i + 1, min(len(text), i + self.max_len) + 1):
+                spans.setdefault(text[i:j], []).append((i, j))
+        for name in self.lookup(list(spans)):
+            for start, end in spans[name]:
+                yield start, end, name
@@ -0,0 +1,132 @@
+"""Character n-gram index for fuzzy entity lookup.
+
+Names (and aliases) are rows of a sparse matrix M over character n-grams,
+stored column-major (CSC: gram -> posting list of rows) as numpy arrays.
+Scoring a query is the sparse product q . M^T restricted to the columns of
+the query's n-grams. To keep the cost independent of catalog size, the
+product runs in two steps: the query's rarest grams are scanned in full, up
+to a fixed posting budget, which yields the candidate rows; the remaining
+(frequent) grams only look up those candidates in their sorted posting lists.
+
+A row's weight for gram g is idf(g)^2 / sum(idf^2 over the row's grams), so
+the score of a row is the share of the name's information found in the query
+(1.0 when every gram of the name occurs in it).
+"""
+import re
+import unicodedata
+from array import array
+
+import numpy as np
+
+_NOISE = re.compile(r"[\s?？!！。.，,、~～:：;；\"'“”‘’]+")
+
+
+def normalize(text):
+    return _NOISE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def char_ngrams(text, sizes=(1, 2)):
+    text = normalize(text)
+    grams = set()
+    for n in sizes:
+        if len(text) < n:
+            continue
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    if not grams and text:
+        grams.add(text)  # single-character names
+    return grams
+
+
+class FuzzyIndex:
+    def __init__(self, names, types=None, aliases=None, sizes=(1, 2), scan_budget=20000):
+        """names: node names; types: parallel entity type values (or None);
+        aliases: (alias, node name) pairs, indexed as extra rows pointing at that node."""
+        self.sizes = sizes
+        names = list(names)
+        types = list(types) if types is not None else [None] * len(names)
+        rows = list(zip(names, names, types))
+        type_of = dict(zip(names, types))
+        for alias, target in aliases or ():
+            if target in type_of and alias not in type_of:
+                rows.append((alias, target, type_of[target]))
+
+        self.targets = [target for _, target, _ in rows]
+        self.type_codes = {t: i for i, t in enumerate(sorted({t for _, _, t in rows if t is not None}))}
+        self.row_types = np.array([self.type_codes.get(t, -1) for _, _, t in rows], dtype=np.int16)
+
+        # COO pass: gram ids per row into flat arrays (Python lists of postings do not fit 1M names)
+        self.vocab = {}
+        row_ptr, cols = array("q", [0]), array("i")
+        for text, _, _ in rows:
+            for g in char_ngrams(text, sizes):
+                c = self.vocab.get(g)
+                if c is None:
+                    c = self.vocab[g] = len(self.vocab)
+                cols.append(c)
+            row_ptr.append(len(cols))
+
+        n_rows = max(len(rows), 1)
+        cols = np.frombuffer(cols, dtype=np.int32) if len(cols) else np.zeros(0, dtype=np.int32)
+        row_ids = np.repeat(np.arange(len(rows), dtype=np.int32), np.diff(np.frombuffer(row_ptr, dtype=np.int64)))
+        self.df = np.bincount(cols, minlength=len(self.vocab))
+        idf2 = np.log1p(n_rows / np.maximum(self.df, 1)) ** 2
+        row_norm = np.bincount(row_ids, weights=idf2[cols], minlength=len(rows))
+        row_norm[row_norm == 0] = 1.0
+
+        # CSC layout: column c holds rows indices[indptr[c]:indptr[c + 1]] with weights data[...]
+        order = np.argsort(cols, kind="stable")
+        self.indices = row_ids[order]
+        self.data = (idf2[cols] / row_norm[row_ids])[order].astype(np.float32)
+        self.indptr = np.concatenate(([0], np.cumsum(self.df))).astype(np.int64)
+        self.scan_budget = scan_budget
+
+    def __len__(self):
+        return len(self.targets)
+
+    def search(self, text, top_k=5, entity_type=None, min_score=0.5):
+        """[(node name, score)] best first; entity_type is an EntityType or its value."""
+        cols = sorted((self.vocab[g] for g in char_ngrams(text, self.sizes) if g in self.vocab),
+                      key=lambda c: self.df[c])
+        if not cols:
+            return []
+        scanned, total = 0, 0
+        while scanned < len(cols) and (not scanned or total + self.df[cols[scanned]] <= self.scan_budget):
+            total += self.df[cols[scanned]]
+            scanned += 1
+
+        # 1. Rare grams: full posting lists, summed per row
+        segments = [(self.indptr[c], self.indptr[c + 1]) for c in cols[:scanned]]
+        idx = np.concatenate([self.indices[s:e] for s, e in segments])
+        weights = np.concatenate([self.data[s:e] for s, e in segments])
+        rows, inverse = np.unique(idx, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        # 2. Frequent grams: binary search of the candidates in each (row-sorted) posting list
+        for c in cols[scanned:]:
+            s, e = self.indptr[c], self.indptr[c + 1]
+            posting = self.indices[s:e]
+            pos = np.minimum(np.searchsorted(posting, rows), len(posting) - 1)
+            hit = posting[pos] == rows
+            scores[hit] += self.data[s:e][pos[hit]]
+
+        keep = scores >= min_score
+        if entity_type is not None:
+            code = self.type_codes.get(getattr(entity_type, "value", entity_type), -2)
+            keep &= self.row_types[rows] == code
+        rows, scores = rows[keep], scores[keep]
+        if not len(rows):
+            return []
+
+        # Over-fetch: aliases may point at a name that is already in the list
+        k = min(len(rows), top_k * 2)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((rows[best], -scores[best]))]
+        results, seen = [], set()
+        for i in best:
+            target = self.targets[rows[i]]
+            if target not in seen:
+                seen.add(target)
+                results.append((target, float(scores[i])))
+                if len(results) == top_k:
+                    break
+        return results
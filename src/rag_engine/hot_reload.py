@@ -0,0 +1,79 @@
+"""Hot reload of the knowledge graph in a running process.
+
+RAGPipeline keeps everything derived from one build of the graph (retriever,
+query index) in a GraphSnapshot and reads it once per query. GraphReloader
+polls the build manifest (kg_construction/manifest.py); when a newer complete
+version appears it loads it on its own thread, while queries keep running on
+the current snapshot, then swaps the snapshot reference. Queries that started
+before the swap finish on the old snapshot, which is freed once they are done.
+"""
+import threading
+import time
+
+
+class GraphSnapshot:
+    """One loaded version of the graph and the indexes built with it."""
+
+    def __init__(self, retriever, query_index, version, load_seconds):
+        self.retriever = retriever
+        self.query_index = query_index
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+class GraphReloader:
+    def __init__(self, pipeline, interval=5.0):
+        self.pipeline = pipeline
+        self.interval = interval
+        self.reloads = 0
+        self.reloading = False
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="graph-reloader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Loads and swaps in the newest complete snapshot if it differs from the active one."""
+        pipeline = self.pipeline
+        version = pipeline.available_version()
+        if version is None or version == pipeline.graph_version:
+            return False
+        with self._lock:
+            # One load at a time (the poller vs. an explicit reload_graph())
+            if version == pipeline.graph_version:
+                return False
+            self.reloading = True
+            try:
+                with pipeline.tracer.span("graph_reload") as span:
+                    snapshot = pipeline.load_snapshot()
+                    span.set("version", snapshot.version)
+            except Exception as e:
+                pipeline.tracer.incr("graph_reload_errors")
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Warning: graph reload to version {version} failed ({self.last_error}), "
+                      f"still serving version {pipeline.graph_version}.")
+                return False
+            finally:
+                self.reloading = False
+            pipeline.swap_snapshot(snapshot)
+            self.reloads += 1
+            self.last_error = None
+            print(f"Graph reloaded: version {snapshot.version} in {snapshot.load_seconds:.2f}s")
+        return True
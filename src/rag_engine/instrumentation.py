@@ -0,0 +1,241 @@
+"""Lightweight per-stage tracing and metrics for the RAG pipeline.
+
+A Tracer fans spans, counters and histogram observations out to pluggable
+sinks (log lines, an in-process registry). A Tracer with no sinks is disabled:
+span() returns a shared no-op context manager and counters return
+immediately, so instrumented code costs one attribute check per call.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = {}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        for sink in self.tracer.sinks:
+            sink.on_span(self.name, duration, self.attrs)
+        return False
+
+    def set(self, key, value):
+        self.attrs[key] = value
+
+
+class Tracer:
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.enabled = bool(self.sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        self.enabled = True
+
+    def span(self, name):
+        """Times a stage; the duration is reported as histogram `<name>_seconds`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        for sink in self.sinks:
+            sink.on_counter(name, value)
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        for sink in self.sinks:
+            sink.on_observe(name, value)
+
+
+NULL_TRACER = Tracer()
+
+
+class LogSink:
+    """Emits one log line per span/counter/observation."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("kg.rag")
+        self.level = level
+
+    def on_span(self, name, duration, attrs):
+        extra = "".join(f" {k}={v}" for k, v in attrs.items())
+        self.logger.log(self.level, "span=%s ms=%.3f%s", name, duration * 1000, extra)
+
+    def on_counter(self, name, value):
+        self.logger.log(self.level, "counter=%s value=%s", name, value)
+
+    def on_observe(self, name, value):
+        self.logger.log(self.level, "observe=%s value=%s", name, value)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """In-process sink: counters plus histograms, safe to share across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_spans = {}
+
+    def on_span(self, name, duration, attrs):
+        self.on_observe(f"{name}_seconds", duration)
+        with self._lock:
+            self.last_spans[name] = duration
+
+    def on_counter(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def on_observe(self, name, value):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(value)
+
+    def state(self):
+        """Raw counters and histogram buckets, the form merge() accepts (JSON serializable)."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: {"counts": list(h.counts), "count": h.count, "sum": h.sum}
+                               for name, h in self.histograms.items()},
+            }
+
+    def merge(self, state):
+        """Adds another registry's state() (e.g. from another worker process) into this one."""
+        with self._lock:
+            for name, value in state["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, h in state["histograms"].items():
+                hist = self.histograms.get(name)
+                if hist is None:
+                    hist = self.histograms[name] = Histogram()
+                hist.counts = [a + b for a, b in zip(hist.counts, h["counts"])]
+                hist.count += h["count"]
+                hist.sum += h["sum"]
+
+    def dump(self, path):
+        """Writes state() to path atomically, for a process that aggregates several registries."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(tmp, path)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: {"count": h.count, "sum": h.sum,
+                                      "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                               for name, h in self.histograms.items()},
+                "last_spans": dict(self.last_spans),
+            }
+
+    def render_prometheus(self, prefix="kg_rag"):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            for name, h in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum {h.sum}")
+                lines.append(f"{metric}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry, port=9108, host="127.0.0.1"):
+    """Serves registry.render_prometheus() at /metrics from a daemon thread.
+
+    Listens on localhost only; pass host="0.0.0.0" to expose it to a scraper on another machine.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,214 @@
+"""Path-oriented retrieval: relation-constrained metapaths and bidirectional search.
+
+The ego-graph walk returns everything within `hops` of a seed, which explodes
+around hubs at hops=2. Here traversal only follows the edge types of a
+metapath, or searches for connections between two seeds, and every query is
+bounded: at most `fanout` neighbours are expanded per node and hop, and at
+most `budget` nodes are visited in total. Results are ranked paths.
+"""
+import heapq
+import math
+from itertools import combinations, islice
+
+try:
+    from ..kg_construction.ontology import EntityType, RelationType
+except ImportError:
+    from ontology import EntityType, RelationType
+
+OUT, IN = "out", "in"
+
+# name -> (start entity type, [(relation, direction from the previous node), ...])
+METAPATHS = {
+    "drug_disease_insurance": (EntityType.DRUG, [(RelationType.TREATS, OUT), (RelationType.COVERS_DISEASE, IN)]),
+    "drug_disease_department": (EntityType.DRUG, [(RelationType.TREATS, OUT), (RelationType.BELONGS_TO, OUT)]),
+    "disease_insurance": (EntityType.DISEASE, [(RelationType.COVERS_DISEASE, IN)]),
+    "disease_drug": (EntityType.DISEASE, [(RelationType.TREATS, IN)]),
+    "disease_department": (EntityType.DISEASE, [(RelationType.BELONGS_TO, OUT)]),
+    "insurance_disease_drug": (EntityType.INSURANCE_PRODUCT,
+                               [(RelationType.COVERS_DISEASE, OUT), (RelationType.TREATS, IN)]),
+    "department_disease_insurance": (EntityType.DEPARTMENT,
+                                     [(RelationType.BELONGS_TO, IN), (RelationType.COVERS_DISEASE, IN)]),
+    "location_home_service": (EntityType.LOCATION,
+                              [(RelationType.LOCATED_IN, IN), (RelationType.PROVIDES_SERVICE, OUT)]),
+    "service_home_location": (EntityType.SERVICE,
+                              [(RelationType.PROVIDES_SERVICE, IN), (RelationType.LOCATED_IN, OUT)]),
+    "home_location": (EntityType.NURSING_HOME, [(RelationType.LOCATED_IN, OUT)]),
+    "home_service": (EntityType.NURSING_HOME, [(RelationType.PROVIDES_SERVICE, OUT)]),
+}
+
+# Edge types that connections between seeds may use: those of the metapaths
+PATH_RELATIONS = frozenset(rel.value for _, steps in METAPATHS.values() for rel, _ in steps)
+
+
+class PathFinder:
+    """Bounded traversal over `adjacent(name) -> iterable of (neighbor, relation, "out" | "in")`.
+
+    One PathFinder serves one query: filtered adjacency is memoized and the
+    visit budget is shared by every search run through it. degree(name), if
+    given, answers the hub penalty without loading a node's adjacency.
+    """
+
+    def __init__(self, adjacent, fanout=20, budget=2000, degree=None):
+        self._adjacent = adjacent
+        self._degree = degree
+        self.fanout = fanout
+        self.budget = budget
+        self.visited = 0
+        self.truncated = False
+        self._adj = {}
+        self._degrees = {}
+
+    def neighbors(self, node, relations=None, direction=None):
+        """Edges of node over relations (a set, or None for all) and direction, in sorted order.
+
+        The filter is applied while the adjacency is iterated and the matches
+        are heapified rather than sorted, so taking the first k of a hub's
+        edges costs O(deg + k log deg) instead of a full sort.
+        """
+        key = (node, relations, direction)
+        adj = self._adj.get(key)
+        if adj is None:
+            adj = self._adj[key] = [e for e in self._adjacent(node)
+                                    if (relations is None or e[1] in relations)
+                                    and (direction is None or e[2] == direction)]
+            heapq.heapify(adj)
+        heap = list(adj)
+        while heap:
+            yield heapq.heappop(heap)
+
+    def degree(self, node):
+        d = self._degrees.get(node)
+        if d is None:
+            if self._degree is not None:
+                d = self._degree(node)
+            else:
+                d = sum(1 for _ in self._adjacent(node))
+            self._degrees[node] = d
+        return d
+
+    def _spend(self, n):
+        """Reserves n visits; returns how many are actually left to spend."""
+        n = min(n, self.budget - self.visited)
+        if n <= 0:
+            self.truncated = True
+            return 0
+        self.visited += n
+        return n
+
+    def _exhausted(self):
+        if self.visited >= self.budget:
+            self.truncated = True
+            return True
+        return False
+
+    def follow(self, start, steps, name=None):
+        """Paths from start along a metapath (steps of (relation, direction))."""
+        partial = [([start], [])]
+        for relation, direction in steps:
+            rel = getattr(relation, "value", relation)
+            extended = []
+            for nodes, hops in partial:
+                if self._exhausted():
+                    break
+                # One candidate past fanout tells whether the list was cut
+                candidates = list(islice((v for v, _, _ in self.neighbors(nodes[-1], frozenset([rel]), direction)
+                                          if v not in nodes), self.fanout + 1))
+                if len(candidates) > self.fanout:
+                    self.truncated = True
+                    candidates = candidates[:self.fanout]
+                allowed = self._spend(len(candidates))
+                extended += [(nodes + [v], hops + [(rel, direction)]) for v in candidates[:allowed]]
+            partial = extended
+        return [self._make_path(nodes, hops, name) for nodes, hops in partial if hops]
+
+    def between(self, source, target, max_hops=4, relations=None, limit=20):
+        """Shortest paths between two nodes (edges in either direction), by bidirectional BFS.
+
+        The side with the smaller frontier is expanded each round; the search stops
+        at the first depth where the two sides meet. relations optionally restricts
+        the edge types that may be used.
+        """
+        if source == target:
+            return []
+        allowed_rels = frozenset(getattr(r, "value", r) for r in relations) if relations else None
+        # node -> [(neighbor towards that side's root, relation, direction seen from node)]
+        parents = ({source: []}, {target: []})
+        frontiers = ([source], [target])
+        depth = 0
+        meet = []
+        while frontiers[0] and frontiers[1] and depth < max_hops and not meet:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            new = {}
+            for u in frontiers[side]:
+                if self._exhausted():
+                    break
+                expanded = 0
+                for v, rel, d in self.neighbors(u, allowed_rels):
+                    if v in seen:
+                        continue
+                    if v not in new:
+                        if expanded >= self.fanout:
+                            self.truncated = True
+                            break
+                        if not self._spend(1):
+                            break
+                        expanded += 1
+                    # Store the edge as seen from v, pointing back towards this side's root
+                    new.setdefault(v, []).append((u, rel, IN if d == OUT else OUT))
+            seen.update(new)
+            frontiers = (list(new), frontiers[1]) if side == 0 else (frontiers[0], list(new))
+            depth += 1
+            meet = sorted(v for v in new if v in other)
+
+        paths = []
+        for m in meet:
+            for head in islice(self._walk_back(parents[0], m), limit):
+                for tail in islice(self._walk_back(parents[1], m), limit):
+                    # head: source ... m, tail: target ... m (edge directions as seen from each node)
+                    nodes = head[0][::-1] + tail[0][1:]
+                    hops = [(rel, OUT if d == IN else IN) for rel, d in reversed(head[1])] + tail[1]
+                    paths.append(self._make_path(nodes, hops, "between"))
+        return paths
+
+    def _walk_back(self, parents, node):
+        """Yields (nodes from node back to the root, [(relation, direction) along that walk])."""
+        if not parents[node]:
+            yield [node], []
+            return
+        for prev, rel, d in parents[node]:
+            for nodes, hops in self._walk_back(parents, prev):
+                yield [node] + nodes, [(rel, d)] + hops
+
+    def _make_path(self, nodes, hops, name):
+        # Hubs in the middle of a path make it less specific to the query
+        hub_penalty = sum(math.log1p(self.degree(n)) for n in nodes[1:-1])
+        return {"nodes": nodes, "relations": hops, "metapath": name,
+                "score": 1.0 / (len(hops) + hub_penalty)}
+
+
+def rank_paths(paths, top_k=10):
+    """Best first, duplicates (same nodes and relations) removed."""
+    out, seen = [], set()
+    for p in sorted(paths, key=lambda p: (-p["score"], len(p["nodes"]), p["nodes"])):
+        key = (tuple(p["nodes"]), tuple(p["relations"]))
+        if key not in seen:
+            seen.add(key)
+            out.append(p)
+            if len(out) == top_k:
+                break
+    return out
+
+
+def find_paths(finder, seeds, node_type, max_hops=4, top_k=10):
+    """Paths between each pair of seeds; with a single seed (or no connection), its metapaths."""
+    paths = []
+    for a, b in combinations(seeds, 2):
+        paths += finder.between(a, b, max_hops=max_hops, relations=PATH_RELATIONS)
+    if not paths:
+        for seed in seeds:
+            etype = node_type(seed)
+            for name, (start_type, steps) in METAPATHS.items():
+                if start_type.value == etype:
+                    paths += finder.follow(seed, steps, name)
+    return rank_paths(paths, top_k)
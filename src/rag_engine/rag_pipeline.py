@@ -1,5 +1,17 @@
 from .retriever import GraphRetriever
+from .cache import AnswerCache
+from .instrumentation import NULL_TRACER
+from .context_builder import render_structured
+from .hot_reload import GraphSnapshot, GraphReloader
+from ..kg_construction.ontology import EntityType
+from ..kg_construction.query_index import QueryIndex, INDEX_FILE
+from ..kg_construction.manifest import snapshot_version, same_build
+import asyncio
 import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from zhipuai import ZhipuAI
@@ -7,15 +19,17 @@ except ImportError:
     ZhipuAI = None
 
 class ZhipuLLM:
+    model = "glm-4-flash"
+
     def __init__(self, api_key):
         if not ZhipuAI:
             raise ImportError("Please install zhipuai: pip install zhipuai")
         self.client = ZhipuAI(api_key=api_key)
         
-    def generate(self, prompt):
+    def generate(self, prompt, raise_errors=False):
         try:
             response = self.client.chat.completions.create(
-                model="glm-4-flash",
+                model=self.model,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
@@ -23,10 +37,36 @@ class ZhipuLLM:
             )
             return response.choices[0].message.content
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Error calling ZhipuAI: {str(e)}"
 
+    def generate_stream(self, prompt, raise_errors=False):
+        """Yields content deltas as they arrive from the API."""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True
+            )
+            for chunk in response:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            if raise_errors:
+                raise
+            yield f"Error calling ZhipuAI: {str(e)}"
+
 class MockLLM:
-    def generate(self, prompt):
+    model = "mock"
+    # Simulated streaming: characters per chunk and seconds between chunks
+    stream_chunk_size = 4
+    stream_interval = 0.0
+
+    def generate(self, prompt, raise_errors=False):
         # Determine intent for mock response
         if "高血压" in prompt and "保险" in prompt:
             return "根据图谱信息，【泰康全能保】覆盖恶性肿瘤和心肌梗死，特别说明指出高血压患者需核保。因此，70岁高血压患者购买需经过核保流程。而【银发无忧防癌险】特别说明三高人群可投保，可能更适合。"
@@ -35,11 +75,118 @@ class MockLLM:
         else:
             return "这是基于GraphRAG生成的回答示例。根据图谱数据，我们找到了相关实体和关系..."
 
+    def generate_stream(self, prompt, raise_errors=False):
+        answer = MockLLM.generate(self, prompt)
+        for i in range(0, len(answer), self.stream_chunk_size):
+            if self.stream_interval:
+                time.sleep(self.stream_interval)
+            yield answer[i:i + self.stream_chunk_size]
+
+class FakeLLM(MockLLM):
+    """Offline stand-in for a remote LLM: MockLLM answers after a simulated network delay.
+
+    latency/jitter are in seconds; failure_rate makes a fraction of calls raise,
+    so the retry path of answer_batch can be exercised without a network.
+    """
+    model = "fake"
+
+    def __init__(self, latency=0.5, jitter=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self):
+        self.calls += 1
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("FakeLLM: simulated upstream failure")
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def generate(self, prompt, raise_errors=False):
+        try:
+            time.sleep(self._delay())
+        except ConnectionError as e:
+            if raise_errors:
+                raise
+            return f"Error calling FakeLLM: {str(e)}"
+        return super().generate(prompt)
+
+    async def agenerate(self, prompt):
+        await asyncio.sleep(self._delay())
+        return super().generate(prompt)
+
+    def generate_stream(self, prompt, raise_errors=False):
+        # latency models time-to-first-token; stream_interval paces the rest
+        try:
+            time.sleep(self._delay())
+        except ConnectionError as e:
+            if raise_errors:
+                raise
+            yield f"Error calling FakeLLM: {str(e)}"
+            return
+        yield from super().generate_stream(prompt)
+
+class AnswerStream:
+    """Iterable of answer chunks that measures time-to-first-token and total generation time.
+
+    After iteration, `text` holds the full answer and `ttft`/`total_time` are set
+    (seconds, measured from the start of iteration); on_complete(stream) is then called.
+    """
+
+    def __init__(self, chunks, on_complete=None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self.text = None
+        self.ttft = None
+        self.total_time = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        parts = []
+        for chunk in self._chunks:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - start
+            parts.append(chunk)
+            yield chunk
+        self.total_time = time.perf_counter() - start
+        self.text = "".join(parts)
+        if self._on_complete is not None:
+            self._on_complete(self)
+
+    def stats(self):
+        return {"ttft": self.ttft, "total_time": self.total_time}
+
+
+def _closing(span, chunks):
+    """Yields chunks, then closes span (already entered) once they are exhausted or abandoned."""
+    exc = (None, None, None)
+    try:
+        yield from chunks
+    except Exception as e:
+        exc = (type(e), e, e.__traceback__)
+        raise
+    finally:
+        span.__exit__(*exc)
+
+_AGE = re.compile(r"(\d{1,3})\s*周?岁")
+_HOME_WORDS = ("养老", "机构", "护理院", "敬老院")
+
 class RAGPipeline:
-    def __init__(self, data_processed_path, api_key=None):
-        kg_path = os.path.join(data_processed_path, "kg.pkl")
-        self.retriever = GraphRetriever(kg_path)
-        
+    def __init__(self, data_processed_path, api_key=None, graph_file="kg.pkl", cache=None,
+                 context_max_tokens=2000, tracer=None, fast_path=True, retrieval_mode="ego"):
+        # graph_file may also point to a CSR graph ("kg.csr") produced by GraphBuilder.save_csr
+        kg_path = os.path.join(data_processed_path, graph_file)
+        self.data_processed_path = data_processed_path
+        self.graph_file = graph_file
+        self.fast_path = fast_path
+        # Per-stage spans and counters (see instrumentation.py); no-op unless sinks are attached
+        self.tracer = tracer or NULL_TRACER
+
+        # Graph, retriever and query index of one build; replaced as a whole by reload_graph()
+        self._snapshot = self.load_snapshot()
+        self.reloader = None
+
         if api_key:
             print("Initializing ZhipuAI LLM...")
             self.llm = ZhipuLLM(api_key)
@@ -47,12 +194,215 @@ class RAGPipeline:
             print("Warning: No API Key provided, using Mock LLM.")
             self.llm = MockLLM()
 
-    def answer_question(self, question):
-        # 1. Retrieve
-        context = self.retriever.get_context(question, hops=1)
-        
-        # 2. Construct Prompt
-        prompt = f"""
+        # cache=None: in-memory AnswerCache; False: disabled; or a configured AnswerCache
+        # (e.g. AnswerCache(kg_path, disk_path="answers.sqlite") for a persistent tier)
+        if cache is None:
+            cache = AnswerCache(kg_path)
+        self.cache = cache or None
+        if self.cache is not None and self.graph_version is not None:
+            self.cache.set_graph_version(f"v{self.graph_version}")
+        # Upper bound on retrieved context size, so dense hubs cannot blow up the prompt
+        self.context_max_tokens = context_max_tokens
+        # "ego": everything within `hops` of the matched entities; "paths": ranked, bounded
+        # metapaths / connecting paths between them (see path_retrieval.py)
+        self.retrieval_mode = retrieval_mode
+
+    # --- graph snapshots ---
+
+    @property
+    def retriever(self):
+        return self._snapshot.retriever
+
+    @property
+    def query_index(self):
+        return self._snapshot.query_index
+
+    @property
+    def graph_version(self):
+        """Manifest version of the active snapshot (None for graphs built without a manifest)."""
+        return self._snapshot.version
+
+    def available_version(self):
+        """Version of the graph file once its build has written all its artifacts."""
+        return snapshot_version(self.data_processed_path, self.graph_file)
+
+    def load_snapshot(self):
+        start = time.perf_counter()
+        # Read first: if a build finishes during the load, the next check picks it up
+        version = self.available_version()
+        retriever = GraphRetriever(os.path.join(self.data_processed_path, self.graph_file))
+        retriever.tracer = self.tracer
+        # Precomputed lookups (GraphBuilder.save_query_index) answer the common question
+        # shapes without a graph walk; skipped if the index has not been built with this graph
+        query_index = None
+        if (self.fast_path and os.path.exists(os.path.join(self.data_processed_path, INDEX_FILE))
+                and same_build(self.data_processed_path, self.graph_file, INDEX_FILE)):
+            query_index = QueryIndex.load(self.data_processed_path)
+        return GraphSnapshot(retriever, query_index, version, time.perf_counter() - start)
+
+    def swap_snapshot(self, snapshot):
+        snapshot.retriever.tracer = self.tracer
+        if self.cache is not None and snapshot.version is not None:
+            self.cache.set_graph_version(f"v{snapshot.version}")
+        # A single reference assignment: each query sees either the old or the new snapshot
+        self._snapshot = snapshot
+
+    def reload_graph(self):
+        """Loads and swaps in a newer graph version now, if there is one. Returns True if swapped."""
+        return (self.reloader or GraphReloader(self)).check()
+
+    def start_hot_reload(self, interval=5.0):
+        """Polls the build manifest every interval seconds and reloads the graph in the background."""
+        if self.reloader is None:
+            self.reloader = GraphReloader(self, interval).start()
+        return self.reloader
+
+    def reload_status(self):
+        snapshot, reloader = self._snapshot, self.reloader
+        return {"version": snapshot.version, "loaded_at": snapshot.loaded_at,
+                "load_seconds": snapshot.load_seconds, "watching": reloader is not None,
+                "reloading": bool(reloader and reloader.reloading),
+                "reloads": reloader.reloads if reloader else 0,
+                "last_error": reloader.last_error if reloader else None}
+
+    # --- retrieval ---
+
+    def get_context(self, question, hops=1):
+        """Retrieval through the question-level cache."""
+        budget, mode = self.context_max_tokens, self.retrieval_mode
+        # Captured once: a query in flight during a reload finishes on the snapshot it started with
+        snapshot = self._snapshot
+        with self.tracer.span("retrieval") as span:
+            if self.cache is None:
+                return self._retrieve(question, hops, snapshot)
+            context = self.cache.get_context(question, hops, budget, mode)
+            span.set("cache_hit", context is not None)
+            if context is None:
+                context = self._retrieve(question, hops, snapshot)
+                if snapshot is self._snapshot:
+                    self.cache.put_context(question, hops, context, budget, mode)
+            return context
+
+    def _retrieve(self, question, hops, snapshot=None):
+        snapshot = snapshot or self._snapshot
+        result = self.structured_lookup(question, snapshot)
+        if result is not None:
+            self.tracer.incr("structured_hits")
+            return render_structured(result, max_tokens=self.context_max_tokens)
+        return snapshot.retriever.get_context(question, hops=hops, max_tokens=self.context_max_tokens,
+                                              mode=self.retrieval_mode)
+
+    def structured_lookup(self, question, snapshot=None):
+        """Answers the common question shapes from the query index, or None for anything else.
+
+        Recognized: insurance for a disease or for the diseases a drug treats
+        (optionally "N岁"), insurance by age alone, nursing homes by location/service.
+        The result dict carries "intent", the matched entities and sorted "results";
+        a question on several diseases / drugs gets intent "multiple", with one
+        such result per entity in "sections". Entities the index has nothing for
+        are left out; if that leaves no results, normal retrieval answers instead.
+        """
+        snapshot = snapshot or self._snapshot
+        if snapshot.query_index is None:
+            return None
+        with self.tracer.span("structured_lookup"):
+            index, retriever = snapshot.query_index, snapshot.retriever
+            m = _AGE.search(question)
+            age = int(m.group(1)) if m else None
+            asks_insurance = "险" in question
+            seeds = retriever.search_entities(question)
+            types = {s: retriever.node_type(s) for s in seeds}
+
+            if asks_insurance:
+                sections = []
+                for seed in seeds:
+                    if types[seed] == EntityType.DISEASE.value:
+                        products = index.products_for_disease(seed, age)
+                        variants = index.variant_products(seed, age)
+                        if products or variants:
+                            listed = products + [p for ps in variants.values() for p in ps]
+                            sections.append({"intent": "products_for_disease", "entity": seed, "age": age,
+                                             "results": products, "variants": variants,
+                                             "ages": {p: index.age_range(p) for p in listed}})
+                    elif types[seed] == EntityType.DRUG.value:
+                        by_disease = index.products_for_drug(seed, age)
+                        variants = index.variant_products_for_drug(seed, age)
+                        if by_disease or variants:
+                            listed = [p for d in [by_disease, *variants.values()] for ps in d.values() for p in ps]
+                            sections.append({"intent": "products_for_drug", "entity": seed, "age": age,
+                                             "results": by_disease, "variants": variants,
+                                             "ages": {p: index.age_range(p) for p in listed}})
+                if len(sections) == 1:
+                    return sections[0]
+                if sections:
+                    return {"intent": "multiple", "age": age, "sections": sections}
+                if not seeds and age is not None:
+                    products = index.products_for_age(age)
+                    if products:
+                        return {"intent": "products_for_age", "age": age, "results": products,
+                                "ages": {p: index.age_range(p) for p in products}}
+
+            if any(w in question for w in _HOME_WORDS):
+                locations = [s for s in seeds if types[s] == EntityType.LOCATION.value]
+                services = [s for s in seeds if types[s] == EntityType.SERVICE.value]
+                if locations or services:
+                    location = locations[0] if locations else None
+                    homes = index.nursing_homes(location, services)
+                    if homes:
+                        return {"intent": "nursing_homes", "location": location, "services": services,
+                                "results": homes}
+        return None
+
+    def generate(self, prompt):
+        """Generation through the prompt-level cache. Failed calls are not cached."""
+        if self.cache is not None:
+            answer = self.cache.get_answer(prompt, self.llm.model)
+            if answer is not None:
+                return answer
+        with self.tracer.span("llm_generate"):
+            try:
+                answer = self.llm.generate(prompt, raise_errors=True)
+            except Exception as e:
+                self.tracer.incr("llm_errors")
+                return f"Error calling LLM: {str(e)}"
+        if self.cache is not None:
+            self.cache.put_answer(prompt, self.llm.model, answer)
+        return answer
+
+    def generate_stream(self, prompt, span=None):
+        """Streaming counterpart of generate(); a cached answer is replayed as a single chunk.
+
+        span, if given, is an entered span that is closed when the stream ends.
+        """
+        chunks, on_complete = self._stream_llm(prompt), self._record_stream
+        if self.cache is not None:
+            cached = self.cache.get_answer(prompt, self.llm.model)
+            if cached is not None:
+                chunks, on_complete = iter([cached]), None
+        if span is not None:
+            chunks = _closing(span, chunks)
+        return AnswerStream(chunks, on_complete=on_complete)
+
+    def _record_stream(self, stream):
+        self.tracer.observe("llm_generate_seconds", stream.total_time)
+        if stream.ttft is not None:
+            self.tracer.observe("llm_ttft_seconds", stream.ttft)
+
+    def _stream_llm(self, prompt):
+        parts = []
+        try:
+            for chunk in self.llm.generate_stream(prompt, raise_errors=True):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            self.tracer.incr("llm_errors")
+            yield f"Error calling LLM: {str(e)}"
+            return
+        if self.cache is not None:
+            self.cache.put_answer(prompt, self.llm.model, "".join(parts))
+
+    def build_prompt(self, question, context):
+        return f"""
         你是一个智能保险医养助手。请根据以下知识图谱上下文回答用户问题。
         
         上下文信息：
@@ -62,12 +412,138 @@ class RAGPipeline:
         
         回答要求：准确，基于事实，引用上下文。
         """
-        
-        # 3. Generate
-        answer = self.llm.generate(prompt)
+
+    def answer_question(self, question):
+        with self.tracer.span("question"):
+            # 1. Retrieve
+            context = self.get_context(question, hops=1)
+            
+            # 2. Construct Prompt
+            with self.tracer.span("prompt_build"):
+                prompt = self.build_prompt(question, context)
+            
+            # 3. Generate
+            answer = self.generate(prompt)
         
         return {
             "question": question,
             "context": context,
             "answer": answer
         }
+
+    def stream_question(self, question):
+        """Like answer_question, but "answer" is an AnswerStream to iterate for token chunks.
+
+        The "question" span stays open until the caller has consumed the stream.
+        """
+        span = self.tracer.span("question")
+        span.__enter__()
+        try:
+            context = self.get_context(question, hops=1)
+            with self.tracer.span("prompt_build"):
+                prompt = self.build_prompt(question, context)
+        except Exception as e:
+            span.__exit__(type(e), e, e.__traceback__)
+            raise
+        return {
+            "question": question,
+            "context": context,
+            "answer": self.generate_stream(prompt, span=span)
+        }
+
+    def answer_batch(self, questions, concurrency=8, timeout=60.0, retries=2, backoff=0.5):
+        """Answers many questions with up to `concurrency` LLM calls in flight.
+
+        Results are returned in input order. Each result has an extra "error" key,
+        None on success or the last exception message once retries are exhausted.
+        Blocking; callers already on an event loop await answer_batch_async instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.answer_batch_async(questions, concurrency, timeout, retries, backoff))
+        raise RuntimeError("answer_batch() was called from a running event loop; "
+                           "use `await pipeline.answer_batch_async(...)` instead")
+
+    async def answer_batch_async(self, questions, concurrency=8, timeout=60.0, retries=2, backoff=0.5):
+        # 1. Retrieve each distinct question on a worker thread so the event loop stays free
+        unique = list(dict.fromkeys(questions))
+        found = await asyncio.gather(*(asyncio.to_thread(self.get_context, q, 1) for q in unique))
+        contexts = dict(zip(unique, found))
+
+        # 2. Dispatch generations; blocking clients run on a dedicated thread pool
+        semaphore = asyncio.Semaphore(concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            tasks = [self._generate_with_retry(self.build_prompt(q, contexts[q]), semaphore, executor,
+                                               timeout, retries, backoff)
+                     for q in questions]
+            outcomes = await asyncio.gather(*tasks)
+
+        return [{"question": q, "context": contexts[q], "answer": answer, "error": error}
+                for q, (answer, error) in zip(questions, outcomes)]
+
+    async def answer_question_async(self, question, semaphore, executor, timeout=60.0, retries=2, backoff=0.5,
+                                    retrieval_executor=None):
+        """answer_question for callers already on an event loop (e.g. the query service).
+
+        Retrieval runs on retrieval_executor (the loop's default executor if None)
+        so it does not block the loop. LLM calls share the caller's semaphore and
+        executor; the result has the same "error" key as answer_batch.
+        """
+        loop = asyncio.get_running_loop()
+        context = await loop.run_in_executor(retrieval_executor, self.get_context, question, 1)
+        prompt = self.build_prompt(question, context)
+        answer, error = await self._generate_with_retry(prompt, semaphore, executor, timeout, retries, backoff)
+        return {"question": question, "context": context, "answer": answer, "error": error}
+
+    async def _generate_with_retry(self, prompt, semaphore, executor, timeout, retries, backoff):
+        if self.cache is not None:
+            cached = self.cache.get_answer(prompt, self.llm.model)
+            if cached is not None:
+                return cached, None
+        answer, error = await self._call_llm(prompt, semaphore, executor, timeout, retries, backoff)
+        if error is None and self.cache is not None:
+            self.cache.put_answer(prompt, self.llm.model, answer)
+        return answer, error
+
+    async def _call_llm(self, prompt, semaphore, executor, timeout, retries, backoff):
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                # Exponential backoff with jitter, outside the semaphore so the slot is freed
+                await asyncio.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            async with semaphore:
+                try:
+                    with self.tracer.span("llm_generate"):
+                        if hasattr(self.llm, "agenerate"):
+                            call = self.llm.agenerate(prompt)
+                        else:
+                            call = loop.run_in_executor(executor, lambda: self.llm.generate(prompt, raise_errors=True))
+                        return await asyncio.wait_for(call, timeout), None
+                except Exception as e:
+                    self.tracer.incr("llm_errors")
+                    error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        return f"Error calling LLM: {error}", error
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline batch QA throughput check against FakeLLM.")
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated LLM latency in seconds")
+    parser.add_argument("--concurrency", type=str, default="1,8,32")
+    args = parser.parse_args()
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    pipeline = RAGPipeline(os.path.join(current_dir, "../../data/processed"), cache=False)
+    pipeline.llm = FakeLLM(latency=args.latency, jitter=args.latency / 4, seed=0)
+    samples = ["高血压能买什么保险？", "泰康之家·燕园在哪里？", "糖尿病用什么药？", "北京有哪些养老机构？"]
+    questions = [samples[i % len(samples)] for i in range(args.questions)]
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        start = time.perf_counter()
+        results = pipeline.answer_batch(questions, concurrency=c)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r["error"])
+        print(f"concurrency={c:>3}  {elapsed:.2f}s  {len(questions) / elapsed:.1f} questions/s  errors={errors}")
@@ -1,65 +1,351 @@
 import networkx as nx
 import pickle
 import os
+import bisect
+import heapq
+import threading
+from itertools import chain
+try:
+    from .entity_matcher import EntityMatcher, IndexedMatcher
+    from .context_builder import personalized_pagerank, format_props, render_context, render_fragments, render_paths
+    from .instrumentation import NULL_TRACER
+    from .fuzzy_index import FuzzyIndex
+    from .path_retrieval import PathFinder, find_paths
+except ImportError:
+    from entity_matcher import EntityMatcher, IndexedMatcher
+    from context_builder import personalized_pagerank, format_props, render_context, render_fragments, render_paths
+    from instrumentation import NULL_TRACER
+    from fuzzy_index import FuzzyIndex
+    from path_retrieval import PathFinder, find_paths
+
+# Sorts after every name that starts with a given prefix
+PREFIX_END = "\U0010ffff"
+
 
 class GraphRetriever:
     def __init__(self, kg_path):
         print(f"Loading Graph from {kg_path}")
-        with open(kg_path, "rb") as f:
-            self.G = pickle.load(f)
+        if kg_path.endswith(".csr"):
+            # Memory-mapped CSR store (see kg_construction/csr_graph.py)
+            from ..kg_construction.csr_graph import CSRGraph
+            self.G = CSRGraph.load(kg_path)
+            self.is_networkx = False
+        elif os.path.isdir(kg_path):
+            # Domain shards (see kg_construction/graph_shards.py): only the name index is read
+            # here, shards are loaded on first use. Same node_data / ego_edges interface as CSR.
+            from ..kg_construction.graph_shards import ShardedGraph
+            self.G = ShardedGraph.load(kg_path)
+            self.is_networkx = False
+        elif kg_path.endswith(".sqlite"):
+            # Out-of-core store (see kg_construction/sqlite_graph.py): names, attributes and
+            # edges stay on disk and every lookup is an indexed query
+            from ..kg_construction.sqlite_graph import SQLiteGraph
+            self.G = SQLiteGraph.load(kg_path)
+            self.is_networkx = False
+        else:
+            with open(kg_path, "rb") as f:
+                self.G = pickle.load(f)
+            self.is_networkx = True
+        self.out_of_core = getattr(self.G, "out_of_core", False)
+        # Dictionary-encoded attributes written with the graph (see kg_construction/node_store.py)
+        self.store = None if self.out_of_core else self._load_store(kg_path)
+        # Spelling variant -> canonical name, from build-time entity resolution
+        self.canonical = self.G.aliases() if self.out_of_core else self._load_aliases(kg_path)
+        self.aliases_of = {}
+        for alias, name in self.canonical.items():
+            self.aliases_of.setdefault(name, []).append(alias)
+        # Precomputed 1-hop contexts per entity (see kg_construction/context_fragments.py)
+        self.fragments = self._load_fragments(kg_path)
+        if self.out_of_core:
+            # Mentions are looked up in the store's name index instead of an in-memory automaton
+            self.matcher = IndexedMatcher(self.G.names_in, self.G.max_name_len, self.G.number_of_nodes())
+        else:
+            self.matcher = EntityMatcher(self.G.nodes())
+        # Replaced by RAGPipeline with its own tracer; disabled (no-op) by default
+        self.tracer = NULL_TRACER
+        # n-gram index for mentions the exact matcher misses; built on first use (see fuzzy_index)
+        self._fuzzy = None
+        self._fuzzy_lock = threading.Lock()
+        # Sorted node names for prefix lookups; built on first use
+        self._sorted_names = None
+
+    @staticmethod
+    def _same_build(kg_path, file_name):
+        """True if file_name was recorded by the build that wrote the graph file (see manifest.same_build)."""
+        try:
+            from ..kg_construction.manifest import same_build
+        except ImportError:
+            from manifest import same_build
+        path = os.path.normpath(kg_path)
+        return same_build(os.path.dirname(path), os.path.basename(path), file_name)
+
+    def _load_store(self, kg_path):
+        try:
+            from ..kg_construction.node_store import NodeStore, STORE_FILE
+        except ImportError:
+            from node_store import NodeStore, STORE_FILE
+        data_dir = os.path.dirname(os.path.normpath(kg_path))
+        # During a rebuild the store can already be newer than the graph file
+        if not os.path.exists(os.path.join(data_dir, STORE_FILE)) or not self._same_build(kg_path, STORE_FILE):
+            return None
+        store = NodeStore.load(data_dir)
+        # The manifest check passes when no manifest exists, so compare the node names themselves
+        if not store.matches(self.G.nodes()):
+            print(f"Warning: {STORE_FILE} does not match the graph, reading attributes from the graph.")
+            return None
+        if self.is_networkx:
+            # The per-node dicts are what the store replaces; drop their contents
+            for _, data in self.G.nodes(data=True):
+                data.clear()
+        return store
+
+    def _load_aliases(self, kg_path):
+        try:
+            from ..kg_construction.entity_resolution import load_aliases, ALIAS_FILE
+        except ImportError:
+            from entity_resolution import load_aliases, ALIAS_FILE
+        if not self._same_build(kg_path, ALIAS_FILE):
+            return {}
+        return load_aliases(os.path.dirname(os.path.normpath(kg_path)))
+
+    def _load_fragments(self, kg_path):
+        try:
+            from ..kg_construction.context_fragments import FragmentStore, FRAGMENT_FILE
+        except ImportError:
+            from context_fragments import FragmentStore, FRAGMENT_FILE
+        data_dir = os.path.dirname(os.path.normpath(kg_path))
+        if not os.path.exists(os.path.join(data_dir, FRAGMENT_FILE)) or not self._same_build(kg_path, FRAGMENT_FILE):
+            return None
+        fragments = FragmentStore.load(data_dir)
+        if fragments.num_nodes != self.G.number_of_nodes():
+            print(f"Warning: {FRAGMENT_FILE} does not match the graph, using live traversal.")
+            return None
+        return fragments
+
+    def node_data(self, node):
+        if self.store is not None:
+            return self.store.node_data(node)
+        if not self.is_networkx:
+            return self.G.node_data(node)
+        return self.G.nodes[node]
+
+    def adjacent(self, node):
+        """(neighbor, relation, "out" | "in") for all edges incident to node (lazily on networkx)."""
+        if not self.is_networkx:
+            return self.G.adjacent(node)
+        return chain(((v, rel, "out") for _, v, rel in self.G.out_edges(node, data="relation")),
+                     ((u, rel, "in") for u, _, rel in self.G.in_edges(node, data="relation")))
+
+    def degree(self, node):
+        """In + out degree, without listing the edges where the backend can."""
+        if self.is_networkx:
+            return self.G.degree(node) if node in self.G else 0
+        if hasattr(self.G, "degree"):
+            return self.G.degree(node)
+        return len(self.G.adjacent(node))
+
+    def ego_edges(self, start_node, hops=1):
+        """Edges (u, v, relation) among nodes within `hops` of start_node, ignoring direction."""
+        if not self.is_networkx:
+            return self.G.ego_edges(start_node, radius=hops)
+        # radius=1 means 1 hop. Use undirected to get incoming edges (like Insurance -> Disease)
+        # Optimization: use G.to_undirected(as_view=True) to avoid copying data.
+        subgraph = nx.ego_graph(self.G.to_undirected(as_view=True), start_node, radius=hops)
+        # The undirected view loses edge direction, so induce the subgraph from the original G
+        subgraph = self.G.subgraph(list(subgraph.nodes()))
+        return [(u, v, data.get('relation', 'RELATED')) for u, v, data in subgraph.edges(data=True)]
+
+    def node_props(self, node):
+        """Rendered properties of node for the context (pre-rendered when a node store is loaded)."""
+        if self.store is not None:
+            return self.store.format_props(node)
+        return format_props(self.node_data(node))
+
+    def node_type(self, node):
+        if self.store is not None:
+            return self.store.node_type(node)
+        if hasattr(self.G, "node_type"):
+            return self.G.node_type(node)
+        return self.node_data(node).get("type")
+
+    @property
+    def fuzzy(self):
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    try:
+                        from ..kg_construction.entity_resolution import lookup_aliases
+                    except ImportError:
+                        from entity_resolution import lookup_aliases
+                    names = list(self.G.nodes())
+                    aliases = list(lookup_aliases(names))
+                    for name in names:
+                        if self.store is not None:
+                            node_aliases = self.store.value(name, "aliases")
+                        else:
+                            node_aliases = self.node_data(name).get("aliases") if self.is_networkx else None
+                        if isinstance(node_aliases, str):
+                            node_aliases = [a for a in node_aliases.split(",") if a]
+                        aliases += [(alias, name) for alias in node_aliases or ()]
+                    self._fuzzy = FuzzyIndex(names, [self.node_type(n) for n in names], aliases)
+        return self._fuzzy
 
-    def search_entities(self, query):
-        """Simple keyword matching for entities."""
-        # Limit the number of matched seeds to 3 to prevent explosion
+    def fuzzy_search(self, query, top_k=5, entity_type=None, min_score=0.5):
+        """Ranked (name, score) candidates by character n-gram overlap, optionally of one EntityType."""
+        if self.out_of_core:
+            # FTS over the name bigrams in the store
+            return self.G.fuzzy_search(query, top_k=top_k, entity_type=entity_type, min_score=min_score)
+        return self.fuzzy.search(query, top_k=top_k, entity_type=entity_type, min_score=min_score)
+
+    def names_with_prefix(self, text, limit=3):
+        """Up to limit names starting with text ("泰康" -> "泰康之家·燕园", ...), shortest first, then by name.
+
+        A range of a sorted name index, so no scan over all nodes, and the same
+        ranking on every backend.
+        """
+        text = text.strip()
+        if not text:
+            return []
+        if self.out_of_core:
+            return self.G.names_with_prefix(text, limit)
+        if self._sorted_names is None:
+            with self._fuzzy_lock:
+                if self._sorted_names is None:
+                    self._sorted_names = sorted(self.G.nodes())
+        names = self._sorted_names
+        lo = bisect.bisect_left(names, text)
+        hi = bisect.bisect_left(names, text + PREFIX_END, lo)
+        return heapq.nsmallest(limit, (names[i] for i in range(lo, hi)), key=lambda n: (len(n), n))
+
+    def search_entities(self, query, top_k=3):
+        """Dictionary matching of entity mentions in the query (single pass).
+
+        When no name occurs verbatim, a query that starts names (a partial name
+        such as "泰康") matches the shortest of them; otherwise the fuzzy n-gram
+        index is tried.
+        """
+        # Longest mentions first ("原发性高血压" before "高血压"), ties broken by position.
+        # Limit the number of matched seeds to top_k to prevent explosion
+        mentions = sorted(self.matcher.find(query), key=lambda m: (m[0] - m[1], m[0]))
+        names = [name for _, _, name in mentions]
+        if not names:
+            names = self.names_with_prefix(query, top_k)
+            if names:
+                self.tracer.incr("prefix_fallbacks")
+        if not names:
+            names = [name for name, _ in self.fuzzy_search(query, top_k=top_k)]
+            if names:
+                self.tracer.incr("fuzzy_fallbacks")
+        # Spelling variants resolve to their canonical entity ("高血压病" -> "高血压")
         matches = []
-        for node in self.G.nodes():
-            if query in node or node in query:
-                matches.append(node)
-        return matches[:3]
-
-    def get_context(self, query, hops=1):
-        """Retrieves subgraphs for entities found in query."""
-        entities = self.search_entities(query)
-        if not entities:
-            return "No relevant entities found in Knowledge Graph."
-        
-        context_str = ""
-        visited_nodes = set()
-        
-        for start_node in entities:
-            context_str += f"\n--- Context for '{start_node}' ---\n"
-            # Get ego graph (subgraph)
-            # radius=1 means 1 hop. Use undirected to get incoming edges (like Insurance -> Disease)
-            # Optimization: Pre-compute undirected graph only once if needed, or use G.to_undirected(as_view=True)
-            # to avoid copying data. Since we query frequently, let's keep it simple but efficient.
-            subgraph = nx.ego_graph(self.G.to_undirected(as_view=True), start_node, radius=hops)
-            
-            # Use original directed edges for display where possible, or just list relations found
-            # But the subgraph edges might have lost direction or attributes if we rely on G_undir
-            # Better: Get nodes from undirected ego graph, then induce subgraph from original G
-            subgraph_nodes = list(subgraph.nodes())
-            subgraph = self.G.subgraph(subgraph_nodes)
-            
-            for u, v, data in subgraph.edges(data=True):
-                if u not in visited_nodes:
-                    node_data = self.G.nodes[u]
-                    # Print node properties
-                    props = ", ".join([f"{k}: {v}" for k,v in node_data.items() if k!='type'])
-                    if props:
-                        context_str += f"Entity: {u} ({props})\n"
-                    visited_nodes.add(u)
-                    
-                if v not in visited_nodes:
-                    node_data = self.G.nodes[v]
-                    props = ", ".join([f"{k}: {v}" for k,v in node_data.items() if k!='type'])
-                    if props:
-                        context_str += f"Entity: {v} ({props})\n"
-                    visited_nodes.add(v)
-                
-                rel_type = data.get('relation', 'RELATED')
-                context_str += f"({u}) --[{rel_type}]--> ({v})\n"
-                
-        return context_str
+        for name in names:
+            name = self.canonical.get(name, name)
+            if name not in matches:
+                matches.append(name)
+        return matches[:top_k]
+
+    def retrieve_facts(self, query, hops=1):
+        """Structured retrieval: seeds, entity properties and triples ranked by relevance.
+
+        Triples are scored by the personalized PageRank (restarted at the seeds) of
+        their endpoints, so facts next to a seed outrank those reached through a hub.
+        """
+        tracer = self.tracer
+        with tracer.span("entity_matching"):
+            entities = self.search_entities(query)
+        tracer.incr("seeds_found", len(entities))
+
+        with tracer.span("graph_walk"):
+            triples, owner = [], {}
+            # A canonical seed also walks from its aliases, which keep the edges of their own records
+            walks = [(seed, n) for seed in entities for n in [seed] + self.aliases_of.get(seed, [])]
+            for seed, start_node in walks:
+                for u, v, rel_type in self.ego_edges(start_node, hops):
+                    key = (u, rel_type, v)
+                    if key not in owner:
+                        # Each distinct triple is reported once, under the first seed reaching it
+                        owner[key] = seed
+                        triples.append((u, v, rel_type))
+            nodes = {n for u, v, _ in triples for n in (u, v)} | set(entities)
+        tracer.incr("subgraph_nodes", len(nodes))
+        tracer.incr("subgraph_edges", len(triples))
+
+        with tracer.span("fact_ranking"):
+            rank = personalized_pagerank(triples, [n for _, n in walks]) if triples else {}
+            ranked = sorted(({"head": u, "relation": rel, "tail": v, "seed": owner[(u, rel, v)],
+                              "score": rank.get(u, 0.0) + rank.get(v, 0.0)} for u, v, rel in triples),
+                            key=lambda t: (-t["score"], t["head"], t["relation"], t["tail"]))
+            return {
+                "seeds": entities,
+                "entities": {n: self.node_props(n) for n in nodes},
+                "triples": ranked,
+            }
+
+    def retrieve_paths(self, query, max_hops=4, fanout=20, budget=2000, top_k=10):
+        """Path retrieval: connections between the query's seeds, else the seeds' metapaths.
+
+        Traversal is bounded by fanout (neighbours per node and hop) and budget
+        (nodes visited per query); see path_retrieval.
+        """
+        tracer = self.tracer
+        with tracer.span("entity_matching"):
+            seeds = self.search_entities(query)
+        tracer.incr("seeds_found", len(seeds))
+        with tracer.span("path_search"):
+            finder = PathFinder(self.adjacent, fanout=fanout, budget=budget, degree=self.degree)
+            paths = find_paths(finder, seeds, self.node_type, max_hops=max_hops, top_k=top_k)
+        tracer.incr("path_nodes_visited", finder.visited)
+        nodes = {n for p in paths for n in p["nodes"]} | set(seeds)
+        return {
+            "seeds": seeds,
+            "entities": {n: self.node_props(n) for n in nodes},
+            "paths": paths,
+            "truncated": finder.truncated,
+        }
+
+    def get_context(self, query, hops=1, max_chars=None, max_tokens=None, mode="ego"):
+        """Retrieves subgraphs for entities found in query, most relevant facts first.
+
+        mode="paths" returns ranked paths instead (up to 2 * hops hops between
+        two seeds, or the seed's metapaths). max_chars / max_tokens bound the
+        size of the returned context.
+        """
+        if mode == "paths":
+            facts = self.retrieve_paths(query, max_hops=2 * max(hops, 1))
+            render = render_paths
+        elif hops == 1 and self.fragments is not None:
+            context = self.get_context_fragments(query, max_chars=max_chars, max_tokens=max_tokens)
+            if context is not None:
+                return context
+            facts = self.retrieve_facts(query, hops)
+            render = render_context
+        else:
+            facts = self.retrieve_facts(query, hops)
+            render = render_context
+        with self.tracer.span("context_render"):
+            context = render(facts, max_chars=max_chars, max_tokens=max_tokens)
+        self.tracer.incr("context_chars", len(context))
+        return context
+
+    def get_context_fragments(self, query, max_chars=None, max_tokens=None):
+        """1-hop context assembled from precomputed fragments; None if a walk start has none (hub)."""
+        tracer = self.tracer
+        with tracer.span("entity_matching"):
+            seeds = self.search_entities(query)
+        tracer.incr("seeds_found", len(seeds))
+        units = {}
+        for seed in seeds:
+            for start in [seed] + self.aliases_of.get(seed, []):
+                units[start] = self.fragments.units(start)
+                if units[start] is None:
+                    tracer.incr("fragment_misses")
+                    return None
+        with tracer.span("fragment_assembly"):
+            context = render_fragments(seeds, units, self.fragments.entity_line, self.aliases_of,
+                                       max_chars=max_chars, max_tokens=max_tokens)
+        tracer.incr("fragment_hits")
+        tracer.incr("context_chars", len(context))
+        return context
 
 if __name__ == "__main__":
     current_dir = os.path.dirname(os.path.abspath(__file__))
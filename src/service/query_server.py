@@ -0,0 +1,360 @@
+"""Headless HTTP query service over RAGPipeline.
+
+    python -m src.service.query_server --workers 4 --port 8000
+
+Endpoints (GET with query string, or POST with a JSON body):
+    /context?q=...&hops=1   -> {"question", "context"}
+    /answer?q=...           -> {"question", "context", "answer", "error"}
+    /health                 -> worker pid, queue depth, in-flight questions, graph version
+    /metrics                -> Prometheus text, summed over all workers
+
+The pipeline (graph, entity matcher) is loaded once in the parent and the
+listening socket is bound there; workers are forked afterwards and each runs
+its own asyncio loop on the shared socket. The default graph is the
+memory-mapped kg.csr, so all workers read one copy from the page cache instead
+of holding an unpickled graph each.
+
+Concurrent requests for the same (endpoint, hops, normalized question) share a
+single computation. Each worker has a bounded queue in front of a fixed number
+of consumers; when the queue is full the request is rejected with 503 and
+Retry-After instead of piling up. Retrieval runs on a small thread pool so a
+slow query does not stall the worker's event loop.
+
+With several workers, each one publishes its metrics registry to a shared
+temporary directory every --metrics-interval seconds, and /metrics merges its
+own live registry with the other workers' latest files.
+
+With --reload-interval, every worker polls the build manifest and swaps in a
+rebuilt graph in the background (see rag_engine/hot_reload.py).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from src.rag_engine.cache import normalize_question
+from src.rag_engine.instrumentation import Tracer, MetricsRegistry
+from src.rag_engine.rag_pipeline import RAGPipeline, FakeLLM
+
+MAX_BODY = 64 * 1024
+MAX_HOPS = 3
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class QueryService:
+    """One worker: HTTP handling, request coalescing and a bounded work queue."""
+
+    def __init__(self, pipeline, registry=None, queue_size=128, concurrency=32, llm_concurrency=16,
+                 timeout=60.0, retries=2, retrieval_threads=4, metrics_dir=None, metrics_interval=5.0):
+        self.pipeline = pipeline
+        self.registry = registry or MetricsRegistry()
+        self.tracer = pipeline.tracer
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.llm_concurrency = llm_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retrieval_threads = retrieval_threads
+        self.metrics_dir = metrics_dir
+        self.metrics_interval = metrics_interval
+        self.metrics_file = os.path.join(metrics_dir, f"{os.getpid()}.json") if metrics_dir else None
+        self.inflight = {}
+
+    async def serve(self, sock):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.llm_concurrency)
+        self.retrieval_executor = ThreadPoolExecutor(max_workers=self.retrieval_threads)
+        tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        if self.metrics_file:
+            tasks.append(asyncio.create_task(self._publish_metrics()))
+        try:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False)
+            self.retrieval_executor.shutdown(wait=False)
+            if self.metrics_file:
+                self.registry.dump(self.metrics_file)
+
+    # --- metrics ---
+
+    async def _publish_metrics(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            self.registry.dump(self.metrics_file)
+
+    def render_metrics(self):
+        """This worker's live registry plus the last published state of every other worker."""
+        if not self.metrics_dir:
+            return self.registry.render_prometheus()
+        merged = MetricsRegistry()
+        merged.merge(self.registry.state())
+        own = os.path.basename(self.metrics_file)
+        for name in os.listdir(self.metrics_dir):
+            if name == own or not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.metrics_dir, name), encoding="utf-8") as f:
+                    merged.merge(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merged.render_prometheus()
+
+    # --- work queue ---
+
+    async def submit(self, kind, question, hops):
+        key = (kind, hops, normalize_question(question))
+        future = self.inflight.get(key)
+        if future is not None:
+            self.tracer.incr("coalesced_requests")
+        else:
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((kind, question, hops, future))
+            except asyncio.QueueFull:
+                self.tracer.incr("rejected_requests")
+                raise Overloaded()
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: a client hanging up must not cancel the result other callers are waiting for
+        return await asyncio.shield(future)
+
+    async def _consume(self):
+        while True:
+            kind, question, hops, future = await self.queue.get()
+            try:
+                if kind == "context":
+                    context = await asyncio.get_running_loop().run_in_executor(
+                        self.retrieval_executor, self.pipeline.get_context, question, hops)
+                    result = {"question": question, "context": context}
+                else:
+                    result = await self.pipeline.answer_question_async(
+                        question, self.llm_slots, self.executor, self.timeout, self.retries,
+                        retrieval_executor=self.retrieval_executor)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                version = parts[2] if len(parts) == 3 else "HTTP/1.0"
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                if len(parts) != 3:
+                    status, payload, extra = 400, {"error": "malformed request line"}, {}
+                else:
+                    status, payload, extra = await self.dispatch(parts[0], parts[1], body)
+                await self._respond(writer, status, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if method not in ("GET", "POST"):
+            return 405, {"error": f"method {method} not allowed"}, {}
+        if path == "/health":
+            return 200, {"status": "ok", "pid": os.getpid(), "queue": self.queue.qsize(),
+                         "inflight": len(self.inflight), "graph": self.pipeline.reload_status()}, {}
+        if path == "/metrics":
+            return 200, self.render_metrics(), {}
+        if path not in ("/context", "/answer"):
+            return 404, {"error": f"unknown endpoint {path}"}, {}
+
+        start = time.perf_counter()
+        try:
+            question, hops = self._parse_query(url.query, body)
+            self.tracer.incr("requests")
+            result = await self.submit(path[1:], question, hops)
+        except BadRequest as e:
+            return 400, {"error": str(e)}, {}
+        except Overloaded:
+            return 503, {"error": "server busy, retry later"}, {"Retry-After": "1"}
+        except Exception as e:
+            self.tracer.incr("request_errors")
+            return 500, {"error": f"{type(e).__name__}: {e}"}, {}
+        self.tracer.observe(f"http_{path[1:]}_seconds", time.perf_counter() - start)
+        return 200, result, {}
+
+    @staticmethod
+    def _parse_query(query, body):
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise BadRequest("body is not valid JSON")
+            if not isinstance(data, dict):
+                raise BadRequest("body must be a JSON object")
+            params.update({k: v for k, v in data.items() if v is not None})
+        question = str(params.get("q") or params.get("question") or "").strip()
+        if not question:
+            raise BadRequest("missing question (q)")
+        try:
+            hops = int(params.get("hops", 1))
+        except (TypeError, ValueError):
+            raise BadRequest("hops must be an integer")
+        if not 0 <= hops <= MAX_HOPS:
+            raise BadRequest(f"hops must be between 0 and {MAX_HOPS}")
+        return question, hops
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive, extra=None):
+        if isinstance(payload, str):
+            body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, ctype = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def run_worker(pipeline, sock, options, reload_interval=None):
+    registry = MetricsRegistry()
+    pipeline.tracer = Tracer([registry])
+    pipeline.retriever.tracer = pipeline.tracer
+    if reload_interval:
+        # Threads do not survive fork, so each worker watches for rebuilds itself
+        pipeline.start_hot_reload(reload_interval)
+    service = QueryService(pipeline, registry=registry, **options)
+    try:
+        asyncio.run(service.serve(sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(pipeline, host="127.0.0.1", port=8000, workers=1, reload_interval=None, **options):
+    """Binds once, then runs `workers` forked worker processes on the shared socket (blocks).
+
+    With several workers, metrics are exchanged through a temporary directory
+    that is removed on shutdown.
+    """
+    sock = socket.create_server((host, port), backlog=1024)
+    print(f"Query service listening on http://{host}:{port} with {workers} worker(s)", flush=True)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        if workers > 1:
+            print("fork is not available on this platform, running a single worker.")
+        run_worker(pipeline, sock, options, reload_interval)
+        return
+
+    # fork (not spawn): children inherit the loaded pipeline and the socket without pickling
+    ctx = multiprocessing.get_context("fork")
+    options = dict(options, metrics_dir=tempfile.mkdtemp(prefix="kg_metrics_"))
+    procs = [ctx.Process(target=run_worker, args=(pipeline, sock, options, reload_interval),
+                         daemon=True) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    # SIGTERM would otherwise kill only the parent and leave the workers serving
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for p in procs:
+            p.join()
+        sock.close()
+        shutil.rmtree(options["metrics_dir"], ignore_errors=True)
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Async HTTP query service for the knowledge graph.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes sharing the graph")
+    parser.add_argument("--data", default=os.path.join(current_dir, "../../data/processed"))
+    parser.add_argument("--graph-file", default="kg.csr",
+                        help="kg.csr (memory-mapped, shared across workers), kg_shards or kg.pkl")
+    parser.add_argument("--api-key", default=os.environ.get("ZHIPUAI_API_KEY"),
+                        help="ZhipuAI key (default $ZHIPUAI_API_KEY); MockLLM without one")
+    parser.add_argument("--fake-latency", type=float, default=None,
+                        help="use FakeLLM with this simulated latency in seconds (load testing)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the answer cache")
+    parser.add_argument("--queue-size", type=int, default=128, help="pending requests per worker before 503")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests processed at once per worker")
+    parser.add_argument("--llm-concurrency", type=int, default=16, help="LLM calls in flight per worker")
+    parser.add_argument("--timeout", type=float, default=60.0, help="LLM call timeout in seconds")
+    parser.add_argument("--retrieval-threads", type=int, default=4,
+                        help="threads per worker running retrieval off the event loop")
+    parser.add_argument("--metrics-interval", type=float, default=5.0,
+                        help="seconds between publishing a worker's metrics to the others")
+    parser.add_argument("--reload-interval", type=float, default=5.0,
+                        help="seconds between checks for a rebuilt graph (0 disables hot reload)")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.data, args.graph_file)):
+        raise SystemExit(f"{args.graph_file} not found in {args.data}. "
+                         "Please run 'src/kg_construction/graph_builder.py' first.")
+    pipeline = RAGPipeline(args.data, api_key=args.api_key, graph_file=args.graph_file,
+                           cache=False if args.no_cache else None)
+    if args.fake_latency is not None:
+        pipeline.llm = FakeLLM(latency=args.fake_latency, jitter=args.fake_latency / 4)
+    serve(pipeline, args.host, args.port, args.workers, reload_interval=args.reload_interval,
+          queue_size=args.queue_size, concurrency=args.concurrency, llm_concurrency=args.llm_concurrency,
+          timeout=args.timeout, retrieval_threads=args.retrieval_threads,
+          metrics_interval=args.metrics_interval)
+
+
+if __name__ == "__main__":
+    main()
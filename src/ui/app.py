@@ -8,6 +8,7 @@ src_path = os.path.join(current_dir, "../../")
 sys.path.append(src_path)
 
 from src.rag_engine.rag_pipeline import RAGPipeline
+from src.rag_engine.instrumentation import Tracer, LogSink, MetricsRegistry, start_metrics_server
 
 st.set_page_config(page_title="保险+医养 知识图谱问答系统", layout="wide")
 
@@ -30,12 +31,31 @@ if model_option == "ZhipuAI API":
 else:
     st.sidebar.info("💡 当前运行在 **模拟模式 (Mock)**，仅返回预设答案。")
 
+@st.cache_resource
+def load_metrics():
+    # Shared across sessions; KG_METRICS_PORT exposes it to Prometheus at /metrics
+    registry = MetricsRegistry()
+    sinks = [registry]
+    if os.environ.get("KG_TRACE_LOG"):
+        sinks.append(LogSink())
+    port = os.environ.get("KG_METRICS_PORT")
+    if port:
+        start_metrics_server(registry, port=int(port), host=os.environ.get("KG_METRICS_HOST", "127.0.0.1"))
+    return registry, Tracer(sinks)
+
+registry, tracer = load_metrics()
+
 @st.cache_resource
 def load_pipeline(key):
     # Path relative to where we run streamlit
     base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     data_path = os.path.join(base_path, "data/processed")
-    return RAGPipeline(data_path, api_key=key)
+    # Domain shards start in a fraction of the time of the full kg.pkl (shards load on first use)
+    graph_file = "kg_shards" if os.path.isdir(os.path.join(data_path, "kg_shards")) else "kg.pkl"
+    pipeline = RAGPipeline(data_path, api_key=key, graph_file=graph_file, tracer=tracer)
+    # Rebuilt graphs are loaded in the background and swapped in without restarting the app
+    pipeline.start_hot_reload()
+    return pipeline
 
 try:
     pipeline = load_pipeline(api_key)
@@ -63,29 +83,35 @@ with col2:
             # 1. Retrieval Phase
             with st.status("🔍 正在检索知识图谱...", expanded=True) as status:
                 st.write("正在搜索相关实体...")
-                # Split the pipeline call to show progress
-                context = pipeline.retriever.get_context(user_input, hops=1)
+                # Retrieval and prompt assembly run here; generation starts when the stream is read
+                result = pipeline.stream_question(user_input)
+                context = result["context"]
                 st.write("检索完成，找到相关知识上下文。")
                 status.update(label="✅ 图谱检索完成", state="complete", expanded=False)
 
-            # 2. Generation Phase
-            with st.spinner("🤖 模型正在思考 (本地运行速度取决于硬件配置)..."):
-                # Construct prompt manually (replicating logic from pipeline to decouple UI)
-                prompt = f"""
-                你是一个智能保险医养助手。请根据以下知识图谱上下文回答用户问题。
-                
-                上下文信息：
-                {context}
-                
-                用户问题：{user_input}
-                
-                回答要求：准确，基于事实，引用上下文。
-                """
-                
-                answer = pipeline.llm.generate(prompt)
-                
-                st.success("回答生成成功")
-                st.markdown(f"### 🤖 回答\n{answer}")
-                
-                with st.expander("查看知识图谱证据 (Context)"):
-                    st.text(context)
+            # 2. Generation Phase (tokens are rendered as they arrive)
+            st.markdown("### 🤖 回答")
+            # Cached by prompt + model, so repeated questions skip the LLM call
+            stream = result["answer"]
+            st.write_stream(stream)
+            st.caption(f"首字延迟 {stream.ttft or 0:.2f}s · 生成总耗时 {stream.total_time or 0:.2f}s")
+            
+            with st.expander("查看知识图谱证据 (Context)"):
+                st.text(context)
+
+if pipeline.cache is not None:
+    stats = pipeline.cache.stats()
+    st.sidebar.caption(f"缓存命中率：检索 {stats['retrieval']['hit_rate']:.0%} · "
+                       f"生成 {stats['generation']['hit_rate']:.0%}")
+
+graph_status = pipeline.reload_status()
+st.sidebar.caption(f"图谱版本 v{graph_status['version'] or '-'} · 加载耗时 {graph_status['load_seconds']:.2f}s"
+                   + (" · 正在加载新版本…" if graph_status["reloading"] else ""))
+
+with st.sidebar.expander("📊 阶段耗时"):
+    snapshot = registry.snapshot()
+    for name, seconds in sorted(snapshot["last_spans"].items()):
+        hist = snapshot["histograms"].get(f"{name}_seconds", {})
+        st.caption(f"{name}: 最近 {seconds * 1000:.1f}ms · 共 {hist.get('count', 0)} 次")
+    if snapshot["counters"]:
+        st.json(snapshot["counters"])
@@ -0,0 +1,41 @@
+import networkx as nx
+
+from src.kg_construction.ontology import EntityType, RelationType
+from src.kg_construction.query_index import QueryIndex
+
+
+def _graph():
+    G = nx.MultiDiGraph()
+    for name in ("高血压", "原发性高血压", "小儿高血压(1型)"):
+        G.add_node(name, type=EntityType.DISEASE.value)
+    for name in ("阿司匹林", "阿司匹林肠溶片"):
+        G.add_node(name, type=EntityType.DRUG.value)
+    for name, ages in (("安心意外险", "0-80岁"), ("乐享意外险", "0-17岁"), ("全能重疾险", "18-60岁")):
+        G.add_node(name, type=EntityType.INSURANCE_PRODUCT.value, age_limit=ages)
+    G.add_edge("原发性高血压", "高血压", relation=RelationType.IS_A.value)
+    G.add_edge("小儿高血压(1型)", "原发性高血压", relation=RelationType.IS_A.value)
+    G.add_edge("阿司匹林肠溶片", "阿司匹林", relation=RelationType.IS_A.value)
+    G.add_edge("安心意外险", "高血压", relation=RelationType.COVERS_DISEASE.value)
+    G.add_edge("乐享意外险", "小儿高血压(1型)", relation=RelationType.COVERS_DISEASE.value)
+    G.add_edge("全能重疾险", "原发性高血压", relation=RelationType.COVERS_DISEASE.value)
+    G.add_edge("阿司匹林肠溶片", "原发性高血压", relation=RelationType.TREATS.value)
+    return G
+
+
+def test_products_for_disease_returns_only_direct_coverage():
+    index = QueryIndex.from_graph(_graph())
+    assert index.products_for_disease("高血压") == ["安心意外险"]
+    assert index.products_for_disease("原发性高血压") == ["全能重疾险"]
+
+
+def test_variant_coverage_is_kept_apart():
+    index = QueryIndex.from_graph(_graph())
+    assert index.variant_products("高血压") == {"原发性高血压": ["全能重疾险"], "小儿高血压(1型)": ["乐享意外险"]}
+    assert index.variant_products("高血压", age=30) == {"原发性高血压": ["全能重疾险"]}
+
+
+def test_core_drug_has_no_treats_of_its_preparations():
+    index = QueryIndex.from_graph(_graph())
+    assert index.diseases_for_drug("阿司匹林") == []
+    assert index.products_for_drug("阿司匹林") == {}
+    assert index.variant_products_for_drug("阿司匹林") == {"阿司匹林肠溶片": {"原发性高血压": ["全能重疾险"]}}